@@ -0,0 +1,12 @@
+-- Add the daily per-space analytics rollup to an existing database.
+-- Backfill it afterwards with: python backend/rebuild_daily_metrics.py
+CREATE TABLE IF NOT EXISTS daily_space_metrics (
+    space_id UUID REFERENCES rental_spaces(id),
+    day DATE NOT NULL,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    cancellations INTEGER NOT NULL DEFAULT 0,
+    booked_seconds BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (space_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_space_metrics_day ON daily_space_metrics(day);
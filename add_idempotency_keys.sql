@@ -0,0 +1,13 @@
+-- Add stored responses for Idempotency-Key requests to an existing database.
+-- Expired rows are purged by the hold sweep (backend/expire_holds.py).
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key VARCHAR NOT NULL,
+    scope VARCHAR NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    response_body TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (key, scope)
+);
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
@@ -0,0 +1,7 @@
+-- Add the payment reconciliation checkpoint to an existing database.
+-- The checkpoint is written by backend/reconcile_payments.py.
+CREATE TABLE IF NOT EXISTS reconciliation_checkpoints (
+    name VARCHAR PRIMARY KEY,
+    watermark BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
@@ -0,0 +1,3 @@
+-- Add the catalogue version counter to an existing rental_spaces table.
+-- Bumped on every change to a space's public data; the API derives ETags from it.
+ALTER TABLE rental_spaces ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
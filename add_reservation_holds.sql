@@ -0,0 +1,10 @@
+-- Add hold expiry to pending reservations on an existing database.
+-- Existing pending rows get the default 30-minute hold from their creation time,
+-- so long-abandoned ones are released by the next sweep.
+ALTER TABLE reservations ADD COLUMN IF NOT EXISTS hold_expires_at TIMESTAMPTZ;
+
+UPDATE reservations
+SET hold_expires_at = created_at + INTERVAL '30 minutes'
+WHERE status = 'pending' AND hold_expires_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_reservations_pending_hold ON reservations(hold_expires_at) WHERE status = 'pending';
@@ -0,0 +1,12 @@
+-- Enforce non-overlapping active reservations per space on an existing database.
+-- Fails if overlapping pending/confirmed reservations already exist; resolve those first.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE reservations
+    ADD CONSTRAINT reservations_valid_range CHECK (end_time > start_time);
+
+ALTER TABLE reservations
+    ADD CONSTRAINT reservations_no_overlap EXCLUDE USING gist (
+        space_id WITH =,
+        tstzrange(start_time, end_time, '[)') WITH &&
+    ) WHERE (status IN ('pending', 'confirmed'));
@@ -14,4 +14,5 @@ CREATE TABLE reviews (
 -- Create index for better query performance
 CREATE INDEX idx_reviews_space_id ON reviews(space_id);
 CREATE INDEX idx_reviews_rating ON reviews(rating);
-CREATE INDEX idx_reviews_created_at ON reviews(created_at DESC);
+CREATE INDEX idx_reviews_created_at_id ON reviews(created_at, id);
+CREATE INDEX idx_reviews_space_created_at_id ON reviews(space_id, created_at, id);
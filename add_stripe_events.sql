@@ -0,0 +1,25 @@
+-- Add the Stripe webhook event store to an existing database.
+-- Events are applied by backend/process_stripe_events.py or the in-process worker.
+DO $$ BEGIN
+    CREATE TYPE stripe_event_status AS ENUM ('pending', 'processed', 'ignored', 'failed');
+EXCEPTION
+    WHEN duplicate_object THEN NULL;
+END $$;
+
+CREATE TABLE IF NOT EXISTS stripe_events (
+    id VARCHAR PRIMARY KEY,
+    type VARCHAR NOT NULL,
+    payment_intent_id VARCHAR,
+    stripe_created BIGINT NOT NULL,
+    payload TEXT NOT NULL,
+    status stripe_event_status NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ,
+    last_error TEXT,
+    received_at TIMESTAMPTZ DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+-- Databases that created the table before retry backoff was added
+ALTER TABLE stripe_events ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ;
+CREATE INDEX IF NOT EXISTS idx_stripe_events_pending ON stripe_events(stripe_created, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_stripe_events_payment_intent_id ON stripe_events(payment_intent_id);
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Script to create the indexes declared on the models in a live database
+
+On PostgreSQL each index is built with CREATE INDEX CONCURRENTLY, so reads
+and writes keep flowing while it builds. Indexes left invalid by an
+interrupted concurrent build are dropped and rebuilt.
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from src.main import app
+from src.models.rental_models import db
+
+def declared_indexes():
+    """All indexes declared on the models, in table creation order"""
+    for table in db.Model.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            yield index
+
+def index_state(connection, name):
+    """Return 'missing', 'valid' or 'invalid' for a PostgreSQL index"""
+    row = connection.execute(text(
+        "SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name"
+    ), {'name': name}).first()
+    if row is None:
+        return 'missing'
+    return 'valid' if row[0] else 'invalid'
+
+def apply_indexes():
+    """Create any declared index that does not exist yet"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dry-run', action='store_true', help='Print the statements without running them')
+    args = parser.parse_args()
+
+    with app.app_context():
+        engine = db.engine
+        is_postgres = engine.dialect.name == 'postgresql'
+
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            for index in declared_indexes():
+                ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+
+                if is_postgres:
+                    state = index_state(connection, index.name)
+                    if state == 'valid':
+                        print(f"✅ {index.name} already exists")
+                        continue
+                    ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+                    if state == 'invalid':
+                        print(f"⚠️  {index.name} is invalid (interrupted build), rebuilding")
+                        drop = f'DROP INDEX CONCURRENTLY IF EXISTS {index.name}'
+                        print(f"   {drop}")
+                        if not args.dry_run:
+                            connection.execute(text(drop))
+
+                print(f"🔧 {ddl.strip()}")
+                if not args.dry_run:
+                    connection.execute(text(ddl))
+
+    print("Index migration completed!")
+
+if __name__ == "__main__":
+    apply_indexes()
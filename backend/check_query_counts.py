@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Script to verify that the admin listings run a constant number of queries
+
+Seeds reservations, payments and reviews inside a transaction, calls each
+feed endpoint for its first and second page at two dataset sizes, and
+fails if any request issues more than the expected number of SQL
+statements. The transaction is rolled back afterwards, so it is safe to
+run against a development database.
+"""
+
+import os
+import sys
+import uuid
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from src.main import app
+from src.models.rental_models import (
+    db, User, RentalSpace, Reservation, Payment, Review,
+    UserRole, ReservationStatus, PaymentStatus
+)
+from src.routes import admin
+
+# Statements each feed request may issue, whatever the page size or data volume
+EXPECTED_QUERIES = {
+    'recent reservations': 1,
+    'recent reviews': 1,
+    'users summary': 1
+}
+
+FEEDS = {
+    'recent reservations': ('/api/admin/reservations/recent', admin.get_recent_reservations),
+    'recent reviews': ('/api/admin/reviews/recent', admin.get_recent_reviews),
+    'users summary': ('/api/admin/users/summary', admin.get_users_summary)
+}
+
+def seed(count):
+    """Add `count` reservations, each with a payment and a review (flushed, not committed)"""
+    now = datetime.utcnow()
+    suffix = uuid.uuid4().hex
+    user = User(full_name='Count Check', email=f'{suffix}@example.com', password_hash='x', role=UserRole.CUSTOMER)
+    space = RentalSpace(name='Count Check Space', price_per_hour=25)
+    db.session.add_all([user, space])
+    db.session.flush()
+
+    for position in range(count):
+        start = now + timedelta(days=1, hours=2 * position)
+        reservation = Reservation(
+            user_id=user.id, space_id=space.id, start_time=start, end_time=start + timedelta(hours=2),
+            total_price=50, status=ReservationStatus.CONFIRMED, created_at=now - timedelta(minutes=position)
+        )
+        db.session.add(reservation)
+        db.session.flush()
+        db.session.add_all([
+            Payment(reservation_id=reservation.id, amount=50, stripe_payment_intent_id=f'pi_{uuid.uuid4().hex}',
+                    status=PaymentStatus.SUCCEEDED),
+            Review(reservation_id=reservation.id, user_id=user.id, space_id=space.id, rating=5,
+                   comment='Count check', created_at=now - timedelta(minutes=position))
+        ])
+    db.session.flush()
+
+def count_queries(path, view, query_string):
+    """Call a feed view in the current session and return (payload, statement count)"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        with app.test_request_context(path, query_string=query_string):
+            response = view()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    if isinstance(response, tuple):
+        response = response[0]
+    return response.get_json(), len(statements)
+
+def check_query_counts():
+    """Seed, call every feed and report requests over their query budget"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200, help='Number of rows seeded for the larger dataset')
+    parser.add_argument('--limit', type=int, default=5, help='Page size requested from the feeds')
+    args = parser.parse_args()
+
+    print("Checking query counts for admin feeds...")
+    print("=" * 50)
+
+    failures = 0
+    with app.app_context():
+        try:
+            for size in (args.limit * 2, args.rows):
+                seed(size)
+                for name, (path, view) in FEEDS.items():
+                    payload, first_page = count_queries(path, view, {'limit': args.limit})
+                    cursor = payload['pagination']['next_cursor']
+                    _, second_page = count_queries(path, view, {'limit': args.limit, 'cursor': cursor})
+
+                    counts = (first_page, second_page)
+                    if max(counts) > EXPECTED_QUERIES[name]:
+                        failures += 1
+                        print(f"❌ {name} ({size} seeded rows): {counts} queries, expected {EXPECTED_QUERIES[name]}")
+                    else:
+                        print(f"✅ {name} ({size} seeded rows): {max(counts)} queries per page")
+        finally:
+            db.session.rollback()
+
+    print("=" * 50)
+    print("All feeds run a constant number of queries!" if not failures else f"{failures} feed checks over budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(check_query_counts())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Script to verify that the hot query shapes are served by indexes
+
+Seeds a synthetic dataset inside a transaction, runs EXPLAIN on each hot
+query and fails if any of them falls back to a sequential scan of
+reservations or payments. The transaction is rolled back afterwards, so
+it is safe to run against a development database.
+"""
+
+import os
+import sys
+import json
+import uuid
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, text, tuple_
+from src.main import app
+from src.models.rental_models import (
+    db, User, RentalSpace, Reservation, Payment,
+    UserRole, ReservationStatus, PaymentStatus
+)
+from src.services.reservation_holds import overlapping_reservation_clause, hold_expiry
+
+CHECKED_TABLES = {'reservations', 'payments'}
+
+def seed(connection, reservation_count):
+    """Insert a synthetic dataset and return sample keys to query with"""
+    now = datetime.utcnow()
+    user_ids = [str(uuid.uuid4()) for _ in range(50)]
+    space_ids = [str(uuid.uuid4()) for _ in range(20)]
+
+    connection.execute(insert(User), [{
+        'id': user_id, 'full_name': 'Plan Check', 'email': f'{user_id}@example.com',
+        'password_hash': 'x', 'role': UserRole.CUSTOMER, 'created_at': now, 'updated_at': now
+    } for user_id in user_ids])
+    connection.execute(insert(RentalSpace), [{
+        'id': space_id, 'name': 'Plan Check Space', 'price_per_hour': 25, 'version': 1,
+        'created_at': now, 'updated_at': now
+    } for space_id in space_ids])
+
+    statuses = [ReservationStatus.CONFIRMED, ReservationStatus.PENDING, ReservationStatus.CANCELLED]
+    reservations = []
+    payments = []
+    start = now - timedelta(days=365)
+    for position in range(reservation_count):
+        # Consecutive 2-hour slots per space, so active rows never overlap
+        slot_start = start + timedelta(hours=2 * (position // len(space_ids)))
+        reservation_id = str(uuid.uuid4())
+        status = statuses[position % len(statuses)]
+        reservations.append({
+            'id': reservation_id, 'user_id': user_ids[position % len(user_ids)],
+            'space_id': space_ids[position % len(space_ids)],
+            'start_time': slot_start, 'end_time': slot_start + timedelta(hours=2),
+            'total_price': 50, 'status': status,
+            'hold_expires_at': hold_expiry(slot_start - timedelta(days=7)) if status == ReservationStatus.PENDING else None,
+            'created_at': slot_start - timedelta(days=7), 'updated_at': slot_start
+        })
+        payments.append({
+            'id': str(uuid.uuid4()), 'reservation_id': reservation_id, 'amount': 50,
+            'stripe_payment_intent_id': f'pi_{uuid.uuid4().hex}',
+            'status': PaymentStatus.SUCCEEDED, 'created_at': slot_start
+        })
+
+    connection.execute(insert(Reservation), reservations)
+    connection.execute(insert(Payment), payments)
+
+    sample = reservations[len(reservations) // 2]
+    return {
+        'space_id': sample['space_id'],
+        'start_time': sample['start_time'],
+        'end_time': sample['end_time'],
+        'reservation_id': sample['id'],
+        'created_at': sample['created_at'],
+        'payment_intent_id': payments[len(payments) // 2]['stripe_payment_intent_id']
+    }
+
+def hot_queries(keys):
+    """The query shapes used by the booking, payment and admin endpoints"""
+    return {
+        # Built from the same filter as the booking routes, hold expiry included
+        'reservation overlap check': select(Reservation.id).where(
+            overlapping_reservation_clause(keys['space_id'], keys['start_time'], keys['end_time'])
+        ).limit(1),
+        'payment by intent id': select(Payment).where(
+            Payment.stripe_payment_intent_id == keys['payment_intent_id']
+        ),
+        'payments by reservation': select(Payment).where(
+            Payment.reservation_id == keys['reservation_id']
+        ),
+        'recent reservations page': select(Reservation).where(
+            tuple_(Reservation.created_at, Reservation.id) < tuple_(keys['created_at'], keys['reservation_id'])
+        ).order_by(Reservation.created_at.desc(), Reservation.id.desc()).limit(10),
+        'reservation listing page': select(Reservation).where(
+            tuple_(Reservation.start_time, Reservation.id) < tuple_(keys['start_time'], keys['reservation_id'])
+        ).order_by(Reservation.start_time.desc(), Reservation.id.desc()).limit(50)
+    }
+
+def sequential_scans(connection, statement):
+    """Return the checked tables the statement scans sequentially"""
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+
+    if connection.dialect.name == 'postgresql':
+        plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}').scalar()
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+        scanned = []
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') in CHECKED_TABLES:
+                scanned.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return scanned
+
+    # SQLite: "SCAN <table>" without "USING ... INDEX" is a full table scan
+    details = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+    return [
+        detail.split()[1] for detail in details
+        if detail.startswith('SCAN ') and 'USING' not in detail and detail.split()[1] in CHECKED_TABLES
+    ]
+
+def check_query_plans():
+    """Seed, explain every hot query and report sequential scans"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000, help='Number of seeded reservations')
+    args = parser.parse_args()
+
+    print("Checking query plans for hot queries...")
+    print("=" * 50)
+
+    failures = 0
+    with app.app_context():
+        with db.engine.connect() as connection:
+            transaction = connection.begin()
+            try:
+                keys = seed(connection, args.rows)
+                connection.exec_driver_sql('ANALYZE')
+
+                for name, statement in hot_queries(keys).items():
+                    scanned = sequential_scans(connection, statement)
+                    if scanned:
+                        failures += 1
+                        print(f"❌ {name}: sequential scan on {', '.join(scanned)}")
+                    else:
+                        print(f"✅ {name}: index scan")
+            finally:
+                transaction.rollback()
+
+    print("=" * 50)
+    print("All hot queries use indexes!" if not failures else f"{failures} queries fall back to sequential scans")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(check_query_plans())
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Script to cancel abandoned PENDING reservations whose hold has expired
+
+Cancels all expired holds with one UPDATE, then cancels their Stripe
+payment intents in batches and purges expired idempotency keys. Run it from cron, or set HOLD_SWEEP_INTERVAL
+to run the same sweep inside the API process.
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.services.reservation_holds import HoldExpiryService, STRIPE_CANCEL_BATCH_SIZE
+
+def expire_holds():
+    """Expire abandoned holds and report what was cancelled"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=STRIPE_CANCEL_BATCH_SIZE,
+                        help='Payment intents cancelled per Stripe batch')
+    args = parser.parse_args()
+
+    with app.app_context():
+        report = HoldExpiryService.sweep(batch_size=args.batch_size)
+
+    print(f"🧹 Expired {report['expired_reservations']} reservation holds")
+    print(f"💳 Cancelled {report['cancelled_payment_intents']} payment intents")
+    print(f"🗑️  Purged {report['purged_idempotency_keys']} expired idempotency keys")
+    if report['failed_payment_intents']:
+        print(f"⚠️  {len(report['failed_payment_intents'])} payment intents could not be cancelled (retried on next run):")
+        for failure in report['failed_payment_intents']:
+            print(f"   - {failure['payment_intent_id']}: {failure['error']}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(expire_holds())
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Script to run a local stand-in for the Stripe API
+
+Implements the calls StripeService makes (PaymentIntent create, retrieve,
+list, confirm and cancel, Refund create, Customer create) in memory, and
+delivers signed webhooks for the resulting events to the API, so the
+payment endpoints can be load- and chaos-tested without reaching Stripe.
+
+Point the API at it with STRIPE_API_BASE=http://127.0.0.1:<port>. Webhooks
+are signed with STRIPE_WEBHOOK_SECRET, like the real ones.
+
+Latency and failures are injected per request (--latency-ms, --jitter-ms,
+--error-rate, --rate-limit-rate, --hang-rate) and can be changed while
+running with POST /_fake/config (JSON body with the same names, using
+underscores). GET /_fake/stats returns request counts per endpoint.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import queue
+import random
+import hashlib
+import secrets
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+sys.path.insert(0, os.path.dirname(__file__))
+
+import requests
+from dotenv import load_dotenv
+
+DEFAULT_PORT = 12111
+
+# Payment method IDs that make a confirmation fail, as in Stripe test mode
+DECLINED_PAYMENT_METHODS = {'pm_card_chargeDeclined', 'pm_card_visa_chargeDeclined'}
+
+def new_id(prefix):
+    return f'{prefix}_{secrets.token_hex(12)}'
+
+def parse_form(body):
+    """Decode a Stripe form body, expanding bracketed keys (metadata[key]=value) into dicts"""
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = key.replace(']', '').split('[')
+        target = params
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return params
+
+def stripe_error(status, error_type, message, code=None):
+    error = {'type': error_type, 'message': message}
+    if code:
+        error['code'] = code
+    return status, {'error': error}
+
+class FakeStripe:
+    """In-memory Stripe account state, fault injection settings and webhook sender"""
+
+    def __init__(self, webhook_url=None, webhook_secret=None, auto_confirm=False, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, rate_limit_rate=0.0, hang_rate=0.0, hang_seconds=30.0):
+        self.lock = threading.Lock()
+        self.payment_intents = {}
+        self.charges = {}
+        self.customers = {}
+        self.refunds = {}
+        # Stripe replays the first response for a repeated Idempotency-Key
+        self.idempotent_responses = {}
+        self.stats = {}
+
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.auto_confirm = auto_confirm
+        self.config = {
+            'latency_ms': latency_ms,
+            'jitter_ms': jitter_ms,
+            'error_rate': error_rate,
+            'rate_limit_rate': rate_limit_rate,
+            'hang_rate': hang_rate,
+            'hang_seconds': hang_seconds
+        }
+
+        self.webhooks = queue.Queue()
+        self.webhook_stats = {'delivered': 0, 'failed': 0}
+        if webhook_url:
+            threading.Thread(target=self._deliver_webhooks, name='fake-stripe-webhooks', daemon=True).start()
+
+    # Fault injection
+
+    def inject(self):
+        """Sleep and/or pick an injected failure for one request; returns (status, body) or None"""
+        config = dict(self.config)
+        delay_ms = config['latency_ms'] + random.uniform(-config['jitter_ms'], config['jitter_ms'])
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+        roll = random.random()
+        if roll < config['hang_rate']:
+            time.sleep(config['hang_seconds'])
+            return stripe_error(504, 'api_error', 'Injected timeout')
+        roll -= config['hang_rate']
+        if roll < config['error_rate']:
+            return stripe_error(500, 'api_error', 'Injected server error')
+        roll -= config['error_rate']
+        if roll < config['rate_limit_rate']:
+            return stripe_error(429, 'rate_limit_error', 'Injected rate limit', code='rate_limit')
+        return None
+
+    # Webhooks
+
+    def emit(self, event_type, data_object):
+        if not self.webhook_url:
+            return
+        self.webhooks.put({
+            'id': new_id('evt'),
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': dict(data_object)}
+        })
+
+    def sign(self, payload):
+        timestamp = int(time.time())
+        signature = hmac.new(
+            self.webhook_secret.encode('utf-8'), f'{timestamp}.{payload}'.encode('utf-8'), hashlib.sha256
+        ).hexdigest()
+        return f't={timestamp},v1={signature}'
+
+    def _deliver_webhooks(self):
+        session = requests.Session()
+        while True:
+            event = self.webhooks.get()
+            payload = json.dumps(event)
+            try:
+                response = session.post(self.webhook_url, data=payload, timeout=10, headers={
+                    'Content-Type': 'application/json',
+                    'Stripe-Signature': self.sign(payload)
+                })
+                delivered = response.status_code < 300
+            except requests.RequestException:
+                delivered = False
+            with self.lock:
+                self.webhook_stats['delivered' if delivered else 'failed'] += 1
+
+    # API methods; each returns (status, body)
+
+    def create_payment_intent(self, params):
+        try:
+            amount = int(params.get('amount', ''))
+        except ValueError:
+            return stripe_error(400, 'invalid_request_error', 'Missing required param: amount.', 'parameter_missing')
+        intent_id = new_id('pi')
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': amount,
+            'amount_received': 0,
+            'currency': params.get('currency', 'usd'),
+            'client_secret': f'{intent_id}_secret_{secrets.token_hex(8)}',
+            'created': int(time.time()),
+            'latest_charge': None,
+            'metadata': params.get('metadata', {}),
+            'status': 'requires_payment_method',
+            'livemode': False
+        }
+        with self.lock:
+            self.payment_intents[intent_id] = intent
+        self.emit('payment_intent.created', intent)
+        if self.auto_confirm:
+            return self.confirm_payment_intent(intent_id, {})
+        return 200, intent
+
+    def retrieve_payment_intent(self, intent_id):
+        with self.lock:
+            intent = self.payment_intents.get(intent_id)
+        if intent is None:
+            return stripe_error(404, 'invalid_request_error', f"No such payment_intent: '{intent_id}'", 'resource_missing')
+        return 200, intent
+
+    def list_payment_intents(self, params):
+        created = params.get('created', {})
+        limit = min(int(params.get('limit') or 10), 100)
+        expand_charge = 'data.latest_charge' in params.get('expand', {}).values()
+        with self.lock:
+            # Newest first, as Stripe lists them
+            intents = sorted(
+                self.payment_intents.values(), key=lambda intent: (intent['created'], intent['id']), reverse=True
+            )
+            bounds = {'gt': int.__gt__, 'gte': int.__ge__, 'lt': int.__lt__, 'lte': int.__le__}
+            for operator, compare in bounds.items():
+                if operator in created:
+                    intents = [intent for intent in intents if compare(intent['created'], int(created[operator]))]
+            starting_after = params.get('starting_after')
+            if starting_after:
+                ids = [intent['id'] for intent in intents]
+                intents = intents[ids.index(starting_after) + 1:] if starting_after in ids else []
+            page = [dict(intent) for intent in intents[:limit]]
+            if expand_charge:
+                for intent in page:
+                    intent['latest_charge'] = dict(self.charges[intent['latest_charge']]) if intent['latest_charge'] else None
+        return 200, {
+            'object': 'list',
+            'url': '/v1/payment_intents',
+            'data': page,
+            'has_more': len(intents) > limit
+        }
+
+    def confirm_payment_intent(self, intent_id, params):
+        with self.lock:
+            intent = self.payment_intents.get(intent_id)
+            if intent is None:
+                return stripe_error(404, 'invalid_request_error', f"No such payment_intent: '{intent_id}'", 'resource_missing')
+            if intent['status'] in ('succeeded', 'canceled'):
+                return stripe_error(400, 'invalid_request_error',
+                                    f"This PaymentIntent's status is {intent['status']}.", 'payment_intent_unexpected_state')
+            declined = params.get('payment_method') in DECLINED_PAYMENT_METHODS
+            if declined:
+                intent['status'] = 'requires_payment_method'
+                intent['last_payment_error'] = {'code': 'card_declined', 'message': 'Your card was declined.'}
+            else:
+                intent['status'] = 'succeeded'
+                intent['amount_received'] = intent['amount']
+                intent['latest_charge'] = new_id('ch')
+                intent.pop('last_payment_error', None)
+                self.charges[intent['latest_charge']] = {
+                    'id': intent['latest_charge'],
+                    'object': 'charge',
+                    'amount': intent['amount'],
+                    'amount_refunded': 0,
+                    'refunded': False,
+                    'currency': intent['currency'],
+                    'payment_intent': intent_id,
+                    'status': 'succeeded'
+                }
+            snapshot = dict(intent)
+        self.emit('payment_intent.payment_failed' if declined else 'payment_intent.succeeded', snapshot)
+        return 200, snapshot
+
+    def cancel_payment_intent(self, intent_id):
+        with self.lock:
+            intent = self.payment_intents.get(intent_id)
+            if intent is None:
+                return stripe_error(404, 'invalid_request_error', f"No such payment_intent: '{intent_id}'", 'resource_missing')
+            if intent['status'] in ('succeeded', 'canceled'):
+                return stripe_error(400, 'invalid_request_error',
+                                    f"You cannot cancel this PaymentIntent because it has a status of {intent['status']}.",
+                                    'payment_intent_unexpected_state')
+            intent['status'] = 'canceled'
+            snapshot = dict(intent)
+        self.emit('payment_intent.canceled', snapshot)
+        return 200, snapshot
+
+    def create_refund(self, params):
+        intent_id = params.get('payment_intent')
+        with self.lock:
+            intent = self.payment_intents.get(intent_id)
+            if intent is None:
+                return stripe_error(404, 'invalid_request_error', f"No such payment_intent: '{intent_id}'", 'resource_missing')
+            if intent['status'] != 'succeeded':
+                return stripe_error(400, 'invalid_request_error',
+                                    'This PaymentIntent does not have a successful charge to refund.', 'charge_not_refundable')
+            charge = self.charges[intent['latest_charge']]
+            amount = int(params.get('amount') or charge['amount'] - charge['amount_refunded'])
+            if amount <= 0 or charge['amount_refunded'] + amount > charge['amount']:
+                return stripe_error(400, 'invalid_request_error',
+                                    'Refund amount is greater than the unrefunded amount.', 'amount_too_large')
+            charge['amount_refunded'] += amount
+            charge['refunded'] = charge['amount_refunded'] == charge['amount']
+            refund = {
+                'id': new_id('re'),
+                'object': 'refund',
+                'amount': amount,
+                'charge': intent['latest_charge'],
+                'currency': intent['currency'],
+                'payment_intent': intent_id,
+                'reason': params.get('reason'),
+                'status': 'succeeded',
+                'created': int(time.time())
+            }
+            self.refunds[refund['id']] = refund
+            charge = dict(charge)
+        self.emit('charge.refunded', charge)
+        return 200, refund
+
+    def create_customer(self, params):
+        customer = {
+            'id': new_id('cus'),
+            'object': 'customer',
+            'email': params.get('email'),
+            'name': params.get('name'),
+            'metadata': params.get('metadata', {}),
+            'created': int(time.time()),
+            'livemode': False
+        }
+        with self.lock:
+            self.customers[customer['id']] = customer
+        return 200, customer
+
+    def route(self, method, path, params):
+        """Dispatch one API request; returns (endpoint name, status, body)"""
+        parts = [part for part in path.split('/') if part]
+        if parts[:1] != ['v1']:
+            return 'unknown', *stripe_error(404, 'invalid_request_error', f'Unrecognized request URL ({method}: {path}).')
+        parts = parts[1:]
+
+        if parts == ['payment_intents'] and method == 'GET':
+            return 'payment_intents.list', *self.list_payment_intents(params)
+        if parts == ['payment_intents'] and method == 'POST':
+            return 'payment_intents.create', *self.create_payment_intent(params)
+        if len(parts) == 2 and parts[0] == 'payment_intents' and method == 'GET':
+            return 'payment_intents.retrieve', *self.retrieve_payment_intent(parts[1])
+        if len(parts) == 3 and parts[0] == 'payment_intents' and parts[2] == 'confirm' and method == 'POST':
+            return 'payment_intents.confirm', *self.confirm_payment_intent(parts[1], params)
+        if len(parts) == 3 and parts[0] == 'payment_intents' and parts[2] == 'cancel' and method == 'POST':
+            return 'payment_intents.cancel', *self.cancel_payment_intent(parts[1])
+        if parts == ['refunds'] and method == 'POST':
+            return 'refunds.create', *self.create_refund(params)
+        if parts == ['customers'] and method == 'POST':
+            return 'customers.create', *self.create_customer(params)
+        return 'unknown', *stripe_error(404, 'invalid_request_error', f'Unrecognized request URL ({method}: {path}).')
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeStripe/1.0'
+
+    @property
+    def stripe(self):
+        return self.server.fake_stripe
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Request-Id', new_id('req'))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        url = urlsplit(self.path)
+
+        # Control endpoints for tests; never delayed or failed
+        if url.path == '/_fake/stats':
+            with self.stripe.lock:
+                return self._send(200, {
+                    'requests': dict(self.stripe.stats),
+                    'webhooks': dict(self.stripe.webhook_stats),
+                    'config': dict(self.stripe.config)
+                })
+        if url.path == '/_fake/config' and method == 'POST':
+            updates = json.loads(body or '{}')
+            unknown = set(updates) - set(self.stripe.config)
+            if unknown:
+                return self._send(400, {'error': f"Unknown settings: {', '.join(sorted(unknown))}"})
+            self.stripe.config.update({key: float(value) for key, value in updates.items()})
+            return self._send(200, {'config': dict(self.stripe.config)})
+
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._send(*stripe_error(401, 'invalid_request_error', 'You did not provide an API key.'))
+
+        idempotency_key = self.headers.get('Idempotency-Key') if method == 'POST' else None
+        if idempotency_key:
+            with self.stripe.lock:
+                stored = self.stripe.idempotent_responses.get(idempotency_key)
+            if stored is not None:
+                return self._send(*stored, headers={'Idempotent-Replayed': 'true'})
+
+        injected = self.stripe.inject()
+        if injected is not None:
+            with self.stripe.lock:
+                self.stripe.stats['injected_failures'] = self.stripe.stats.get('injected_failures', 0) + 1
+            return self._send(*injected)
+
+        params = parse_form(url.query if method == 'GET' else body)
+        endpoint, status, response = self.stripe.route(method, url.path, params)
+        with self.stripe.lock:
+            self.stripe.stats[endpoint] = self.stripe.stats.get(endpoint, 0) + 1
+            # Like Stripe, only responses from requests that reached the API are saved for replay
+            if idempotency_key:
+                self.stripe.idempotent_responses[idempotency_key] = (status, response)
+        self._send(status, response)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+def start_fake_stripe(host='127.0.0.1', port=DEFAULT_PORT, verbose=False, **options):
+    """
+    Start the fake Stripe server in a background thread
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 picks a free one)
+        verbose: Log every request
+        options: FakeStripe settings (webhook_url, webhook_secret, auto_confirm, latency_ms, ...)
+
+    Returns:
+        ThreadingHTTPServer: The running server; its fake_stripe attribute holds the state
+    """
+    server = ThreadingHTTPServer((host, port), FakeStripeHandler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    server.fake_stripe = FakeStripe(**options)
+    threading.Thread(target=server.serve_forever, name='fake-stripe', daemon=True).start()
+    return server
+
+def run_fake_stripe_server():
+    """Parse options and serve until interrupted"""
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='Port to listen on')
+    parser.add_argument('--webhook-url', help='Deliver signed webhooks here, e.g. http://127.0.0.1:5000/api/payments/webhook')
+    parser.add_argument('--webhook-secret', default=os.getenv('STRIPE_WEBHOOK_SECRET'),
+                        help='Webhook signing secret (default: STRIPE_WEBHOOK_SECRET)')
+    parser.add_argument('--auto-confirm', action='store_true',
+                        help='Confirm new payment intents immediately, as if the customer paid')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Random +/- variation of the added latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help='Fraction of requests answered with a 429')
+    parser.add_argument('--hang-rate', type=float, default=0, help='Fraction of requests that hang for --hang-seconds')
+    parser.add_argument('--hang-seconds', type=float, default=30, help='How long a hanging request takes')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = parser.parse_args()
+
+    if args.webhook_url and not args.webhook_secret:
+        print("❌ --webhook-url needs a signing secret (--webhook-secret or STRIPE_WEBHOOK_SECRET)")
+        return 1
+
+    server = start_fake_stripe(
+        host=args.host, port=args.port, verbose=args.verbose,
+        webhook_url=args.webhook_url, webhook_secret=args.webhook_secret, auto_confirm=args.auto_confirm,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, hang_rate=args.hang_rate, hang_seconds=args.hang_seconds
+    )
+    host, port = server.server_address[:2]
+    print(f"🧪 Fake Stripe API listening on http://{host}:{port}")
+    print(f"   Point the API at it with STRIPE_API_BASE=http://{host}:{port}")
+    if args.webhook_url:
+        print(f"📬 Delivering signed webhooks to {args.webhook_url}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("👋 Stopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(run_fake_stripe_server())
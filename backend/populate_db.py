@@ -14,6 +14,7 @@ from src.models.rental_models import (
     db, User, RentalSpace, Reservation, Review, 
     UserRole, ReservationStatus
 )
+from src.services.rating_summary_service import RatingSummaryService
 
 def populate_database():
     """Populate the database with sample data"""
@@ -257,6 +258,9 @@ def populate_database():
         
         db.session.commit()
         
+        # Backfill the materialized rating summaries for the seeded reviews
+        RatingSummaryService.rebuild()
+        
         print("Database populated successfully!")
         print(f"Created {len([admin] + customers)} users")
         print(f"Created {len(spaces)} rental spaces")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Script to apply stored Stripe webhook events
+
+The webhook only verifies and stores events; this applies the pending
+backlog in batches, in order per payment intent. Run it from cron, or set
+STRIPE_EVENT_WORKER_INTERVAL to run the same worker inside the API process.
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.services.stripe_events import StripeEventProcessor, STRIPE_EVENT_BATCH_SIZE
+
+def process_stripe_events():
+    """Apply pending webhook events and report the outcome"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=STRIPE_EVENT_BATCH_SIZE,
+                        help='Events applied per transaction')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help='Requeue events that exhausted their attempts before processing')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.retry_failed:
+            print(f"🔁 Requeued {StripeEventProcessor.retry_failed()} failed events")
+        totals = StripeEventProcessor.drain(batch_size=args.batch_size)
+
+    print(f"✅ Applied {totals['processed']} events")
+    print(f"⏭️  Ignored {totals['ignored']} events without a handler")
+    if totals['retrying']:
+        print(f"⚠️  {totals['retrying']} events failed and will be retried after a backoff")
+    if totals['failed']:
+        print(f"❌ {totals['failed']} events exhausted their attempts (requeue with --retry-failed)")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(process_stripe_events())
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Script to backfill or verify the daily_space_metrics rollup from reservations and payments
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.services.daily_metrics import DailyMetricsService
+
+def rebuild_daily_metrics():
+    """Rebuild the daily rollup, or report drift with --check"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--check', action='store_true',
+                        help='Only report drifted rows; exit with status 1 if any are found')
+    parser.add_argument('--space-id', help='Rebuild a single space instead of every space')
+    args = parser.parse_args()
+
+    with app.app_context():
+        report = DailyMetricsService.rebuild(space_id=args.space_id, dry_run=args.check)
+
+    print(f"Checked {report['checked']} space-day rows")
+    if not report['drifted']:
+        print("✅ Daily metrics are in sync with reservations and payments")
+        return 0
+
+    action = "Drift detected in" if args.check else "Repaired"
+    print(f"{'❌' if args.check else '🔧'} {action} {report['drifted']} space-day rows")
+    return 1 if args.check else 0
+
+if __name__ == "__main__":
+    sys.exit(rebuild_daily_metrics())
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Script to backfill or verify the space_rating_summary table from the reviews table
+"""
+
+import os
+import sys
+import argparse
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.services.rating_summary_service import RatingSummaryService
+
+def rebuild_rating_summary():
+    """Rebuild rating summaries, or report drift with --check"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--check', action='store_true',
+                        help='Only report drifted spaces; exit with status 1 if any are found')
+    parser.add_argument('--space-id', help='Rebuild a single space instead of the whole catalogue')
+    args = parser.parse_args()
+
+    with app.app_context():
+        report = RatingSummaryService.rebuild(space_id=args.space_id, dry_run=args.check)
+
+    print(f"Checked {report['checked']} space summaries")
+    if not report['drifted']:
+        print("✅ Rating summaries are in sync with reviews")
+        return 0
+
+    action = "Drift detected" if args.check else "Repaired"
+    print(f"{'❌' if args.check else '🔧'} {action} for {len(report['drifted'])} spaces:")
+    for space_id in report['drifted']:
+        print(f"   - {space_id}")
+    return 1 if args.check else 0
+
+if __name__ == "__main__":
+    sys.exit(rebuild_rating_summary())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Script to reconcile local payments with Stripe
+
+Pages through the payment intents Stripe created since the last run (minus
+RECONCILIATION_LOOKBACK_HOURS), compares each page against the payments
+table with one query, and applies missed successes and failures to
+payments and reservations in batched UPDATEs; fully refunded bookings are
+cancelled rather than confirmed. Run it from cron to repair whatever
+missed webhooks left PENDING; each run only re-reads the recent window.
+"""
+
+import os
+import sys
+import calendar
+import argparse
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.services.payment_reconciliation import PaymentReconciliationService, RECONCILIATION_PAGE_SIZE
+
+def parse_since(value):
+    """ISO date or datetime (UTC) as Unix seconds"""
+    return calendar.timegm(datetime.fromisoformat(value).timetuple())
+
+def reconcile_payments():
+    """Reconcile the window since the checkpoint and report what changed"""
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--since', type=parse_since,
+                        help='Reconcile intents created since this UTC date/time instead of the checkpoint, e.g. 2025-01-01')
+    parser.add_argument('--page-size', type=int, default=RECONCILIATION_PAGE_SIZE,
+                        help='Payment intents per Stripe page (at most 100)')
+    parser.add_argument('--dry-run', action='store_true', help='Only report differences; change nothing')
+    args = parser.parse_args()
+
+    with app.app_context():
+        report = PaymentReconciliationService.run(since=args.since, dry_run=args.dry_run, page_size=args.page_size)
+
+    since = datetime.utcfromtimestamp(report['since']).isoformat()
+    until = datetime.utcfromtimestamp(report['until']).isoformat()
+    print(f"🔎 Checked {report['payment_intents']} payment intents created {since} - {until} ({report['pages']} pages)")
+    if args.dry_run:
+        print("🧪 Dry run: nothing was changed")
+    print(f"✅ {report['payments_succeeded']} payments marked succeeded")
+    print(f"❌ {report['payments_failed']} payments marked failed")
+    print(f"📅 {report['reservations_confirmed']} reservations confirmed")
+    print(f"🚫 {report['reservations_cancelled']} fully refunded reservations cancelled")
+
+    if report['error']:
+        print(f"⚠️  Stopped on a Stripe error; the checkpoint was not moved: {report['error']}")
+        return 1
+    if report['checkpoint'] and not args.dry_run:
+        print(f"📌 Checkpoint at {datetime.utcfromtimestamp(report['checkpoint']).isoformat()}")
+    if report['needs_review']:
+        print(f"⚠️  {len(report['needs_review'])} paid reservations are not confirmed and need review:")
+        for item in report['needs_review']:
+            print(f"   - {item['payment_intent_id']}: reservation {item['reservation_id']} is {item['reservation_status']}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(reconcile_payments())
@@ -14,6 +14,9 @@ from src.routes.reservations import reservations_bp
 from src.routes.images import images_bp
 from src.routes.payments import payments_bp
 from src.routes.admin import admin_bp
+from src.routes.quotes import quotes_bp
+from src.services.reservation_holds import start_hold_sweeper
+from src.services.stripe_events import start_stripe_event_worker
 
 # Load environment variables
 load_dotenv()
@@ -36,12 +39,23 @@ app.register_blueprint(reservations_bp, url_prefix='/api')
 app.register_blueprint(images_bp, url_prefix='/api/images')
 app.register_blueprint(payments_bp, url_prefix='/api/payments')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
+app.register_blueprint(quotes_bp, url_prefix='/api')
 
 # Initialize database
 db.init_app(app)
 with app.app_context():
     db.create_all()
 
+# Expire abandoned reservation holds in the background (off by default)
+hold_sweep_interval = int(os.getenv('HOLD_SWEEP_INTERVAL', '0'))
+if hold_sweep_interval > 0:
+    start_hold_sweeper(app, hold_sweep_interval)
+
+# Apply stored Stripe webhook events in the background (off by default)
+stripe_event_interval = int(os.getenv('STRIPE_EVENT_WORKER_INTERVAL', '0'))
+if stripe_event_interval > 0:
+    start_stripe_event_worker(app, stripe_event_interval)
+
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
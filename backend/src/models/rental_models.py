@@ -1,4 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, event, func
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
 from datetime import datetime
 import uuid
 from enum import Enum
@@ -19,6 +21,12 @@ class PaymentStatus(Enum):
     PENDING = 'pending'
     FAILED = 'failed'
 
+class StripeEventStatus(Enum):
+    PENDING = 'pending'
+    PROCESSED = 'processed'
+    IGNORED = 'ignored'
+    FAILED = 'failed'
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -53,6 +61,7 @@ class RentalSpace(db.Model):
     price_per_hour = db.Column(db.Numeric(10, 2), nullable=False)
     capacity = db.Column(db.Integer)
     photos = db.Column(db.JSON)  # Store Cloudinary URLs as JSON array
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped on every change visible in the catalogue
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -60,6 +69,8 @@ class RentalSpace(db.Model):
     reservations = db.relationship('Reservation', backref='space', lazy=True)
     availability = db.relationship('Availability', backref='space', lazy=True)
     reviews = db.relationship('Review', backref='space', lazy=True)
+    rating_summary = db.relationship('SpaceRatingSummary', backref='space', uselist=False,
+                                     cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -83,6 +94,8 @@ class Reservation(db.Model):
     end_time = db.Column(db.DateTime, nullable=False)
     total_price = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.Enum(ReservationStatus), nullable=False, default=ReservationStatus.PENDING)
+    # A PENDING reservation only holds its slot until this time (UTC)
+    hold_expires_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -90,6 +103,33 @@ class Reservation(db.Model):
     payments = db.relationship('Payment', backref='reservation', lazy=True)
     review = db.relationship('Review', backref='reservation', uselist=False)
     
+    # Active reservations of a space may never overlap. On PostgreSQL this is a
+    # GiST exclusion constraint (the ORM columns are timezone-naive, hence
+    # tsrange; create_tables.sql uses tstzrange on TIMESTAMPTZ columns). Other
+    # databases get equivalent triggers, see below.
+    __table_args__ = (
+        db.CheckConstraint('end_time > start_time', name='reservations_valid_range'),
+        ExcludeConstraint(
+            (space_id, '='),
+            (func.tsrange(start_time, end_time, '[)'), '&&'),
+            where=status.in_([ReservationStatus.PENDING, ReservationStatus.CONFIRMED]),
+            using='gist',
+            name='reservations_no_overlap'
+        ).ddl_if(dialect='postgresql'),
+        # Conflict checks and availability range scans
+        db.Index('idx_reservations_space_status_time', 'space_id', 'status', 'start_time', 'end_time'),
+        # Keyset-paginated listing order
+        db.Index('idx_reservations_start_time_id', 'start_time', 'id'),
+        # Admin "recent" feeds and exports
+        db.Index('idx_reservations_created_at_id', 'created_at', 'id'),
+        # Hold expiry sweeps only ever look at pending rows
+        db.Index(
+            'idx_reservations_pending_hold', 'hold_expires_at',
+            postgresql_where=status == ReservationStatus.PENDING,
+            sqlite_where=status == ReservationStatus.PENDING
+        ),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -99,10 +139,50 @@ class Reservation(db.Model):
             'end_time': self.end_time.isoformat(),
             'total_price': float(self.total_price),
             'status': self.status.value,
+            'hold_expires_at': self.hold_expires_at.isoformat() if self.hold_expires_at else None,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
 
+RESERVATION_OVERLAP_CONSTRAINT = 'reservations_no_overlap'
+
+def is_reservation_overlap_error(error):
+    """Check whether an IntegrityError was raised by the reservation non-overlap guard"""
+    original = getattr(error, 'orig', error)
+    return getattr(original, 'pgcode', None) == '23P01' or RESERVATION_OVERLAP_CONSTRAINT in str(original)
+
+event.listen(
+    db.Model.metadata,
+    'before_create',
+    DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql')
+)
+
+# SQLite fallback for local development and tests: SQLite has no exclusion
+# constraints, so reject overlapping active rows with triggers instead
+_ACTIVE_STATUS_NAMES = "'PENDING', 'CONFIRMED'"
+_OVERLAP_EXISTS = f"""
+    NEW.status IN ({_ACTIVE_STATUS_NAMES}) AND EXISTS (
+        SELECT 1 FROM reservations
+        WHERE space_id = NEW.space_id
+          AND id != NEW.id
+          AND status IN ({_ACTIVE_STATUS_NAMES})
+          AND start_time < NEW.end_time
+          AND end_time > NEW.start_time
+    )"""
+
+for _trigger_event in ('INSERT', 'UPDATE OF space_id, start_time, end_time, status'):
+    event.listen(
+        Reservation.__table__,
+        'after_create',
+        DDL(f"""
+CREATE TRIGGER {RESERVATION_OVERLAP_CONSTRAINT}_{_trigger_event.split()[0].lower()}
+BEFORE {_trigger_event} ON reservations
+WHEN {_OVERLAP_EXISTS}
+BEGIN
+    SELECT RAISE(ABORT, '{RESERVATION_OVERLAP_CONSTRAINT}');
+END""").execute_if(dialect='sqlite')
+    )
+
 class Payment(db.Model):
     __tablename__ = 'payments'
     
@@ -113,6 +193,12 @@ class Payment(db.Model):
     status = db.Column(db.Enum(PaymentStatus), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # confirm_payment, stripe_webhook and create_refund look payments up by intent
+        db.Index('idx_payments_stripe_payment_intent_id', 'stripe_payment_intent_id'),
+        db.Index('idx_payments_reservation_id', 'reservation_id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -156,9 +242,17 @@ class Review(db.Model):
     # Add constraint for rating between 1 and 5
     __table_args__ = (
         db.CheckConstraint('rating >= 1 AND rating <= 5', name='rating_range'),
+        db.Index('idx_reviews_space_id', 'space_id'),
+        db.Index('idx_reviews_rating', 'rating'),
+        db.Index('idx_reviews_created_at_id', 'created_at', 'id'),
+        # Keyset-paginated per-space review listing
+        db.Index('idx_reviews_space_created_at_id', 'space_id', 'created_at', 'id'),
     )
     
-    def to_dict(self):
+    def to_dict(self, user_name=None):
+        # Callers that already joined the user pass its name to skip the lazy load
+        if user_name is None:
+            user_name = self.user.full_name if self.user else 'Anonymous'
         return {
             'id': self.id,
             'reservation_id': self.reservation_id,
@@ -166,7 +260,146 @@ class Review(db.Model):
             'space_id': self.space_id,
             'rating': self.rating,
             'comment': self.comment,
-            'user_name': self.user.full_name if self.user else 'Anonymous',
+            'user_name': user_name,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+
+class SpaceRatingSummary(db.Model):
+    __tablename__ = 'space_rating_summary'
+    
+    # Materialized per-space review aggregates, maintained incrementally by
+    # RatingSummaryService whenever a review is created, updated or deleted
+    space_id = db.Column(db.String(36), db.ForeignKey('rental_spaces.id'), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.review_count if self.review_count else 0
+    
+    def rating_distribution(self):
+        return {str(i): getattr(self, f'rating_{i}_count') or 0 for i in range(1, 6)}
+    
+    def to_dict(self):
+        return {
+            'space_id': self.space_id,
+            'average_rating': self.average_rating,
+            'total_reviews': self.review_count,
+            'rating_distribution': self.rating_distribution(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class DailySpaceMetrics(db.Model):
+    __tablename__ = 'daily_space_metrics'
+    
+    # Per-space, per-day analytics rollup, maintained incrementally by
+    # DailyMetricsService on every reservation and payment write. Reservation
+    # figures are counted on the day the reservation starts; revenue on the
+    # day the payment was created.
+    space_id = db.Column(db.String(36), db.ForeignKey('rental_spaces.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    cancellations = db.Column(db.Integer, nullable=False, default=0)
+    booked_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    
+    __table_args__ = (
+        db.Index('idx_daily_space_metrics_day', 'day'),
+    )
+    
+    @property
+    def booked_hours(self):
+        return (self.booked_seconds or 0) / 3600
+    
+    def to_dict(self):
+        return {
+            'space_id': self.space_id,
+            'day': self.day.isoformat(),
+            'bookings': self.bookings,
+            'cancellations': self.cancellations,
+            'booked_hours': round(self.booked_hours, 2),
+            'revenue': float(self.revenue)
+        }
+
+class StripeEvent(db.Model):
+    __tablename__ = 'stripe_events'
+    
+    # Verified Stripe webhook events, stored as received and applied
+    # asynchronously by StripeEventProcessor. The Stripe event ID is the
+    # primary key, so redelivered events are dropped on insert.
+    id = db.Column(db.String(255), primary_key=True)
+    type = db.Column(db.String(100), nullable=False)
+    # Payment intent the event is about; events for one intent are applied in order
+    payment_intent_id = db.Column(db.String(255), nullable=True)
+    # Stripe's creation time (Unix seconds), the processing order
+    stripe_created = db.Column(db.BigInteger, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.Enum(StripeEventStatus), nullable=False, default=StripeEventStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # A failed event is not retried before this time (NULL: due now)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        # The worker only ever reads the pending backlog, oldest first
+        db.Index(
+            'idx_stripe_events_pending', 'stripe_created', 'id',
+            postgresql_where=status == StripeEventStatus.PENDING,
+            sqlite_where=status == StripeEventStatus.PENDING
+        ),
+        db.Index('idx_stripe_events_payment_intent_id', 'payment_intent_id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'payment_intent_id': self.payment_intent_id,
+            'stripe_created': self.stripe_created,
+            'status': self.status.value,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    
+    # First response to a POST sent with an Idempotency-Key header, replayed
+    # for retries of the same request until expires_at
+    key = db.Column(db.String(255), primary_key=True)
+    # The endpoint (and request user_id) the key was used on, so keys never leak across endpoints or users
+    scope = db.Column(db.String(100), primary_key=True)
+    # SHA-256 of the request path and body; a different request under the same key is rejected
+    request_hash = db.Column(db.String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    # Set on every claim; the owning request's final write matches on it
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('idx_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+class ReconciliationCheckpoint(db.Model):
+    __tablename__ = 'reconciliation_checkpoints'
+    
+    # How far a reconciliation job has got, so each run only re-reads a
+    # recent window. One row per job, keyed by its name.
+    name = db.Column(db.String(100), primary_key=True)
+    # End of the last fully reconciled window (Unix seconds, exclusive)
+    watermark = db.Column(db.BigInteger, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
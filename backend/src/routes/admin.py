@@ -1,66 +1,74 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from datetime import datetime, timedelta
+from decimal import Decimal
 from sqlalchemy import func, desc
-from src.models.rental_models import db, User, RentalSpace, Reservation, Payment, Review
+from src.models.rental_models import db, User, RentalSpace, Reservation, Payment, Review, ReservationStatus, PaymentStatus, DailySpaceMetrics
+from src.services.rating_summary_service import RatingSummaryService
+from src.services.catalog_cache import bump_space_version
+from src.services.availability_index import availability_index
+from src.services.transitions import TransitionService
+from src.services import admin_stats
+from src.services.streaming import stream_csv, gzip_stream
+from src.services.pagination import paginate, parse_limit
+from src.services.stripe_service import stripe_http_client
 
 admin_bp = Blueprint('admin', __name__)
 
+# Default page size of the recent reservation and review feeds
+RECENT_FEED_SIZE = 10
+
 @admin_bp.route('/dashboard/stats', methods=['GET'])
 def get_dashboard_stats():
     """Get overview statistics for admin dashboard"""
     try:
-        # Calculate date ranges
-        today = datetime.now().date()
-        last_month = today - timedelta(days=30)
-        
-        # Total revenue
-        total_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.status == 'completed'
-        ).scalar() or 0
-        
-        # Revenue last month for comparison
-        last_month_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.status == 'completed',
-            Payment.created_at >= last_month
-        ).scalar() or 0
-        
-        # Total bookings
-        total_bookings = db.session.query(func.count(Reservation.id)).scalar() or 0
-        
-        # Bookings last month
-        last_month_bookings = db.session.query(func.count(Reservation.id)).filter(
-            Reservation.created_at >= last_month
-        ).scalar() or 0
-        
-        # Active spaces (using total count since status field doesn't exist)
-        total_spaces = db.session.query(func.count(RentalSpace.id)).scalar() or 0
-        active_spaces = total_spaces  # All spaces are considered active
-        
-        # Maintenance spaces (placeholder since status field doesn't exist)
-        maintenance_spaces = 0
+        # One aggregate query, cached briefly and dropped on reservation/payment writes
+        return jsonify(admin_stats.get_dashboard_stats())
         
-        # Average rating
-        avg_rating = db.session.query(func.avg(Review.rating)).scalar() or 0
-        total_reviews = db.session.query(func.count(Review.id)).scalar() or 0
-        
-        # Calculate percentage changes
-        revenue_change = 0
-        if total_revenue > 0:
-            revenue_change = ((last_month_revenue / total_revenue) * 100) if total_revenue > 0 else 0
-        
-        booking_change = 0
-        if total_bookings > 0:
-            booking_change = ((last_month_bookings / total_bookings) * 100) if total_bookings > 0 else 0
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/timeseries', methods=['GET'])
+def get_timeseries():
+    """Get a bucketed metric series for the admin charts"""
+    try:
+        metric = request.args.get('metric', 'revenue')
+        bucket = request.args.get('bucket', 'day')
+        space_id = request.args.get('space_id') or None
+        
+        if metric not in admin_stats.TIMESERIES_METRICS:
+            return jsonify({'error': f'Invalid metric. Use one of {", ".join(admin_stats.TIMESERIES_METRICS)}'}), 400
+        if bucket not in admin_stats.TIMESERIES_BUCKETS:
+            return jsonify({'error': f'Invalid bucket. Use one of {", ".join(admin_stats.TIMESERIES_BUCKETS)}'}), 400
+        
+        # Default range: the last 30 days
+        try:
+            end_date = datetime.fromisoformat(request.args['end_date']).date() \
+                if request.args.get('end_date') else datetime.now().date()
+            start_date = datetime.fromisoformat(request.args['start_date']).date() \
+                if request.args.get('start_date') else end_date - timedelta(days=29)
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use ISO format.'}), 400
+        
+        if start_date > end_date:
+            return jsonify({'error': 'start_date must not be after end_date'}), 400
+        
+        try:
+            series = admin_stats.get_timeseries(metric, bucket, start_date, end_date, space_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(series)
         
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/stripe/transport', methods=['GET'])
+def get_stripe_transport():
+    """Get the Stripe circuit breaker state and per-method latency histograms"""
+    try:
         return jsonify({
-            'total_revenue': float(total_revenue),
-            'revenue_change': round(revenue_change, 1),
-            'total_bookings': total_bookings,
-            'booking_change': round(booking_change, 1),
-            'active_spaces': active_spaces,
-            'maintenance_spaces': maintenance_spaces,
-            'avg_rating': round(float(avg_rating), 1) if avg_rating else 0,
-            'total_reviews': total_reviews
+            'breaker': stripe_http_client.breaker.to_dict(),
+            'latency': stripe_http_client.metrics.snapshot()
         })
         
     except Exception as e:
@@ -70,19 +78,21 @@ def get_dashboard_stats():
 def get_space_performance():
     """Get performance metrics for all spaces"""
     try:
-        # Query space performance data
+        # Per-space totals from the daily rollup, one row per space
+        metrics = db.session.query(
+            DailySpaceMetrics.space_id,
+            func.sum(DailySpaceMetrics.bookings).label('booking_count'),
+            func.sum(DailySpaceMetrics.revenue).label('total_revenue')
+        ).group_by(DailySpaceMetrics.space_id).subquery()
+        
         space_stats = db.session.query(
             RentalSpace.id,
             RentalSpace.name,
             RentalSpace.capacity,
             RentalSpace.price_per_hour,
-            func.count(Reservation.id).label('booking_count'),
-            func.sum(Payment.amount).label('total_revenue')
-        ).outerjoin(Reservation, RentalSpace.id == Reservation.space_id)\
-         .outerjoin(Payment, Reservation.id == Payment.reservation_id)\
-         .filter(Payment.status == 'succeeded')\
-         .group_by(RentalSpace.id, RentalSpace.name, RentalSpace.capacity, RentalSpace.price_per_hour)\
-         .all()
+            metrics.c.booking_count,
+            metrics.c.total_revenue
+        ).outerjoin(metrics, metrics.c.space_id == RentalSpace.id).all()
         
         spaces = []
         for stat in space_stats:
@@ -103,57 +113,118 @@ def get_space_performance():
 
 @admin_bp.route('/reservations/recent', methods=['GET'])
 def get_recent_reservations():
-    """Get recent reservations with customer and space details"""
+    """Get recent reservations with customer and space details, one keyset page at a time"""
     try:
-        limit = request.args.get('limit', 10, type=int)
-        
-        reservations = db.session.query(Reservation)\
-            .join(User, Reservation.user_id == User.id)\
-            .join(RentalSpace, Reservation.space_id == RentalSpace.id)\
-            .order_by(desc(Reservation.created_at))\
-            .limit(limit)\
-            .all()
+        # Payment amount per reservation, correlated so it only runs for the rows on the page
+        payment_amount = db.session.query(func.max(Payment.amount))\
+            .filter(Payment.reservation_id == Reservation.id)\
+            .correlate(Reservation)\
+            .scalar_subquery()
+        
+        query = db.session.query(
+            Reservation.id,
+            RentalSpace.name,
+            User.full_name,
+            Reservation.start_time,
+            Reservation.end_time,
+            Reservation.status,
+            payment_amount.label('amount'),
+            Reservation.created_at
+        ).join(User, Reservation.user_id == User.id)\
+         .join(RentalSpace, Reservation.space_id == RentalSpace.id)
+        
+        try:
+            limit = parse_limit(request.args.get('limit'), default=RECENT_FEED_SIZE)
+            rows, next_cursor = paginate(
+                query,
+                (Reservation.created_at, Reservation.id),
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                key=lambda row: (row.created_at, row.id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         result = []
-        for reservation in reservations:
-            # Get payment info
-            payment = db.session.query(Payment).filter(
-                Payment.reservation_id == reservation.id
-            ).first()
-            
+        for row in rows:
             result.append({
-                'id': str(reservation.id),
-                'space': reservation.space.name,
-                'customer': reservation.user.full_name,
-                'date': reservation.start_time.date().isoformat(),
-                'time': f"{reservation.start_time.strftime('%H:%M')}-{reservation.end_time.strftime('%H:%M')}",
-                'status': reservation.status.value,
-                'amount': float(payment.amount) if payment else 0,
-                'created_at': reservation.created_at.isoformat()
+                'id': str(row.id),
+                'space': row.name,
+                'customer': row.full_name,
+                'date': row.start_time.date().isoformat(),
+                'time': f"{row.start_time.strftime('%H:%M')}-{row.end_time.strftime('%H:%M')}",
+                'status': row.status.value,
+                'amount': float(row.amount) if row.amount is not None else 0,
+                'created_at': row.created_at.isoformat()
             })
         
-        return jsonify(result)
+        return jsonify({
+            'data': result,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/users/summary', methods=['GET'])
 def get_users_summary():
-    """Get user summary with booking and spending statistics"""
+    """Get user summary with booking and spending statistics, one keyset page at a time"""
     try:
-        # Query users with their booking and spending stats
-        user_stats = db.session.query(
+        # Each aggregate is computed once per user and joined once, so payments can't fan out bookings
+        bookings = db.session.query(
+            Reservation.user_id,
+            func.count(Reservation.id).label('booking_count')
+        ).group_by(Reservation.user_id).subquery()
+        
+        spending = db.session.query(
+            Reservation.user_id,
+            func.sum(Payment.amount).label('total_spent')
+        ).join(Payment, Payment.reservation_id == Reservation.id)\
+         .filter(Payment.status == PaymentStatus.SUCCEEDED)\
+         .group_by(Reservation.user_id).subquery()
+        
+        sort_columns = {
+            'join_date': User.created_at,
+            'name': User.full_name,
+            'bookings': func.coalesce(bookings.c.booking_count, 0),
+            'total_spent': func.coalesce(spending.c.total_spent, 0)
+        }
+        sort = request.args.get('sort', 'join_date')
+        order = request.args.get('order', 'desc')
+        if sort not in sort_columns:
+            return jsonify({'error': f'Invalid sort. Use one of {", ".join(sort_columns)}'}), 400
+        if order not in ('asc', 'desc'):
+            return jsonify({'error': 'Invalid order. Use asc or desc'}), 400
+        sort_column = sort_columns[sort]
+        
+        query = db.session.query(
             User.id,
             User.full_name,
             User.email,
             User.created_at,
-            func.count(Reservation.id).label('booking_count'),
-            func.sum(Payment.amount).label('total_spent')
-        ).outerjoin(Reservation, User.id == Reservation.user_id)\
-         .outerjoin(Payment, Reservation.id == Payment.reservation_id)\
-         .filter(Payment.status == 'succeeded')\
-         .group_by(User.id, User.full_name, User.email, User.created_at)\
-         .all()
+            bookings.c.booking_count,
+            spending.c.total_spent,
+            sort_column.label('sort_key')
+        ).outerjoin(bookings, bookings.c.user_id == User.id)\
+         .outerjoin(spending, spending.c.user_id == User.id)
+        
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            user_stats, next_cursor = paginate(
+                query,
+                (sort_column, User.id),
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                descending=order == 'desc',
+                # Cursor values must be JSON numbers, strings or datetimes
+                key=lambda row: (float(row.sort_key) if isinstance(row.sort_key, Decimal) else row.sort_key, row.id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         users = []
         for stat in user_stats:
@@ -167,37 +238,64 @@ def get_users_summary():
                 'joinDate': stat.created_at.strftime('%Y-%m-%d')
             })
         
-        return jsonify(users)
+        return jsonify({
+            'data': users,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @admin_bp.route('/reviews/recent', methods=['GET'])
 def get_recent_reviews():
-    """Get recent reviews with customer and space details"""
+    """Get recent reviews with customer and space details, one keyset page at a time"""
     try:
-        limit = request.args.get('limit', 10, type=int)
-        
-        reviews = db.session.query(Review)\
-            .join(User, Review.user_id == User.id)\
-            .join(RentalSpace, Review.space_id == RentalSpace.id)\
-            .order_by(desc(Review.created_at))\
-            .limit(limit)\
-            .all()
+        query = db.session.query(
+            Review.id,
+            RentalSpace.name,
+            User.full_name,
+            Review.rating,
+            Review.comment,
+            Review.created_at
+        ).join(User, Review.user_id == User.id)\
+         .join(RentalSpace, Review.space_id == RentalSpace.id)
+        
+        try:
+            limit = parse_limit(request.args.get('limit'), default=RECENT_FEED_SIZE)
+            rows, next_cursor = paginate(
+                query,
+                (Review.created_at, Review.id),
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                key=lambda row: (row.created_at, row.id)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         result = []
-        for review in reviews:
+        for row in rows:
             result.append({
-                'id': str(review.id),
-                'space': review.space.name,
-                'customer': review.user.full_name,
-                'rating': review.rating,
-                'comment': review.comment,
-                'date': review.created_at.strftime('%Y-%m-%d'),
-                'created_at': review.created_at.isoformat()
+                'id': str(row.id),
+                'space': row.name,
+                'customer': row.full_name,
+                'rating': row.rating,
+                'comment': row.comment,
+                'date': row.created_at.strftime('%Y-%m-%d'),
+                'created_at': row.created_at.isoformat()
             })
         
-        return jsonify(result)
+        return jsonify({
+            'data': result,
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+        })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -223,6 +321,7 @@ def update_space(space_id):
             space.price_per_hour = data['price_per_hour']
         
         space.updated_at = datetime.utcnow()
+        space.version = RentalSpace.version + 1
         db.session.commit()
         
         return jsonify({
@@ -241,35 +340,47 @@ def update_space(space_id):
 def update_reservation_status(reservation_id):
     """Update reservation status"""
     try:
-        reservation = db.session.query(Reservation).filter(
-            Reservation.id == reservation_id
-        ).first()
-        
-        if not reservation:
-            return jsonify({'error': 'Reservation not found'}), 404
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {}
+        try:
+            new_status = ReservationStatus(data.get('status'))
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid status'}), 400
         
-        data = request.get_json()
-        new_status = data.get('status')
+        # One guarded UPDATE; an illegal change (e.g. reviving a cancelled booking) touches nothing
+        changed = TransitionService.transition_reservations(
+            new_status, Reservation.id == reservation_id, single=True
+        )
         
-        if new_status not in ['pending', 'confirmed', 'cancelled', 'completed']:
-            return jsonify({'error': 'Invalid status'}), 400
+        # Pending payments of a cancelled booking will never be collected; succeeded ones need a refund
+        if new_status == ReservationStatus.CANCELLED and changed:
+            TransitionService.transition_payments(PaymentStatus.FAILED, Payment.reservation_id == reservation_id)
         
-        reservation.status = new_status
-        reservation.updated_at = datetime.utcnow()
+        db.session.commit()
         
-        # If cancelling, update payment status
-        if new_status == 'cancelled':
-            payment = db.session.query(Payment).filter(
-                Payment.reservation_id == reservation.id
+        if not changed:
+            current = db.session.query(Reservation.status, Reservation.updated_at).filter(
+                Reservation.id == reservation_id
             ).first()
-            if payment and payment.status.value == 'succeeded':
-                payment.status = 'failed'  # Use available enum value
+            if not current:
+                return jsonify({'error': 'Reservation not found'}), 404
+            if current.status != new_status:
+                return jsonify({
+                    'error': f'Cannot change a {current.status.value} reservation to {new_status.value}'
+                }), 409
+            return jsonify({
+                'id': reservation_id,
+                'status': current.status.value,
+                'updated_at': current.updated_at.isoformat()
+            })
         
-        db.session.commit()
+        reservation = changed[0]
+        availability_index.record(reservation)
         
         return jsonify({
             'id': str(reservation.id),
-            'status': reservation.status,
+            'status': reservation.status.value,
             'updated_at': reservation.updated_at.isoformat()
         })
         
@@ -286,6 +397,8 @@ def delete_review(review_id):
             return jsonify({'error': 'Review not found'}), 404
         
         db.session.delete(review)
+        RatingSummaryService.record_change(review.space_id, old_rating=review.rating)
+        bump_space_version(review.space_id)
         db.session.commit()
         
         return jsonify({'message': 'Review deleted successfully'})
@@ -294,64 +407,83 @@ def delete_review(review_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Rows fetched per round trip while streaming an export
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_HEADER = [
+    'Reservation ID', 'Customer Name', 'Customer Email', 'Space Name',
+    'Event Date', 'Start Time', 'End Time', 'Status', 'Total Amount',
+    'Created Date'
+]
+
 @admin_bp.route('/export/reservations', methods=['GET'])
 def export_reservations():
-    """Export reservations data as CSV"""
+    """Stream reservations as a CSV download, gzipped when the client accepts it"""
     try:
-        from io import StringIO
-        import csv
-        
-        # Get date range from query params
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-        
-        query = db.session.query(Reservation)\
-            .join(User, Reservation.user_id == User.id)\
-            .join(RentalSpace, Reservation.space_id == RentalSpace.id)
-        
-        if start_date:
-            query = query.filter(Reservation.start_time >= start_date)
-        if end_date:
-            query = query.filter(Reservation.start_time <= end_date)
-        
-        reservations = query.order_by(desc(Reservation.created_at)).all()
-        
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Write header
-        writer.writerow([
-            'Reservation ID', 'Customer Name', 'Customer Email', 'Space Name',
-            'Event Date', 'Start Time', 'End Time', 'Status', 'Total Amount',
-            'Created Date'
-        ])
-        
-        # Write data
-        for reservation in reservations:
-            payment = db.session.query(Payment).filter(
-                Payment.reservation_id == reservation.id
-            ).first()
-            
-            writer.writerow([
-                str(reservation.id),
-                reservation.user.full_name,
-                reservation.user.email,
-                reservation.space.name,
-                reservation.start_time.date().isoformat(),
-                reservation.start_time.strftime('%H:%M'),
-                reservation.end_time.strftime('%H:%M'),
-                reservation.status.value,
-                float(payment.amount) if payment else 0,
-                reservation.created_at.strftime('%Y-%m-%d %H:%M:%S')
-            ])
-        
-        output.seek(0)
-        
-        return jsonify({
-            'csv_data': output.getvalue(),
-            'filename': f'reservations_{datetime.now().strftime("%Y%m%d")}.csv'
-        })
+        # Filters are applied in SQL
+        try:
+            start_date = request.args.get('start_date')
+            end_date = request.args.get('end_date')
+            status = request.args.get('status')
+            start_dt = datetime.fromisoformat(start_date) if start_date else None
+            end_dt = datetime.fromisoformat(end_date) if end_date else None
+            status_enum = ReservationStatus(status) if status else None
+        except ValueError as e:
+            return jsonify({'error': f'Invalid filter: {e}'}), 400
+        
+        # Payment amount per reservation, joined once instead of queried per row
+        payment_amounts = db.session.query(
+            Payment.reservation_id,
+            func.max(Payment.amount).label('amount')
+        ).group_by(Payment.reservation_id).subquery()
+        
+        query = db.session.query(
+            Reservation.id,
+            User.full_name,
+            User.email,
+            RentalSpace.name,
+            Reservation.start_time,
+            Reservation.end_time,
+            Reservation.status,
+            payment_amounts.c.amount,
+            Reservation.created_at
+        ).join(User, Reservation.user_id == User.id)\
+         .join(RentalSpace, Reservation.space_id == RentalSpace.id)\
+         .outerjoin(payment_amounts, payment_amounts.c.reservation_id == Reservation.id)
+        
+        if start_dt:
+            query = query.filter(Reservation.start_time >= start_dt)
+        if end_dt:
+            query = query.filter(Reservation.start_time <= end_dt)
+        if status_enum:
+            query = query.filter(Reservation.status == status_enum)
+        
+        rows = query.order_by(desc(Reservation.created_at), desc(Reservation.id))\
+            .execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+        
+        body = stream_csv(EXPORT_HEADER, ([
+            str(row.id),
+            row.full_name,
+            row.email,
+            row.name,
+            row.start_time.date().isoformat(),
+            row.start_time.strftime('%H:%M'),
+            row.end_time.strftime('%H:%M'),
+            row.status.value,
+            float(row.amount) if row.amount is not None else 0,
+            row.created_at.strftime('%Y-%m-%d %H:%M:%S')
+        ] for row in rows))
+        
+        filename = f'reservations_{datetime.now().strftime("%Y%m%d")}.csv'
+        headers = {
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Vary': 'Accept-Encoding'
+        }
+        if 'gzip' in request.accept_encodings:
+            body = gzip_stream(body)
+            headers['Content-Encoding'] = 'gzip'
+        
+        return Response(stream_with_context(body), status=200, headers=headers, mimetype='text/csv')
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1,7 +1,5 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
-import os
-import tempfile
 from src.services.cloudinary_service import CloudinaryService
 from src.models.rental_models import db, RentalSpace
 
@@ -45,37 +43,31 @@ def upload_image():
         folder = request.form.get('folder', 'jrgraham-center/general')
         public_id = request.form.get('public_id')
         
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.rsplit('.', 1)[1].lower()}") as temp_file:
-            file.save(temp_file.name)
-            
-            # Upload to Cloudinary
-            result = CloudinaryService.upload_image(
-                temp_file.name,
-                folder=folder,
-                public_id=public_id
-            )
-            
-            # Clean up temporary file
-            os.unlink(temp_file.name)
-            
-            if result['success']:
-                return jsonify({
-                    'success': True,
-                    'data': {
-                        'url': result['url'],
-                        'public_id': result['public_id'],
-                        'width': result['width'],
-                        'height': result['height'],
-                        'format': result['format'],
-                        'size_bytes': result['bytes']
-                    }
-                }), 200
-            else:
-                return jsonify({
-                    'success': False,
-                    'error': result['error']
-                }), 500
+        # Upload to Cloudinary straight from the request stream
+        result = CloudinaryService.upload_image(
+            file.stream,
+            folder=folder,
+            public_id=public_id,
+            filename=file.filename
+        )
+        
+        if result['success']:
+            return jsonify({
+                'success': True,
+                'data': {
+                    'url': result['url'],
+                    'public_id': result['public_id'],
+                    'width': result['width'],
+                    'height': result['height'],
+                    'format': result['format'],
+                    'size_bytes': result['bytes']
+                }
+            }), 200
+        else:
+            return jsonify({
+                'success': False,
+                'error': result['error']
+            }), 500
                 
     except Exception as e:
         return jsonify({
@@ -117,31 +109,25 @@ def upload_multiple_images():
                 continue
             
             try:
-                # Create temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.rsplit('.', 1)[1].lower()}") as temp_file:
-                    file.save(temp_file.name)
-                    
-                    # Upload to Cloudinary
-                    result = CloudinaryService.upload_image(
-                        temp_file.name,
-                        folder=folder
-                    )
-                    
-                    # Clean up temporary file
-                    os.unlink(temp_file.name)
-                    
-                    if result['success']:
-                        uploaded_images.append({
-                            'url': result['url'],
-                            'public_id': result['public_id'],
-                            'width': result['width'],
-                            'height': result['height'],
-                            'format': result['format'],
-                            'size_bytes': result['bytes'],
-                            'original_filename': file.filename
-                        })
-                    else:
-                        errors.append(f'File {file.filename}: {result["error"]}')
+                # Upload to Cloudinary straight from the request stream
+                result = CloudinaryService.upload_image(
+                    file.stream,
+                    folder=folder,
+                    filename=file.filename
+                )
+                
+                if result['success']:
+                    uploaded_images.append({
+                        'url': result['url'],
+                        'public_id': result['public_id'],
+                        'width': result['width'],
+                        'height': result['height'],
+                        'format': result['format'],
+                        'size_bytes': result['bytes'],
+                        'original_filename': file.filename
+                    })
+                else:
+                    errors.append(f'File {file.filename}: {result["error"]}')
                         
             except Exception as e:
                 errors.append(f'File {file.filename}: {str(e)}')
@@ -203,23 +189,17 @@ def upload_space_images(space_id):
                 continue
             
             try:
-                # Create temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix=f".{file.filename.rsplit('.', 1)[1].lower()}") as temp_file:
-                    file.save(temp_file.name)
-                    
-                    # Upload to Cloudinary
-                    result = CloudinaryService.upload_image(
-                        temp_file.name,
-                        folder=folder
-                    )
-                    
-                    # Clean up temporary file
-                    os.unlink(temp_file.name)
-                    
-                    if result['success']:
-                        uploaded_images.append(result['url'])
-                    else:
-                        errors.append(f'File {file.filename}: {result["error"]}')
+                # Upload to Cloudinary straight from the request stream
+                result = CloudinaryService.upload_image(
+                    file.stream,
+                    folder=folder,
+                    filename=file.filename
+                )
+                
+                if result['success']:
+                    uploaded_images.append(result['url'])
+                else:
+                    errors.append(f'File {file.filename}: {result["error"]}')
                         
             except Exception as e:
                 errors.append(f'File {file.filename}: {str(e)}')
@@ -229,6 +209,7 @@ def upload_space_images(space_id):
             current_photos = space.photos or []
             updated_photos = current_photos + uploaded_images
             space.photos = updated_photos
+            space.version = RentalSpace.version + 1
             db.session.commit()
         
         return jsonify({
@@ -297,6 +278,7 @@ def delete_space_image(space_id, public_id):
                         updated_photos.append(photo_url)
                 
                 space.photos = updated_photos
+                space.version = RentalSpace.version + 1
                 db.session.commit()
             
             return jsonify({
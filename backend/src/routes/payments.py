@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from src.models.rental_models import db, Payment, Reservation, PaymentStatus, ReservationStatus
 from src.services.stripe_service import StripeService
+from src.services.availability_index import availability_index
+from src.services.reservation_holds import is_hold_expired
+from src.services.stripe_events import StripeEventProcessor, notify_stripe_event_worker
+from src.services.idempotency import idempotent, IDEMPOTENCY_HEADER
+from src.services.transitions import TransitionService
 import os
 
 payments_bp = Blueprint('payments', __name__)
@@ -31,6 +36,7 @@ def get_stripe_config():
         }), 500
 
 @payments_bp.route('/create-payment-intent', methods=['POST'])
+@idempotent('create_payment_intent')
 def create_payment_intent():
     """Create a Stripe Payment Intent for a reservation"""
     try:
@@ -60,6 +66,13 @@ def create_payment_intent():
                 'error': 'Reservation is not in pending status'
             }), 400
         
+        # The slot is only held for a limited time; an expired hold must be booked again
+        if is_hold_expired(reservation):
+            return jsonify({
+                'success': False,
+                'error': 'Reservation hold has expired'
+            }), 409
+        
         # Check if payment already exists
         existing_payment = Payment.query.filter_by(reservation_id=reservation.id).first()
         if existing_payment and existing_payment.status == PaymentStatus.SUCCEEDED:
@@ -75,9 +88,11 @@ def create_payment_intent():
             'space_id': reservation.space_id
         }
         
+        # Forward the client's key so a retry that does reach Stripe reuses the same intent
         result = StripeService.create_payment_intent(
             amount=reservation.total_price,
-            metadata=metadata
+            metadata=metadata,
+            idempotency_key=request.headers.get(IDEMPOTENCY_HEADER)
         )
         
         if not result['success']:
@@ -129,17 +144,6 @@ def confirm_payment():
                     'error': f'Missing required field: {field}'
                 }), 400
         
-        # Get payment record
-        payment = Payment.query.filter_by(
-            stripe_payment_intent_id=data['payment_intent_id']
-        ).first()
-        
-        if not payment:
-            return jsonify({
-                'success': False,
-                'error': 'Payment not found'
-            }), 404
-        
         # Retrieve payment intent from Stripe
         result = StripeService.retrieve_payment_intent(data['payment_intent_id'])
         
@@ -151,28 +155,40 @@ def confirm_payment():
         
         stripe_status = result['payment_intent']['status']
         
-        # Update payment status based on Stripe status
+        # Map the Stripe status to ours
         if stripe_status == 'succeeded':
-            payment.status = PaymentStatus.SUCCEEDED
-            
-            # Update reservation status to confirmed
-            reservation = Reservation.query.get(payment.reservation_id)
-            if reservation:
-                reservation.status = ReservationStatus.CONFIRMED
-            
+            target_status = PaymentStatus.SUCCEEDED
         elif stripe_status == 'requires_payment_method':
-            payment.status = PaymentStatus.FAILED
+            target_status = PaymentStatus.FAILED
         else:
-            payment.status = PaymentStatus.PENDING
+            target_status = PaymentStatus.PENDING
         
+        # Guarded updates: if the webhook got there first, nothing changes here
+        payments, reservations = TransitionService.settle_payment(data['payment_intent_id'], target_status)
         db.session.commit()
+        for reservation in reservations:
+            availability_index.record(reservation)
+        
+        if payments and reservations:
+            payment_status, reservation_status = target_status, reservations[0].status
+        else:
+            # Report whatever state the rows ended up in
+            current = db.session.query(Payment.status, Reservation.status).join(
+                Reservation, Payment.reservation_id == Reservation.id
+            ).filter(Payment.stripe_payment_intent_id == data['payment_intent_id']).first()
+            if current is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Payment not found'
+                }), 404
+            payment_status, reservation_status = current
         
         return jsonify({
             'success': True,
             'data': {
-                'payment_status': payment.status.value,
+                'payment_status': payment_status.value,
                 'stripe_status': stripe_status,
-                'reservation_status': reservation.status.value if reservation else None
+                'reservation_status': reservation_status.value if reservation_status else None
             }
         }), 200
         
@@ -207,40 +223,16 @@ def stripe_webhook():
         
         event = result['event']
         
-        # Handle different event types
-        if event['type'] == 'payment_intent.succeeded':
-            payment_intent = event['data']['object']
-            
-            # Update payment status
-            payment = Payment.query.filter_by(
-                stripe_payment_intent_id=payment_intent['id']
-            ).first()
-            
-            if payment:
-                payment.status = PaymentStatus.SUCCEEDED
-                
-                # Update reservation status
-                reservation = Reservation.query.get(payment.reservation_id)
-                if reservation:
-                    reservation.status = ReservationStatus.CONFIRMED
-                
-                db.session.commit()
-        
-        elif event['type'] == 'payment_intent.payment_failed':
-            payment_intent = event['data']['object']
-            
-            # Update payment status
-            payment = Payment.query.filter_by(
-                stripe_payment_intent_id=payment_intent['id']
-            ).first()
-            
-            if payment:
-                payment.status = PaymentStatus.FAILED
-                db.session.commit()
-        
-        return jsonify({'success': True}), 200
+        # Store the event and acknowledge right away; the event worker applies it.
+        # Stripe redelivers events, so a duplicate is acknowledged without storing it again
+        is_new = StripeEventProcessor.store(event, payload)
+        if is_new:
+            notify_stripe_event_worker()
+        
+        return jsonify({'success': True, 'duplicate': not is_new}), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
@@ -296,10 +288,12 @@ def create_refund():
         
         # Update reservation status to cancelled if full refund
         if not amount or amount >= payment.amount * 100:  # Full refund
-            reservation = Reservation.query.get(payment.reservation_id)
-            if reservation:
-                reservation.status = ReservationStatus.CANCELLED
-                db.session.commit()
+            cancelled = TransitionService.transition_reservations(
+                ReservationStatus.CANCELLED, Reservation.id == payment.reservation_id, single=True
+            )
+            db.session.commit()
+            for reservation in cancelled:
+                availability_index.record(reservation)
         
         return jsonify({
             'success': True,
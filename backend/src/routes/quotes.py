@@ -0,0 +1,79 @@
+from flask import Blueprint, request, jsonify
+from src.services.pricing import PricingService, CURRENCY
+from datetime import datetime
+
+quotes_bp = Blueprint('quotes', __name__)
+
+# Upper bound on windows priced per request
+MAX_QUOTE_WINDOWS = 1000
+
+def _quote_windows(data):
+    """Build the (space_id, start_time, end_time) list from explicit items or spaces x windows"""
+    # Checked before anything is parsed, so an oversized request costs nothing
+    if 'items' in data:
+        if not isinstance(data['items'], list) or not all(isinstance(item, dict) for item in data['items']):
+            raise ValueError('items must be a list of objects')
+        # A missing space_id is reported per item as space_not_found
+        if not all(isinstance(item.get('space_id', ''), str) for item in data['items']):
+            raise ValueError('space_id must be a string')
+        count = len(data['items'])
+    else:
+        space_ids = data['space_ids']
+        if not isinstance(space_ids, list) or not all(isinstance(space_id, str) for space_id in space_ids):
+            raise ValueError('space_ids must be a list of strings')
+        count = len(space_ids) * len(data['windows'])
+    if count > MAX_QUOTE_WINDOWS:
+        raise ValueError(f'A quote request may contain at most {MAX_QUOTE_WINDOWS} windows')
+    
+    if 'items' in data:
+        return [(
+            item.get('space_id'),
+            datetime.fromisoformat(item['start_time']),
+            datetime.fromisoformat(item['end_time'])
+        ) for item in data['items']]
+    
+    # Every candidate window priced for every listed space
+    slots = [(
+        datetime.fromisoformat(window['start_time']),
+        datetime.fromisoformat(window['end_time'])
+    ) for window in data['windows']]
+    return [(space_id, start, end) for space_id in data['space_ids'] for start, end in slots]
+
+@quotes_bp.route('/quotes', methods=['POST'])
+def create_quotes():
+    """Price many (space, start, end) windows in one request"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            data = {}
+        
+        if 'items' not in data and not ('space_ids' in data and 'windows' in data):
+            return jsonify({
+                'success': False,
+                'error': 'Provide either items or space_ids and windows'
+            }), 400
+        
+        try:
+            windows = _quote_windows(data)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid quote windows: {e}'
+            }), 400
+        
+        quotes = PricingService.quote(windows)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'currency': CURRENCY,
+                'quotes': quotes,
+                'quoted_count': sum(1 for quote in quotes if 'reason' not in quote)
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
@@ -1,13 +1,98 @@
-from flask import Blueprint, request, jsonify
-from src.models.rental_models import db, Reservation, RentalSpace, User, ReservationStatus
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from src.models.rental_models import db, Reservation, RentalSpace, User, Availability, ReservationStatus, is_reservation_overlap_error
+from src.services.availability_index import availability_index, SpaceIntervals
+from src.services.reservation_holds import (
+    HoldExpiryService, active_reservation_clause, overlapping_reservation_clause, hold_expiry, is_hold_expired
+)
+from src.services.recurrence import expand_recurrence, parse_rrule, MAX_OCCURRENCES
+from src.services.free_slots import compute_free_slots, load_space_timelines, parse_duration
+from src.services.pagination import paginate, parse_limit
+from src.services.streaming import stream_json_list
+from src.services.occupancy import build_occupancy_bitmaps
+from src.services.pricing import PricingService
+from src.services.idempotency import idempotent
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+from sqlalchemy import exists
+from sqlalchemy.exc import IntegrityError
 
 reservations_bp = Blueprint('reservations', __name__)
 
+def _find_conflict(space_id, start_time, end_time, exclude_id=None):
+    """
+    Find a reservation overlapping the requested time range
+    
+    The in-memory availability index answers most requests without a
+    query: when it sees no conflict, the booking goes ahead and an overlap
+    it missed is still rejected on commit by the reservations_no_overlap
+    constraint (see _commit_reservations). A conflict it reports is
+    confirmed against the database, because the index may lag other
+    workers' writes (e.g. a cancellation made elsewhere).
+    
+    Returns:
+        str: ID of the conflicting reservation, or None
+    """
+    if not availability_index.find_conflict(space_id, start_time, end_time, exclude_id):
+        return None
+    
+    # Pending changes are validated by the constraint at commit, not flushed here
+    query = db.session.query(Reservation.id).execution_options(autoflush=False).filter(
+        overlapping_reservation_clause(space_id, start_time, end_time)
+    )
+    if exclude_id:
+        query = query.filter(Reservation.id != exclude_id)
+    conflict_id = query.limit(1).scalar()
+    
+    if not conflict_id:
+        # The index still holds a booking changed elsewhere; reload it on next use
+        availability_index.invalidate(space_id)
+    return conflict_id
+
+def _commit_reservations(reservations):
+    """
+    Commit reservation writes, mapping the non-overlap constraint to a 409
+    
+    Expired holds on the affected spaces are cancelled in the same
+    transaction first: conflict checks already ignore them, but the
+    constraint still sees them as pending until they are cancelled.
+    
+    Returns:
+        tuple: (response, status) on an overlap conflict, None on success
+    """
+    space_ids = {reservation.space_id for reservation in reservations}
+    try:
+        HoldExpiryService.expire_holds(
+            space_ids=space_ids,
+            exclude_ids=[reservation.id for reservation in reservations if reservation.id]
+        )
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        if not is_reservation_overlap_error(e):
+            raise
+        for space_id in space_ids:
+            availability_index.invalidate(space_id)
+        return jsonify({
+            'success': False,
+            'error': 'Space is not available during the requested time'
+        }), 409
+    
+    for reservation in reservations:
+        availability_index.record(reservation)
+    return None
+
+# Rows fetched per round trip when streaming an export
+STREAM_BATCH_SIZE = 1000
+
+def _reservation_row_dict(reservation, user, space):
+    reservation_dict = reservation.to_dict()
+    reservation_dict['user_name'] = user.full_name
+    reservation_dict['user_email'] = user.email
+    reservation_dict['space_name'] = space.name
+    return reservation_dict
+
 @reservations_bp.route('/reservations', methods=['GET'])
 def get_reservations():
-    """Get reservations with optional filtering"""
+    """Get reservations with optional filtering, paginated by (start_time, id) or streamed"""
     try:
         # Get query parameters
         user_id = request.args.get('user_id')
@@ -52,20 +137,39 @@ def get_reservations():
                     'error': 'Invalid end_date format. Use ISO format.'
                 }), 400
         
-        # Execute query
-        reservations = query.order_by(Reservation.start_time.desc()).all()
+        # Export mode: stream every matching row with flat memory use
+        if request.args.get('stream', '').lower() in ('1', 'true'):
+            rows = query.order_by(Reservation.start_time.desc(), Reservation.id.desc())\
+                .execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE)
+            body = stream_json_list(
+                (_reservation_row_dict(*row) for row in rows),
+                envelope={'success': True}
+            )
+            return Response(stream_with_context(body), status=200, mimetype='application/json')
         
-        reservations_data = []
-        for reservation, user, space in reservations:
-            reservation_dict = reservation.to_dict()
-            reservation_dict['user_name'] = user.full_name
-            reservation_dict['user_email'] = user.email
-            reservation_dict['space_name'] = space.name
-            reservations_data.append(reservation_dict)
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            reservations, next_cursor = paginate(
+                query,
+                (Reservation.start_time, Reservation.id),
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                key=lambda row: (row[0].start_time, row[0].id)
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
         return jsonify({
             'success': True,
-            'data': reservations_data
+            'data': [_reservation_row_dict(*row) for row in reservations],
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
         }), 200
         
     except Exception as e:
@@ -108,6 +212,7 @@ def get_reservation(reservation_id):
         }), 500
 
 @reservations_bp.route('/reservations', methods=['POST'])
+@idempotent('create_reservation')
 def create_reservation():
     """Create a new reservation"""
     try:
@@ -161,25 +266,14 @@ def create_reservation():
             }), 404
         
         # Check for conflicting reservations
-        conflicting_reservation = Reservation.query.filter(
-            Reservation.space_id == data['space_id'],
-            Reservation.status.in_([ReservationStatus.PENDING, ReservationStatus.CONFIRMED]),
-            or_(
-                and_(Reservation.start_time <= start_time, Reservation.end_time > start_time),
-                and_(Reservation.start_time < end_time, Reservation.end_time >= end_time),
-                and_(Reservation.start_time >= start_time, Reservation.end_time <= end_time)
-            )
-        ).first()
-        
-        if conflicting_reservation:
+        if _find_conflict(space.id, start_time, end_time):
             return jsonify({
                 'success': False,
                 'error': 'Space is not available during the requested time'
             }), 409
         
-        # Calculate total price
-        duration_hours = (end_time - start_time).total_seconds() / 3600
-        total_price = float(space.price_per_hour) * duration_hours
+        # Calculate total price (same engine as POST /api/quotes)
+        total_price = PricingService.price(space.price_per_hour, start_time, end_time)
         
         # Create reservation
         reservation = Reservation(
@@ -188,11 +282,14 @@ def create_reservation():
             start_time=start_time,
             end_time=end_time,
             total_price=total_price,
-            status=ReservationStatus.PENDING
+            status=ReservationStatus.PENDING,
+            hold_expires_at=hold_expiry()
         )
         
         db.session.add(reservation)
-        db.session.commit()
+        conflict_response = _commit_reservations([reservation])
+        if conflict_response:
+            return conflict_response
         
         return jsonify({
             'success': True,
@@ -206,6 +303,193 @@ def create_reservation():
             'error': str(e)
         }), 500
 
+def _serialize_slots(slots):
+    return [{
+        'start_time': start.isoformat(),
+        'end_time': end.isoformat(),
+        'duration_minutes': int((end - start).total_seconds() // 60)
+    } for start, end in slots]
+
+BATCH_MODES = ('all_or_nothing', 'best_effort')
+
+def _batch_occurrences(data):
+    """Build the (space_id, start_time, end_time) list for a batch request from occurrences or a recurrence"""
+    if 'occurrences' in data:
+        # Checked before anything is parsed, as expand_recurrence caps before expanding
+        if len(data['occurrences']) > MAX_OCCURRENCES:
+            raise ValueError(f'A batch may contain at most {MAX_OCCURRENCES} occurrences')
+        occurrences = []
+        for occurrence in data['occurrences']:
+            occurrences.append((
+                occurrence.get('space_id', data.get('space_id')),
+                datetime.fromisoformat(occurrence['start_time']),
+                datetime.fromisoformat(occurrence['end_time'])
+            ))
+        return occurrences
+    
+    recurrence = data['recurrence']
+    options = parse_rrule(recurrence['rrule']) if 'rrule' in recurrence else {
+        'freq': recurrence.get('freq'),
+        'interval': recurrence.get('interval', 1),
+        'count': recurrence.get('count'),
+        'until': datetime.fromisoformat(recurrence['until']) if recurrence.get('until') else None,
+        'byday': recurrence.get('byday')
+    }
+    slots = expand_recurrence(
+        datetime.fromisoformat(recurrence['start_time']),
+        datetime.fromisoformat(recurrence['end_time']),
+        **options
+    )
+    return [(data.get('space_id'), start_time, end_time) for start_time, end_time in slots]
+
+@reservations_bp.route('/reservations/batch', methods=['POST'])
+@idempotent('create_reservations_batch')
+def create_reservations_batch():
+    """Create many reservations (an explicit list or a recurrence) in one transaction"""
+    try:
+        data = request.get_json()
+        
+        # Validate required fields
+        if 'user_id' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Missing required field: user_id'
+            }), 400
+        if 'occurrences' not in data and 'recurrence' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Provide either occurrences or recurrence'
+            }), 400
+        
+        mode = data.get('mode', 'all_or_nothing')
+        if mode not in BATCH_MODES:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid mode: {mode}. Use one of {", ".join(BATCH_MODES)}'
+            }), 400
+        
+        try:
+            occurrences = _batch_occurrences(data)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid occurrences: {e}'
+            }), 400
+        
+        if not occurrences:
+            return jsonify({
+                'success': False,
+                'error': 'No occurrences to book'
+            }), 400
+        
+        user = User.query.get(data['user_id'])
+        if not user:
+            return jsonify({
+                'success': False,
+                'error': 'User not found'
+            }), 404
+        
+        # Load every referenced space in one query
+        space_ids = {space_id for space_id, _, _ in occurrences if space_id}
+        spaces = {space.id: space for space in RentalSpace.query.filter(RentalSpace.id.in_(space_ids))}
+        
+        # One range query per space covering all of its occurrences
+        booked = {}
+        for space_id in spaces:
+            space_slots = [(start, end) for sid, start, end in occurrences if sid == space_id]
+            rows = db.session.query(
+                Reservation.start_time, Reservation.end_time, Reservation.id
+            ).filter(
+                Reservation.space_id == space_id,
+                active_reservation_clause(),
+                Reservation.start_time < max(end for _, end in space_slots),
+                Reservation.end_time > min(start for start, _ in space_slots)
+            ).all()
+            booked[space_id] = SpaceIntervals(rows)
+        
+        now = datetime.now()
+        accepted = []
+        conflicts = []
+        for index, (space_id, start_time, end_time) in enumerate(occurrences):
+            occurrence = {
+                'index': index,
+                'space_id': space_id,
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat()
+            }
+            
+            if space_id not in spaces:
+                reason, conflicting_id = 'space_not_found', None
+            elif start_time >= end_time:
+                reason, conflicting_id = 'invalid_time_range', None
+            elif start_time < now:
+                reason, conflicting_id = 'start_in_past', None
+            else:
+                # Earlier accepted occurrences are added to the same interval
+                # set, so occurrences overlapping each other are caught too
+                conflicting_id = booked[space_id].find_conflict(start_time, end_time)
+                reason = 'conflict' if conflicting_id else None
+            
+            if reason:
+                occurrence['reason'] = reason
+                if conflicting_id and conflicting_id.startswith('batch:'):
+                    occurrence['conflicting_occurrence_index'] = int(conflicting_id.split(':', 1)[1])
+                elif conflicting_id:
+                    occurrence['conflicting_reservation_id'] = conflicting_id
+                conflicts.append(occurrence)
+                continue
+            
+            booked[space_id].add(start_time, end_time, f'batch:{index}')
+            accepted.append((index, space_id, start_time, end_time))
+        
+        if (conflicts and mode == 'all_or_nothing') or not accepted:
+            return jsonify({
+                'success': False,
+                'error': 'One or more occurrences are not available',
+                'data': {
+                    'mode': mode,
+                    'conflicts': conflicts
+                }
+            }), 409
+        
+        # Price every accepted occurrence and insert them in one transaction
+        reservations = []
+        expires_at = hold_expiry()
+        for index, space_id, start_time, end_time in accepted:
+            reservations.append(Reservation(
+                user_id=user.id,
+                space_id=space_id,
+                start_time=start_time,
+                end_time=end_time,
+                total_price=PricingService.price(spaces[space_id].price_per_hour, start_time, end_time),
+                status=ReservationStatus.PENDING,
+                hold_expires_at=expires_at
+            ))
+        
+        db.session.add_all(reservations)
+        conflict_response = _commit_reservations(reservations)
+        if conflict_response:
+            return conflict_response
+        
+        created = [reservation.to_dict() for reservation in reservations]
+        return jsonify({
+            'success': True,
+            'data': {
+                'mode': mode,
+                'reservations': created,
+                'created_count': len(created),
+                'total_price': float(sum(reservation.total_price for reservation in reservations)),
+                'conflicts': conflicts
+            }
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @reservations_bp.route('/reservations/<reservation_id>', methods=['PUT'])
 def update_reservation(reservation_id):
     """Update a reservation"""
@@ -219,6 +503,13 @@ def update_reservation(reservation_id):
         
         data = request.get_json()
         
+        # An expired hold no longer owns its slot; it can only be cancelled
+        if is_hold_expired(reservation) and data.get('status') != ReservationStatus.CANCELLED.value:
+            return jsonify({
+                'success': False,
+                'error': 'Reservation hold has expired'
+            }), 409
+        
         # Update status if provided
         if 'status' in data:
             try:
@@ -250,32 +541,21 @@ def update_reservation(reservation_id):
                     }), 400
                 
                 # Check for conflicts (excluding current reservation)
-                conflicting_reservation = Reservation.query.filter(
-                    Reservation.space_id == reservation.space_id,
-                    Reservation.id != reservation.id,
-                    Reservation.status.in_([ReservationStatus.PENDING, ReservationStatus.CONFIRMED]),
-                    or_(
-                        and_(Reservation.start_time <= start_time, Reservation.end_time > start_time),
-                        and_(Reservation.start_time < end_time, Reservation.end_time >= end_time),
-                        and_(Reservation.start_time >= start_time, Reservation.end_time <= end_time)
-                    )
-                ).first()
-                
-                if conflicting_reservation:
+                if _find_conflict(reservation.space_id, start_time, end_time, exclude_id=reservation.id):
                     return jsonify({
                         'success': False,
                         'error': 'Space is not available during the requested time'
                     }), 409
                 
                 # Update times and recalculate price
+                space = RentalSpace.query.get(reservation.space_id)
                 reservation.start_time = start_time
                 reservation.end_time = end_time
-                
-                space = RentalSpace.query.get(reservation.space_id)
-                duration_hours = (end_time - start_time).total_seconds() / 3600
-                reservation.total_price = float(space.price_per_hour) * duration_hours
+                reservation.total_price = PricingService.price(space.price_per_hour, start_time, end_time)
         
-        db.session.commit()
+        conflict_response = _commit_reservations([reservation])
+        if conflict_response:
+            return conflict_response
         
         return jsonify({
             'success': True,
@@ -309,6 +589,7 @@ def cancel_reservation(reservation_id):
         
         reservation.status = ReservationStatus.CANCELLED
         db.session.commit()
+        availability_index.record(reservation)
         
         return jsonify({
             'success': True,
@@ -345,6 +626,15 @@ def check_availability(space_id):
                 'error': 'Invalid date format. Use ISO format.'
             }), 400
         
+        try:
+            granularity = parse_duration(request.args.get('granularity'))
+            min_duration = parse_duration(request.args.get('min_duration'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
         # Verify space exists
         space = RentalSpace.query.get(space_id)
         if not space:
@@ -353,22 +643,48 @@ def check_availability(space_id):
                 'error': 'Space not found'
             }), 404
         
-        # Get existing reservations in the date range
-        reservations = Reservation.query.filter(
-            Reservation.space_id == space_id,
-            Reservation.status.in_([ReservationStatus.PENDING, ReservationStatus.CONFIRMED]),
-            Reservation.start_time < end_dt,
-            Reservation.end_time > start_dt
-        ).all()
+        # Get existing reservations in the date range, from the index when it covers the range
+        intervals = availability_index.overlapping(space_id, start_dt, end_dt)
+        if intervals is None:
+            intervals = db.session.query(
+                Reservation.start_time, Reservation.end_time, Reservation.id
+            ).filter(
+                overlapping_reservation_clause(space_id, start_dt, end_dt)
+            ).order_by(Reservation.start_time).all()
         
         unavailable_slots = []
-        for reservation in reservations:
+        for slot_start, slot_end, reservation_id in intervals:
             unavailable_slots.append({
-                'start_time': reservation.start_time.isoformat(),
-                'end_time': reservation.end_time.isoformat(),
-                'reservation_id': reservation.id
+                'start_time': slot_start.isoformat(),
+                'end_time': slot_end.isoformat(),
+                'reservation_id': reservation_id
             })
         
+        # Opening hours and blackouts for the free-slot computation
+        availability_rows = db.session.query(
+            Availability.start_time, Availability.end_time, Availability.is_available
+        ).filter(
+            Availability.space_id == space_id,
+            Availability.start_time < end_dt,
+            Availability.end_time > start_dt
+        ).all()
+        # Opening hours that all fall outside the range close the space, rather than leave it always open
+        has_opening_hours = db.session.query(exists().where(
+            Availability.space_id == space_id,
+            Availability.is_available.is_(True)
+        )).scalar()
+        
+        free_slots = compute_free_slots(
+            start_dt, end_dt,
+            reservations=[(slot_start, slot_end) for slot_start, slot_end, _ in intervals],
+            blackouts=[(row.start_time, row.end_time) for row in availability_rows if not row.is_available],
+            opening_hours=[
+                (row.start_time, row.end_time) for row in availability_rows if row.is_available
+            ] if has_opening_hours else None,
+            granularity=granularity,
+            min_duration=min_duration
+        )
+        
         return jsonify({
             'success': True,
             'data': {
@@ -376,7 +692,135 @@ def check_availability(space_id):
                 'space_name': space.name,
                 'query_start': start_dt.isoformat(),
                 'query_end': end_dt.isoformat(),
-                'unavailable_slots': unavailable_slots
+                'unavailable_slots': unavailable_slots,
+                'free_slots': _serialize_slots(free_slots)
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@reservations_bp.route('/availability', methods=['GET'])
+def check_availability_multi():
+    """Compute free slots for several spaces within a date range"""
+    try:
+        space_ids = [space_id for space_id in request.args.get('space_ids', '').split(',') if space_id]
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        
+        if not space_ids or not start_date or not end_date:
+            return jsonify({
+                'success': False,
+                'error': 'space_ids, start_date and end_date parameters are required'
+            }), 400
+        
+        try:
+            start_dt = datetime.fromisoformat(start_date)
+            end_dt = datetime.fromisoformat(end_date)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid date format. Use ISO format.'
+            }), 400
+        
+        try:
+            granularity = parse_duration(request.args.get('granularity'))
+            min_duration = parse_duration(request.args.get('min_duration'))
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        # Reservations, opening hours and blackouts of every space in one query
+        timelines = load_space_timelines(space_ids, start_dt, end_dt)
+        
+        spaces_data = []
+        for space_id in space_ids:
+            timeline = timelines.get(space_id)
+            if timeline is None:
+                continue
+            free_slots = compute_free_slots(
+                start_dt, end_dt,
+                reservations=timeline['reservations'],
+                blackouts=timeline['blackouts'],
+                opening_hours=timeline['opening_hours'],
+                granularity=granularity,
+                min_duration=min_duration
+            )
+            spaces_data.append({
+                'space_id': space_id,
+                'free_slots': _serialize_slots(free_slots)
+            })
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'query_start': start_dt.isoformat(),
+                'query_end': end_dt.isoformat(),
+                'spaces': spaces_data,
+                'missing_space_ids': [space_id for space_id in space_ids if space_id not in timelines]
+            }
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@reservations_bp.route('/calendar', methods=['GET'])
+def get_calendar():
+    """Get compact per-space occupancy bitmaps for a calendar window"""
+    try:
+        from_date = request.args.get('from')
+        to_date = request.args.get('to')
+        
+        if not from_date or not to_date:
+            return jsonify({
+                'success': False,
+                'error': 'from and to parameters are required'
+            }), 400
+        
+        try:
+            start_dt = datetime.fromisoformat(from_date)
+            end_dt = datetime.fromisoformat(to_date)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid date format. Use ISO format.'
+            }), 400
+        
+        if start_dt >= end_dt:
+            return jsonify({
+                'success': False,
+                'error': 'to must be after from'
+            }), 400
+        
+        space_ids = [space_id for space_id in request.args.get('space_ids', '').split(',') if space_id]
+        
+        try:
+            granularity = parse_duration(request.args.get('granularity'), default=timedelta(minutes=15))
+            calendar = build_occupancy_bitmaps(start_dt, end_dt, granularity, space_ids or None)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'from': start_dt.isoformat(),
+                'to': end_dt.isoformat(),
+                'granularity_minutes': int(granularity.total_seconds() // 60),
+                'slot_count': calendar['slot_count'],
+                # Bit i (MSB first) of each bitmap covers [from + i * granularity, from + (i + 1) * granularity)
+                'encoding': 'base64-msb-first',
+                'spaces': calendar['spaces']
             }
         }), 200
         
@@ -1,54 +1,64 @@
 from flask import Blueprint, request, jsonify
-from src.models.rental_models import db, Review, Reservation, User, RentalSpace
-from sqlalchemy import func, desc
+from src.models.rental_models import db, Review, Reservation, User, RentalSpace, SpaceRatingSummary
+from src.services.rating_summary_service import RatingSummaryService
+from src.services.catalog_cache import bump_space_version
+from src.services.pagination import paginate, parse_limit
+from sqlalchemy import desc
 
 reviews_bp = Blueprint('reviews', __name__)
 
 @reviews_bp.route('/spaces/<space_id>/reviews', methods=['GET'])
 def get_space_reviews(space_id):
-    """Get all reviews for a specific space"""
+    """Get reviews for a specific space, newest first, paginated by (created_at, id)"""
     try:
-        # Verify space exists
-        space = RentalSpace.query.get(space_id)
-        if not space:
+        # Verify space exists and load its rating summary in one query
+        result = db.session.query(RentalSpace.id, SpaceRatingSummary).outerjoin(
+            SpaceRatingSummary, SpaceRatingSummary.space_id == RentalSpace.id
+        ).filter(RentalSpace.id == space_id).first()
+        if not result:
             return jsonify({
                 'success': False,
                 'error': 'Space not found'
             }), 404
+        summary = result[1]
+        
+        # Get one page of reviews with the reviewer's name projected in the join
+        query = db.session.query(Review, User.full_name).join(
+            User, Review.user_id == User.id
+        ).filter(Review.space_id == space_id)
+        
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            reviews, next_cursor = paginate(
+                query,
+                (Review.created_at, Review.id),
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                key=lambda row: (row[0].created_at, row[0].id)
+            )
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        # Get reviews with user information
-        reviews = db.session.query(Review, User).join(User).filter(
-            Review.space_id == space_id
-        ).order_by(desc(Review.created_at)).all()
-        
-        reviews_data = []
-        for review, user in reviews:
-            review_dict = review.to_dict()
-            review_dict['user_name'] = user.full_name
-            reviews_data.append(review_dict)
-        
-        # Calculate summary statistics
-        avg_rating = db.session.query(func.avg(Review.rating)).filter_by(space_id=space_id).scalar()
-        review_count = len(reviews_data)
-        
-        # Calculate rating distribution
-        rating_distribution = {}
-        for i in range(1, 6):
-            count = db.session.query(func.count(Review.id)).filter(
-                Review.space_id == space_id,
-                Review.rating == i
-            ).scalar()
-            rating_distribution[str(i)] = count or 0
+        reviews_data = [review.to_dict(user_name=user_name) for review, user_name in reviews]
         
         return jsonify({
             'success': True,
             'data': {
                 'reviews': reviews_data,
                 'summary': {
-                    'average_rating': float(avg_rating) if avg_rating else 0,
-                    'total_reviews': review_count,
-                    'rating_distribution': rating_distribution
+                    'average_rating': summary.average_rating if summary else 0,
+                    'total_reviews': summary.review_count if summary else 0,
+                    'rating_distribution': summary.rating_distribution() if summary else
+                                           {str(i): 0 for i in range(1, 6)}
                 }
+            },
+            'pagination': {
+                'limit': limit,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
             }
         }), 200
         
@@ -107,6 +117,8 @@ def create_review():
         )
         
         db.session.add(review)
+        RatingSummaryService.record_change(review.space_id, new_rating=rating)
+        bump_space_version(review.space_id)
         db.session.commit()
         
         return jsonify({
@@ -133,6 +145,7 @@ def update_review(review_id):
             }), 404
         
         data = request.get_json()
+        old_rating = review.rating
         
         # Update rating if provided
         if 'rating' in data:
@@ -148,6 +161,9 @@ def update_review(review_id):
         if 'comment' in data:
             review.comment = data['comment'].strip() or None
         
+        if review.rating != old_rating:
+            RatingSummaryService.record_change(review.space_id, old_rating=old_rating, new_rating=review.rating)
+            bump_space_version(review.space_id)
         db.session.commit()
         
         return jsonify({
@@ -174,6 +190,8 @@ def delete_review(review_id):
             }), 404
         
         db.session.delete(review)
+        RatingSummaryService.record_change(review.space_id, old_rating=review.rating)
+        bump_space_version(review.space_id)
         db.session.commit()
         
         return jsonify({
@@ -207,7 +225,7 @@ def get_user_reviews(user_id):
         
         reviews_data = []
         for review, space in reviews:
-            review_dict = review.to_dict()
+            review_dict = review.to_dict(user_name=user.full_name)
             review_dict['space_name'] = space.name
             reviews_data.append(review_dict)
         
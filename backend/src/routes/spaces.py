@@ -1,32 +1,49 @@
-from flask import Blueprint, request, jsonify
-from src.models.rental_models import db, RentalSpace, Review
-from sqlalchemy import func
+from flask import Blueprint, request, jsonify, current_app
+from src.models.rental_models import db, RentalSpace, SpaceRatingSummary
+from src.services.catalog_cache import spaces_response_cache, catalogue_etag, space_etag
 
 spaces_bp = Blueprint('spaces', __name__)
 
+def _space_with_rating(space, summary):
+    """Serialize a space together with its materialized rating summary"""
+    space_dict = space.to_dict()
+    space_dict['average_rating'] = summary.average_rating if summary else 0
+    space_dict['review_count'] = summary.review_count if summary else 0
+    return space_dict
+
+def _spaces_with_ratings_query():
+    return db.session.query(RentalSpace, SpaceRatingSummary).outerjoin(
+        SpaceRatingSummary, SpaceRatingSummary.space_id == RentalSpace.id
+    )
+
+def _cached_json_response(cache_key, etag, build_payload):
+    """Serve a JSON body for an ETag, answering 304 or reusing the cached serialization"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        body = spaces_response_cache.get(cache_key, etag)
+        if body is None:
+            body = current_app.json.dumps(build_payload())
+            spaces_response_cache.put(cache_key, etag, body)
+        response = current_app.response_class(body, status=200, mimetype='application/json')
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @spaces_bp.route('/spaces', methods=['GET'])
 def get_spaces():
     """Get all rental spaces with optional filtering"""
     try:
-        spaces = RentalSpace.query.all()
-        spaces_data = []
-        
-        for space in spaces:
-            space_dict = space.to_dict()
-            
-            # Add average rating and review count
-            avg_rating = db.session.query(func.avg(Review.rating)).filter_by(space_id=space.id).scalar()
-            review_count = db.session.query(func.count(Review.id)).filter_by(space_id=space.id).scalar()
-            
-            space_dict['average_rating'] = float(avg_rating) if avg_rating else 0
-            space_dict['review_count'] = review_count or 0
-            
-            spaces_data.append(space_dict)
+        def build_payload():
+            # Spaces and their rating summaries in a single joined query
+            spaces = _spaces_with_ratings_query().all()
+            return {
+                'success': True,
+                'data': [_space_with_rating(space, summary) for space, summary in spaces]
+            }
         
-        return jsonify({
-            'success': True,
-            'data': spaces_data
-        }), 200
+        return _cached_json_response('spaces', catalogue_etag(), build_payload)
         
     except Exception as e:
         return jsonify({
@@ -38,26 +55,21 @@ def get_spaces():
 def get_space(space_id):
     """Get a specific rental space by ID"""
     try:
-        space = RentalSpace.query.get(space_id)
-        if not space:
+        etag = space_etag(space_id)
+        if etag is None:
             return jsonify({
                 'success': False,
                 'error': 'Space not found'
             }), 404
         
-        space_dict = space.to_dict()
-        
-        # Add average rating and review count
-        avg_rating = db.session.query(func.avg(Review.rating)).filter_by(space_id=space.id).scalar()
-        review_count = db.session.query(func.count(Review.id)).filter_by(space_id=space.id).scalar()
-        
-        space_dict['average_rating'] = float(avg_rating) if avg_rating else 0
-        space_dict['review_count'] = review_count or 0
+        def build_payload():
+            space, summary = _spaces_with_ratings_query().filter(RentalSpace.id == space_id).one()
+            return {
+                'success': True,
+                'data': _space_with_rating(space, summary)
+            }
         
-        return jsonify({
-            'success': True,
-            'data': space_dict
-        }), 200
+        return _cached_json_response(f'spaces/{space_id}', etag, build_payload)
         
     except Exception as e:
         return jsonify({
@@ -128,6 +140,7 @@ def update_space(space_id):
         if 'photos' in data:
             space.photos = data['photos']
         
+        space.version = RentalSpace.version + 1
         db.session.commit()
         
         return jsonify({
@@ -155,6 +168,7 @@ def delete_space(space_id):
         
         db.session.delete(space)
         db.session.commit()
+        spaces_response_cache.invalidate(f'spaces/{space_id}')
         
         return jsonify({
             'success': True,
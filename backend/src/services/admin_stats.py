@@ -0,0 +1,243 @@
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import event, func, select, true
+from sqlalchemy.orm import Session
+from src.models.rental_models import db, RentalSpace, Reservation, Payment, DailySpaceMetrics, SpaceRatingSummary
+from src.services.response_cache import TTLCache
+
+# The admin dashboard polls its stats; serve them from memory for a few seconds
+admin_stats_cache = TTLCache(ttl_seconds=int(os.getenv('ADMIN_STATS_TTL', '30')))
+
+_TRACKED_MODELS = (Reservation, Payment)
+_STALE_FLAG = 'admin_stats_stale'
+
+
+def compute_dashboard_stats(now=None):
+    """
+    Compute the admin dashboard overview in one query
+
+    Each source is aggregated once in its own single-row CTE, with FILTER
+    clauses for the last-30-days figures, and the CTEs are cross joined.
+    Revenue and bookings are read from the daily_space_metrics rollup
+    rather than the payments and reservations history. The rollup counts
+    a booking on the day it starts, so the recent window ends today:
+    future-dated bookings are not "recent".
+
+    Returns:
+        dict: Raw totals (revenue as Decimal)
+    """
+    today = (now or datetime.now()).date()
+    since = today - timedelta(days=30)
+    recent = DailySpaceMetrics.day.between(since, today)
+
+    metrics = select(
+        func.coalesce(func.sum(DailySpaceMetrics.revenue), 0).label('total_revenue'),
+        func.coalesce(func.sum(DailySpaceMetrics.revenue).filter(recent), 0)
+            .label('recent_revenue'),
+        func.coalesce(func.sum(DailySpaceMetrics.bookings), 0).label('total_bookings'),
+        func.coalesce(func.sum(DailySpaceMetrics.bookings).filter(recent), 0)
+            .label('recent_bookings')
+    ).cte('metric_stats')
+
+    spaces = select(func.count(RentalSpace.id).label('total_spaces')).cte('space_stats')
+
+    # Review totals come from the materialized per-space summaries
+    reviews = select(
+        func.coalesce(func.sum(SpaceRatingSummary.review_count), 0).label('total_reviews'),
+        func.coalesce(func.sum(SpaceRatingSummary.rating_sum), 0).label('rating_sum')
+    ).cte('review_stats')
+
+    row = db.session.execute(
+        select(metrics, spaces, reviews)
+        .select_from(metrics)
+        .join(spaces, true())
+        .join(reviews, true())
+    ).one()
+    return dict(row._mapping)
+
+
+def get_dashboard_stats():
+    """
+    Dashboard overview as served by GET /api/admin/dashboard/stats, cached for ADMIN_STATS_TTL seconds
+
+    Returns:
+        dict: The response payload
+    """
+    stats = admin_stats_cache.get('dashboard')
+    if stats is not None:
+        return stats
+
+    totals = compute_dashboard_stats()
+    total_revenue = float(totals['total_revenue'])
+    total_bookings = int(totals['total_bookings'])
+    total_reviews = int(totals['total_reviews'])
+
+    stats = {
+        'total_revenue': total_revenue,
+        'revenue_change': round(float(totals['recent_revenue']) / total_revenue * 100, 1) if total_revenue else 0,
+        'total_bookings': total_bookings,
+        'booking_change': round(int(totals['recent_bookings']) / total_bookings * 100, 1) if total_bookings else 0,
+        # All spaces are considered active (the status field doesn't exist)
+        'active_spaces': totals['total_spaces'],
+        'maintenance_spaces': 0,
+        'avg_rating': round(int(totals['rating_sum']) / total_reviews, 1) if total_reviews else 0,
+        'total_reviews': total_reviews
+    }
+    admin_stats_cache.put('dashboard', stats)
+    return stats
+
+
+TIMESERIES_METRICS = ('revenue', 'bookings', 'utilization')
+TIMESERIES_BUCKETS = ('day', 'week', 'month')
+
+# Upper bound on points per series
+MAX_TIMESERIES_POINTS = 1000
+
+
+def _bucket_expression(dialect_name, bucket):
+    """SQL expression truncating DailySpaceMetrics.day to the start of its bucket (weeks start on Monday)"""
+    day = DailySpaceMetrics.day
+    if dialect_name == 'postgresql':
+        return func.date_trunc(bucket, day)
+    if bucket == 'day':
+        return day
+    if bucket == 'week':
+        # Forward to the week's Sunday, then back to its Monday
+        return func.date(day, 'weekday 0', '-6 days')
+    return func.strftime('%Y-%m-01', day)
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day, bucket):
+    if bucket == 'week':
+        return day + timedelta(weeks=1)
+    if bucket == 'month':
+        return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+    return day + timedelta(days=1)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def get_timeseries(metric, bucket, start_date, end_date, space_id=None):
+    """
+    Bucketed, gap-filled metric series from the daily rollup, cached for ADMIN_STATS_TTL seconds
+
+    Utilization is confirmed booked time divided by the bucket's wall-clock
+    time (24 hours a day) times the number of spaces, so 0.25 means a
+    quarter of the available space-hours were booked.
+
+    Args:
+        metric: revenue, bookings or utilization
+        bucket: day, week or month
+        start_date: First day of the range (date)
+        end_date: Last day of the range, inclusive (date)
+        space_id: Restrict to one space (None for all spaces)
+
+    Returns:
+        dict: The response payload with one point per bucket
+    """
+    cache_key = ('timeseries', metric, bucket, start_date, end_date, space_id)
+    series = admin_stats_cache.get(cache_key)
+    if series is not None:
+        return series
+
+    buckets = []
+    cursor = _bucket_start(start_date, bucket)
+    while cursor <= end_date:
+        buckets.append(cursor)
+        if len(buckets) > MAX_TIMESERIES_POINTS:
+            raise ValueError(f'Range too large: more than {MAX_TIMESERIES_POINTS} {bucket} buckets')
+        cursor = _next_bucket(cursor, bucket)
+
+    bucket_start = _bucket_expression(db.engine.dialect.name, bucket).label('bucket_start')
+    value = {
+        'revenue': func.sum(DailySpaceMetrics.revenue),
+        'bookings': func.sum(DailySpaceMetrics.bookings),
+        'utilization': func.sum(DailySpaceMetrics.booked_seconds)
+    }[metric].label('value')
+    space_count = select(func.count(RentalSpace.id))
+    if space_id:
+        space_count = space_count.where(RentalSpace.id == space_id)
+
+    query = select(bucket_start, value, space_count.scalar_subquery().label('space_count')).where(
+        DailySpaceMetrics.day >= start_date,
+        DailySpaceMetrics.day <= end_date
+    ).group_by(bucket_start)
+    if space_id:
+        query = query.where(DailySpaceMetrics.space_id == space_id)
+
+    totals = {}
+    spaces = None
+    for row in db.session.execute(query):
+        totals[_as_date(row.bucket_start)] = row.value or 0
+        spaces = row.space_count
+    if spaces is None:
+        spaces = db.session.execute(space_count).scalar()
+
+    points = []
+    for start in buckets:
+        total = totals.get(start, 0)
+        if metric == 'utilization':
+            # Only the part of an edge bucket inside the requested range is available
+            days = (min(_next_bucket(start, bucket), end_date + timedelta(days=1)) - max(start, start_date)).days
+            available = days * 86400 * spaces
+            total = round(int(total) / available, 4) if available else 0
+        elif metric == 'revenue':
+            total = float(total)
+        else:
+            total = int(total)
+        points.append({'bucket_start': start.isoformat(), 'value': total})
+
+    series = {
+        'metric': metric,
+        'bucket': bucket,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'space_id': space_id,
+        'points': points
+    }
+    admin_stats_cache.put(cache_key, series)
+    return series
+
+
+# Invalidate on every committed reservation or payment write, whether it went
+# through the unit of work or a bulk UPDATE/DELETE
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_writes(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, _TRACKED_MODELS):
+            session.info[_STALE_FLAG] = True
+            return
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_writes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and \
+            orm_execute_state.bind_mapper is not None and \
+            orm_execute_state.bind_mapper.class_ in _TRACKED_MODELS:
+        orm_execute_state.session.info[_STALE_FLAG] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop(_STALE_FLAG, False):
+        admin_stats_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _reset_on_rollback(session, previous_transaction):
+    session.info.pop(_STALE_FLAG, None)
@@ -0,0 +1,236 @@
+import os
+import random
+import threading
+from datetime import datetime
+from src.models.rental_models import db, Reservation, ReservationStatus
+from src.services.reservation_holds import active_reservation_clause
+
+ACTIVE_STATUSES = (ReservationStatus.PENDING, ReservationStatus.CONFIRMED)
+
+
+class _IntervalNode:
+    __slots__ = ('key', 'end', 'priority', 'left', 'right', 'max_end')
+
+    def __init__(self, key, end):
+        self.key = key
+        self.end = end
+        self.priority = random.random()
+        self.left = self.right = None
+        self.max_end = end
+
+
+def _refresh(node):
+    node.max_end = node.end
+    for child in (node.left, node.right):
+        if child is not None and child.max_end > node.max_end:
+            node.max_end = child.max_end
+    return node
+
+
+def _split(node, key):
+    """Split a treap into the nodes with keys below `key` and the rest"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _refresh(node), right
+    left, node.left = _split(node.left, key)
+    return left, _refresh(node)
+
+
+def _merge(left, right):
+    """Join two treaps where every key in `left` is below every key in `right`"""
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _refresh(left)
+    right.left = _merge(left, right.left)
+    return _refresh(right)
+
+
+def _erase(node, key):
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _erase(node.left, key)
+    else:
+        node.right = _erase(node.right, key)
+    return _refresh(node)
+
+
+class SpaceIntervals:
+    """
+    Active reservation intervals of one space, sorted by start time
+
+    The intervals live in a treap keyed by (start, reservation_id) in
+    which every node also records the latest end time in its subtree.
+    Adding or removing a booking is O(log n) expected, and an overlap
+    query skips every subtree that ends before the requested start, so it
+    costs O(log n) plus the overlaps found, even if legacy data contains
+    overlapping rows.
+    """
+
+    def __init__(self, intervals=()):
+        self._root = None
+        # reservation_id -> tree key, for removal by ID
+        self._keys = {}
+        for start, end, reservation_id in intervals:
+            self.add(start, end, reservation_id)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, start, end, reservation_id):
+        """Insert an interval (replacing any indexed one with the same reservation ID)"""
+        self.remove(reservation_id)
+        key = (start, reservation_id)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _IntervalNode(key, end)), right)
+        self._keys[reservation_id] = key
+
+    def remove(self, reservation_id):
+        """Remove an interval by reservation ID; returns False if it was not indexed"""
+        key = self._keys.pop(reservation_id, None)
+        if key is None:
+            return False
+        self._root = _erase(self._root, key)
+        return True
+
+    def _overlapping_nodes(self, node, start, end):
+        # In start order; a subtree whose latest end is not after `start` holds no overlap
+        if node is None or node.max_end <= start:
+            return
+        yield from self._overlapping_nodes(node.left, start, end)
+        if node.key[0] < end:
+            if node.end > start:
+                yield node
+            yield from self._overlapping_nodes(node.right, start, end)
+
+    def find_conflict(self, start, end, exclude_id=None):
+        """
+        Find an interval overlapping [start, end)
+
+        Args:
+            start: Requested start time
+            end: Requested end time
+            exclude_id: Reservation ID to ignore (the one being rescheduled)
+
+        Returns:
+            str: ID of a conflicting reservation, or None
+        """
+        for node in self._overlapping_nodes(self._root, start, end):
+            if node.key[1] != exclude_id:
+                return node.key[1]
+        return None
+
+    def overlapping(self, start, end):
+        """
+        List intervals overlapping [start, end) in start-time order
+
+        Returns:
+            list: (start, end, reservation_id) tuples
+        """
+        return [(node.key[0], node.end, node.key[1]) for node in self._overlapping_nodes(self._root, start, end)]
+
+
+class AvailabilityIndex:
+    """
+    Lazily loaded per-space interval index of active reservations
+
+    Each space is loaded on first use with the reservations that have not
+    ended yet, then kept current by the reservation write paths. Other
+    workers' writes are only picked up on reload, so entries expire after
+    `ttl_seconds`; the database check inside the write transaction remains
+    authoritative. Pending holds are dropped as soon as they expire.
+    """
+
+    def __init__(self, ttl_seconds=60):
+        self.ttl_seconds = ttl_seconds
+        self._spaces = {}
+        self._lock = threading.RLock()
+
+    def _load(self, space_id):
+        horizon = datetime.now()
+        rows = db.session.query(
+            Reservation.start_time, Reservation.end_time, Reservation.id, Reservation.hold_expires_at
+        ).filter(
+            Reservation.space_id == space_id,
+            active_reservation_clause(),
+            Reservation.end_time > horizon
+        ).all()
+        return {
+            'loaded_at': horizon,
+            'intervals': SpaceIntervals((start, end, reservation_id) for start, end, reservation_id, _ in rows),
+            'holds': {reservation_id: expires_at for _, _, reservation_id, expires_at in rows if expires_at}
+        }
+
+    def _entry(self, space_id):
+        entry = self._spaces.get(space_id)
+        if entry is None or (datetime.now() - entry['loaded_at']).total_seconds() > self.ttl_seconds:
+            entry = self._load(space_id)
+            self._spaces[space_id] = entry
+
+        # Hold expiry uses UTC like the rest of the audit timestamps
+        now = datetime.utcnow()
+        expired = [reservation_id for reservation_id, expires_at in entry['holds'].items() if expires_at <= now]
+        for reservation_id in expired:
+            entry['intervals'].remove(reservation_id)
+            del entry['holds'][reservation_id]
+        return entry
+
+    def find_conflict(self, space_id, start, end, exclude_id=None):
+        """
+        Check the index for a reservation overlapping [start, end)
+
+        Returns:
+            str: ID of a conflicting reservation, or None
+        """
+        with self._lock:
+            return self._entry(space_id)['intervals'].find_conflict(start, end, exclude_id)
+
+    def overlapping(self, space_id, start, end):
+        """
+        List active reservations overlapping [start, end)
+
+        Returns:
+            list: (start, end, reservation_id) tuples, or None if the range
+            reaches before the indexed horizon and must be read from the database
+        """
+        with self._lock:
+            entry = self._entry(space_id)
+            if start < entry['loaded_at']:
+                return None
+            return entry['intervals'].overlapping(start, end)
+
+    def record(self, reservation):
+        """
+        Reflect a committed reservation write in the index
+
+        Args:
+            reservation: The Reservation that was created or changed
+        """
+        with self._lock:
+            entry = self._spaces.get(reservation.space_id)
+            if entry is None:
+                return  # Not loaded yet; the next lookup reads it fresh
+            intervals = entry['intervals']
+            intervals.remove(reservation.id)
+            entry['holds'].pop(reservation.id, None)
+            if reservation.status in ACTIVE_STATUSES and reservation.end_time > entry['loaded_at']:
+                intervals.add(reservation.start_time, reservation.end_time, reservation.id)
+                if reservation.status == ReservationStatus.PENDING and reservation.hold_expires_at:
+                    entry['holds'][reservation.id] = reservation.hold_expires_at
+
+    def invalidate(self, space_id=None):
+        """Drop one space (or all spaces) so the next lookup reloads from the database"""
+        with self._lock:
+            if space_id is None:
+                self._spaces.clear()
+            else:
+                self._spaces.pop(space_id, None)
+
+
+availability_index = AvailabilityIndex(ttl_seconds=int(os.getenv('AVAILABILITY_INDEX_TTL', '60')))
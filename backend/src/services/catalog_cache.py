@@ -0,0 +1,59 @@
+import hashlib
+from sqlalchemy import update
+from src.models.rental_models import db, RentalSpace
+from src.services.response_cache import VersionedResponseCache
+
+# Serialized /spaces and /spaces/<id> bodies, keyed by their ETag
+spaces_response_cache = VersionedResponseCache()
+
+
+def bump_space_version(space_id):
+    """
+    Increment a space's version in the caller's transaction
+    
+    Every write that changes a space's public representation (details,
+    photos or ratings) must call this so cached bodies and ETags roll over.
+    
+    Args:
+        space_id: ID of the space whose representation changed
+    """
+    db.session.execute(
+        update(RentalSpace)
+        .where(RentalSpace.id == space_id)
+        .values(version=RentalSpace.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _etag_for(parts):
+    return hashlib.sha1(';'.join(parts).encode('utf-8')).hexdigest()
+
+
+def catalogue_etag():
+    """
+    Strong ETag for the full space listing
+    
+    Derived from every (id, version) pair, so creating, deleting or
+    changing any space yields a new tag.
+    
+    Returns:
+        str: ETag value (unquoted)
+    """
+    rows = db.session.query(RentalSpace.id, RentalSpace.version).order_by(RentalSpace.id).all()
+    return _etag_for(f'{space_id}:{version}' for space_id, version in rows)
+
+
+def space_etag(space_id):
+    """
+    Strong ETag for a single space
+    
+    Args:
+        space_id: ID of the space
+        
+    Returns:
+        str: ETag value (unquoted), or None if the space does not exist
+    """
+    version = db.session.query(RentalSpace.version).filter(RentalSpace.id == space_id).scalar()
+    if version is None:
+        return None
+    return _etag_for([f'{space_id}:{version}'])
@@ -16,19 +16,39 @@ cloudinary.config(
     secure=True
 )
 
+# Streams larger than this are uploaded with upload_large in chunks of this
+# size, so an upload never holds more than one chunk in memory (Cloudinary
+# requires chunks of at least 5 MB)
+CLOUDINARY_UPLOAD_CHUNK_SIZE = int(os.getenv('CLOUDINARY_UPLOAD_CHUNK_SIZE', str(6 * 1024 * 1024)))
+
+def _remaining_bytes(stream):
+    """Bytes left to read in a seekable stream, or None if it cannot seek"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return size - position
+
 class CloudinaryService:
     """Service class for handling Cloudinary operations"""
     
     @staticmethod
-    def upload_image(file_path, folder="jrgraham-center", public_id=None, transformation=None):
+    def upload_image(file_path, folder="jrgraham-center", public_id=None, transformation=None, filename=None):
         """
         Upload an image to Cloudinary
         
+        File-like objects (e.g. an uploaded file's stream) are sent straight
+        from the stream; ones larger than CLOUDINARY_UPLOAD_CHUNK_SIZE are
+        sent in chunks with upload_large.
+        
         Args:
             file_path: Path to the image file or file object
             folder: Cloudinary folder to organize images
             public_id: Custom public ID for the image
             transformation: Image transformation parameters
+            filename: Original file name, for streams
             
         Returns:
             dict: Upload result with URL and metadata
@@ -47,7 +67,16 @@ class CloudinaryService:
             if transformation:
                 upload_options['transformation'] = transformation
             
-            result = cloudinary.uploader.upload(file_path, **upload_options)
+            if filename:
+                upload_options['filename'] = filename
+            
+            size = _remaining_bytes(file_path) if hasattr(file_path, 'read') else None
+            if size is not None and size > CLOUDINARY_UPLOAD_CHUNK_SIZE:
+                result = cloudinary.uploader.upload_large(
+                    file_path, chunk_size=CLOUDINARY_UPLOAD_CHUNK_SIZE, **upload_options
+                )
+            else:
+                result = cloudinary.uploader.upload(file_path, **upload_options)
             
             return {
                 'success': True,
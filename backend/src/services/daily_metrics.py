@@ -0,0 +1,317 @@
+from decimal import Decimal
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from src.models.rental_models import (
+    db, Reservation, Payment, DailySpaceMetrics, ReservationStatus, PaymentStatus
+)
+
+METRIC_COLUMNS = ('bookings', 'cancellations', 'booked_seconds', 'revenue')
+
+# Rows read per round trip while rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+_UPSERT_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def reservation_metrics(space_id, start_time, end_time, status):
+    """
+    Rollup contribution of one reservation state
+
+    Every reservation counts as a booking on the day it starts; cancelled
+    ones also count as a cancellation, and confirmed ones add their length
+    to the booked time.
+
+    Returns:
+        dict: {(space_id, day): {metric: value}}
+    """
+    if space_id is None or start_time is None:
+        return {}
+    metrics = {'bookings': 1}
+    if status == ReservationStatus.CANCELLED:
+        metrics['cancellations'] = 1
+    elif status == ReservationStatus.CONFIRMED and end_time is not None:
+        metrics['booked_seconds'] = int((end_time - start_time).total_seconds())
+    return {(space_id, start_time.date()): metrics}
+
+
+def payment_metrics(space_id, created_at, amount, status):
+    """
+    Rollup contribution of one payment state: succeeded payments add revenue on the day they were created
+
+    Returns:
+        dict: {(space_id, day): {metric: value}}
+    """
+    if status != PaymentStatus.SUCCEEDED or space_id is None or created_at is None:
+        return {}
+    return {(space_id, created_at.date()): {'revenue': Decimal(str(amount))}}
+
+
+def _difference(old, new):
+    deltas = {}
+    for sign, contribution in ((-1, old), (1, new)):
+        for key, metrics in contribution.items():
+            row = deltas.setdefault(key, {})
+            for column, value in metrics.items():
+                row[column] = row.get(column, 0) + sign * value
+    return {
+        key: metrics for key, metrics in deltas.items()
+        if any(metrics.values())
+    }
+
+
+class DailyMetricsService:
+    """Service class for maintaining the daily_space_metrics rollup"""
+
+    @staticmethod
+    def apply_deltas(connection, deltas):
+        """
+        Add metric deltas to rollup rows, creating missing rows
+
+        Uses an atomic upsert (INSERT ... ON CONFLICT DO UPDATE) where the
+        database supports it, so concurrent writers never lose increments.
+
+        Args:
+            connection: Connection of the transaction making the change
+            deltas: {(space_id, day): {metric: delta}}
+        """
+        table = DailySpaceMetrics.__table__
+        upsert = _UPSERT_DIALECTS.get(connection.dialect.name)
+
+        for (space_id, day), metrics in deltas.items():
+            values = {column: metrics.get(column, 0) for column in METRIC_COLUMNS}
+
+            if upsert is not None:
+                statement = upsert(table).values(space_id=space_id, day=day, **values)
+                connection.execute(statement.on_conflict_do_update(
+                    index_elements=[table.c.space_id, table.c.day],
+                    set_={column: table.c[column] + statement.excluded[column] for column in METRIC_COLUMNS}
+                ))
+                continue
+
+            result = connection.execute(
+                update(table)
+                .where(table.c.space_id == space_id, table.c.day == day)
+                .values({column: table.c[column] + value for column, value in values.items()})
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(space_id=space_id, day=day, **values))
+
+    @staticmethod
+    def record_status_change(rows, old_status, new_status):
+        """
+        Reflect a bulk reservation status UPDATE in the rollup
+
+        Mapper events do not fire for set-based updates, so callers pass
+        the rows their UPDATE ... RETURNING touched.
+
+        Args:
+            rows: (space_id, start_time, end_time) of every updated reservation
+            old_status: Status before the update
+            new_status: Status after the update
+        """
+        deltas = {}
+        for space_id, start_time, end_time in rows:
+            change = _difference(
+                reservation_metrics(space_id, start_time, end_time, old_status),
+                reservation_metrics(space_id, start_time, end_time, new_status)
+            )
+            for key, metrics in change.items():
+                row = deltas.setdefault(key, {})
+                for column, value in metrics.items():
+                    row[column] = row.get(column, 0) + value
+        if deltas:
+            DailyMetricsService.apply_deltas(db.session.connection(), deltas)
+
+    @staticmethod
+    def record_payment_status_change(rows, old_status, new_status):
+        """
+        Reflect a bulk payment status UPDATE in the rollup
+
+        Args:
+            rows: (space_id, created_at, amount) of every updated payment
+            old_status: Status before the update
+            new_status: Status after the update
+        """
+        deltas = {}
+        for space_id, created_at, amount in rows:
+            change = _difference(
+                payment_metrics(space_id, created_at, amount, old_status),
+                payment_metrics(space_id, created_at, amount, new_status)
+            )
+            for key, metrics in change.items():
+                row = deltas.setdefault(key, {})
+                for column, value in metrics.items():
+                    row[column] = row.get(column, 0) + value
+        if deltas:
+            DailyMetricsService.apply_deltas(db.session.connection(), deltas)
+
+    @staticmethod
+    def compute_rows(space_id=None):
+        """
+        Aggregate the rollup straight from reservations and payments
+
+        Both tables are streamed in batches, so memory is bounded by the
+        number of rollup rows rather than the size of the history.
+
+        Args:
+            space_id: Restrict to one space (None for all spaces)
+
+        Returns:
+            dict: {(space_id, day): {metric: value}}
+        """
+        expected = {}
+
+        def add(contribution):
+            for key, metrics in contribution.items():
+                row = expected.setdefault(key, {column: 0 for column in METRIC_COLUMNS})
+                for column, value in metrics.items():
+                    row[column] += value
+
+        reservations = db.session.query(
+            Reservation.space_id, Reservation.start_time, Reservation.end_time, Reservation.status
+        )
+        payments = db.session.query(
+            Reservation.space_id, Payment.created_at, Payment.amount
+        ).join(Reservation, Payment.reservation_id == Reservation.id).filter(
+            Payment.status == PaymentStatus.SUCCEEDED
+        )
+        if space_id:
+            reservations = reservations.filter(Reservation.space_id == space_id)
+            payments = payments.filter(Reservation.space_id == space_id)
+
+        for row in reservations.yield_per(REBUILD_BATCH_SIZE):
+            add(reservation_metrics(*row))
+        for row_space_id, created_at, amount in payments.yield_per(REBUILD_BATCH_SIZE):
+            add(payment_metrics(row_space_id, created_at, amount, PaymentStatus.SUCCEEDED))
+        return expected
+
+    @staticmethod
+    def rebuild(space_id=None, dry_run=False):
+        """
+        Recompute the rollup from the source tables and repair any drift
+
+        Args:
+            space_id: Rebuild a single space (None for all spaces)
+            dry_run: Only report drift, do not write corrections
+
+        Returns:
+            dict: Rebuild report with the number of drifted rows
+        """
+        expected = DailyMetricsService.compute_rows(space_id)
+
+        query = DailySpaceMetrics.query
+        if space_id:
+            query = query.filter(DailySpaceMetrics.space_id == space_id)
+        stored = {(row.space_id, row.day): row for row in query.all()}
+
+        drifted = 0
+        for key in set(expected) | set(stored):
+            metrics = expected.get(key)
+            row = stored.get(key)
+
+            current = {column: getattr(row, column) for column in METRIC_COLUMNS} if row else None
+            if current == metrics:
+                continue
+            # A missing row and an all-zero row both mean "no activity"
+            if metrics is None and not any(current.values()):
+                continue
+
+            drifted += 1
+            if dry_run:
+                continue
+
+            if metrics is None:
+                db.session.delete(row)
+                continue
+            if row is None:
+                row = DailySpaceMetrics(space_id=key[0], day=key[1])
+                db.session.add(row)
+            for column, value in metrics.items():
+                setattr(row, column, value)
+
+        if not dry_run:
+            db.session.commit()
+
+        return {
+            'checked': len(set(expected) | set(stored)),
+            'drifted': drifted,
+            'repaired': not dry_run
+        }
+
+
+# Incremental maintenance for writes that go through the unit of work
+
+def _keep_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the old value before an assignment even when the attribute was expired
+# (e.g. after a commit), so after_update can see what the row used to count as
+for _attribute in (
+    Reservation.space_id, Reservation.start_time, Reservation.end_time, Reservation.status,
+    Payment.reservation_id, Payment.created_at, Payment.amount, Payment.status
+):
+    event.listen(_attribute, 'set', _keep_value, active_history=True)
+
+
+def _value(target, attribute, previous):
+    # In after_update/after_delete the attribute history still holds the pre-flush value
+    if previous:
+        history = inspect(target).attrs[attribute].history
+        if history.deleted:
+            return history.deleted[0]
+    return getattr(target, attribute)
+
+
+def _reservation_state(target, previous=False):
+    return reservation_metrics(*(
+        _value(target, attribute, previous)
+        for attribute in ('space_id', 'start_time', 'end_time', 'status')
+    ))
+
+
+def _payment_state(connection, target, previous=False):
+    reservation_id, created_at, amount, status = (
+        _value(target, attribute, previous)
+        for attribute in ('reservation_id', 'created_at', 'amount', 'status')
+    )
+    if status != PaymentStatus.SUCCEEDED:
+        return {}
+    space_id = connection.execute(
+        select(Reservation.space_id).where(Reservation.id == reservation_id)
+    ).scalar()
+    return payment_metrics(space_id, created_at, amount, status)
+
+
+@event.listens_for(Reservation, 'after_insert')
+def _reservation_inserted(mapper, connection, target):
+    DailyMetricsService.apply_deltas(connection, _difference({}, _reservation_state(target)))
+
+
+@event.listens_for(Reservation, 'after_update')
+def _reservation_updated(mapper, connection, target):
+    DailyMetricsService.apply_deltas(connection, _difference(
+        _reservation_state(target, previous=True), _reservation_state(target)
+    ))
+
+
+@event.listens_for(Reservation, 'after_delete')
+def _reservation_deleted(mapper, connection, target):
+    DailyMetricsService.apply_deltas(connection, _difference(_reservation_state(target, previous=True), {}))
+
+
+@event.listens_for(Payment, 'after_insert')
+def _payment_inserted(mapper, connection, target):
+    DailyMetricsService.apply_deltas(connection, _difference({}, _payment_state(connection, target)))
+
+
+@event.listens_for(Payment, 'after_update')
+def _payment_updated(mapper, connection, target):
+    DailyMetricsService.apply_deltas(connection, _difference(
+        _payment_state(connection, target, previous=True), _payment_state(connection, target)
+    ))
+
+
+@event.listens_for(Payment, 'after_delete')
+def _payment_deleted(mapper, connection, target):
+    DailyMetricsService.apply_deltas(connection, _difference(_payment_state(connection, target, previous=True), {}))
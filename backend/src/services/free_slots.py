@@ -0,0 +1,177 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import case, exists, literal, null, union_all, select
+from src.models.rental_models import db, Reservation, Availability, RentalSpace
+from src.services.reservation_holds import active_reservation_clause
+
+_DURATION_PATTERN = re.compile(r'^\s*(\d+)\s*([mhd]?)\s*$', re.IGNORECASE)
+_DURATION_UNITS = {'': 'minutes', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+
+def parse_duration(value, default=None):
+    """
+    Parse a duration such as "15m", "2h", "1d" or a bare number of minutes
+
+    Args:
+        value: Duration string (None or empty returns the default)
+        default: timedelta to use when no value is given
+
+    Returns:
+        timedelta: The parsed duration
+    """
+    if value is None or str(value).strip() == '':
+        return default
+    match = _DURATION_PATTERN.match(str(value))
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f'Invalid duration: {value}. Use e.g. 15m, 2h or 1d')
+    return timedelta(**{_DURATION_UNITS[match.group(2).lower()]: int(match.group(1))})
+
+
+def _align_up(moment, origin, step):
+    remainder = (moment - origin) % step
+    return moment if not remainder else moment + (step - remainder)
+
+
+def _align_down(moment, origin, step):
+    return moment - (moment - origin) % step
+
+
+def compute_free_slots(window_start, window_end, reservations=(), blackouts=(),
+                       opening_hours=None, granularity=None, min_duration=None):
+    """
+    Compute free intervals in a window with a sweep line
+
+    A moment is free when it lies inside opening hours and is covered by no
+    reservation or blackout. A space without any opening-hours rows at all
+    is open for the whole window; one whose opening hours all fall outside
+    the window is closed in it.
+
+    Args:
+        window_start: Start of the window to search
+        window_end: End of the window to search
+        reservations: (start, end) intervals that are booked
+        blackouts: (start, end) intervals that are blocked (is_available = false)
+        opening_hours: (start, end) intervals that are open (is_available = true), or
+            None if the space has no opening-hours rows at all
+        granularity: timedelta grid (anchored at midnight) that free slots snap to
+        min_duration: Shortest free slot worth returning
+
+    Returns:
+        list: (start, end) free intervals in chronological order
+    """
+    events = []
+    if opening_hours is not None:
+        for start, end in opening_hours:
+            events.append((start, 1, 0))
+            events.append((end, -1, 0))
+    else:
+        events.append((window_start, 1, 0))
+        events.append((window_end, -1, 0))
+    for start, end in list(reservations) + list(blackouts):
+        events.append((start, 0, 1))
+        events.append((end, 0, -1))
+    events.sort(key=lambda event: event[0])
+
+    free = []
+    open_depth = blocked_depth = 0
+    free_since = None
+    position = 0
+    while position < len(events):
+        moment = events[position][0]
+        # Apply every change at this instant before looking at the state
+        while position < len(events) and events[position][0] == moment:
+            open_depth += events[position][1]
+            blocked_depth += events[position][2]
+            position += 1
+
+        is_free = open_depth > 0 and blocked_depth == 0
+        if is_free and free_since is None:
+            free_since = moment
+        elif not is_free and free_since is not None:
+            free.append((free_since, moment))
+            free_since = None
+
+    origin = datetime.combine(window_start.date(), datetime.min.time())
+    shortest = max(filter(None, [min_duration, granularity]), default=None)
+
+    slots = []
+    for start, end in free:
+        start, end = max(start, window_start), min(end, window_end)
+        if granularity:
+            start, end = _align_up(start, origin, granularity), _align_down(end, origin, granularity)
+        if end <= start or (shortest and end - start < shortest):
+            continue
+        slots.append((start, end))
+    return slots
+
+
+def load_space_timelines(space_ids, window_start, window_end):
+    """
+    Load reservations and availability rows for many spaces in one query
+
+    Args:
+        space_ids: IDs of the spaces to load
+        window_start: Start of the window
+        window_end: End of the window
+
+    Returns:
+        dict: {space_id: {'reservations': [...], 'blackouts': [...], 'opening_hours': [...]}}
+        for every space that exists; 'opening_hours' is None for a space without any
+        opening-hours rows, as compute_free_slots expects
+    """
+    # Whether a space has opening hours at all, not just inside the window
+    has_opening_hours = exists().where(
+        Availability.space_id == RentalSpace.id,
+        Availability.is_available.is_(True)
+    )
+    spaces = select(
+        RentalSpace.id.label('space_id'), null().label('start_time'), null().label('end_time'),
+        case((has_opening_hours, literal('space_with_hours')), else_=literal('space')).label('kind')
+    ).where(RentalSpace.id.in_(space_ids))
+
+    reservations = select(
+        Reservation.space_id, Reservation.start_time, Reservation.end_time,
+        literal('reservations').label('kind')
+    ).where(
+        Reservation.space_id.in_(space_ids),
+        active_reservation_clause(),
+        Reservation.start_time < window_end,
+        Reservation.end_time > window_start
+    )
+
+    availability = select(
+        Availability.space_id, Availability.start_time, Availability.end_time,
+        literal('opening_hours').label('kind')
+    ).where(
+        Availability.space_id.in_(space_ids),
+        Availability.is_available.is_(True),
+        Availability.start_time < window_end,
+        Availability.end_time > window_start
+    )
+
+    blackouts = select(
+        Availability.space_id, Availability.start_time, Availability.end_time,
+        literal('blackouts').label('kind')
+    ).where(
+        Availability.space_id.in_(space_ids),
+        Availability.is_available.is_(False),
+        Availability.start_time < window_end,
+        Availability.end_time > window_start
+    )
+
+    # The typed selects go first so the union's result columns are datetimes;
+    # the trailing space rows only mark which requested spaces exist
+    rows = db.session.execute(union_all(reservations, availability, blackouts, spaces)).all()
+
+    timelines = {
+        space_id: {
+            'reservations': [],
+            'blackouts': [],
+            'opening_hours': [] if kind == 'space_with_hours' else None
+        }
+        for space_id, _, _, kind in rows if kind in ('space', 'space_with_hours')
+    }
+    for space_id, start, end, kind in rows:
+        if kind not in ('space', 'space_with_hours'):
+            timelines[space_id][kind].append((start, end))
+    return timelines
@@ -0,0 +1,207 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import Response, jsonify, make_response, request
+from sqlalchemy import and_, delete, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from src.models.rental_models import db, IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# How long a stored response is replayed for
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+# A request still unfinished after this long is assumed dead and its key can be reused
+IDEMPOTENCY_LOCK_SECONDS = 60
+
+_INSERT_IGNORE_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def _request_hash():
+    digest = hashlib.sha256()
+    digest.update(request.path.encode('utf-8'))
+    digest.update(b'\n')
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _request_scope(scope):
+    """Key namespace for this request: the endpoint plus the body's user_id, if any"""
+    # The API has no sessions; callers identify themselves by user_id
+    data = request.get_json(silent=True)
+    user_id = data.get('user_id') if isinstance(data, dict) else None
+    return f'{scope}:{user_id}' if user_id else scope
+
+
+def _owned(key, scope, claimed_at):
+    """SQL filter for a key row still held by the claim made at `claimed_at`"""
+    return and_(
+        IdempotencyKey.key == key,
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.created_at == claimed_at
+    )
+
+
+def _claim(key, scope, request_hash, now):
+    """
+    Atomically take ownership of a key for this request
+
+    A key is free if it was never used, its stored response has expired,
+    or the request holding it has been running for longer than
+    IDEMPOTENCY_LOCK_SECONDS. The claim stores `now` as created_at, which
+    doubles as the claim token: once another request takes a stale key
+    over, the original request's later writes no longer match the row.
+
+    Returns:
+        bool: True if this request now owns the key
+    """
+    values = {
+        'key': key,
+        'scope': scope,
+        'request_hash': request_hash,
+        'status_code': None,
+        'response_body': None,
+        'created_at': now,
+        'expires_at': now + timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    }
+
+    dialect_insert = _INSERT_IGNORE_DIALECTS.get(db.engine.dialect.name)
+    try:
+        if dialect_insert is not None:
+            claimed = db.session.execute(
+                dialect_insert(IdempotencyKey).values(**values).on_conflict_do_nothing(
+                    index_elements=['key', 'scope']
+                )
+            ).rowcount == 1
+        else:
+            db.session.execute(insert(IdempotencyKey).values(**values))
+            claimed = True
+    except IntegrityError:
+        db.session.rollback()
+        claimed = False
+
+    if not claimed:
+        claimed = db.session.execute(
+            update(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.scope == scope,
+                or_(
+                    IdempotencyKey.expires_at <= now,
+                    and_(
+                        IdempotencyKey.status_code.is_(None),
+                        IdempotencyKey.created_at <= now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+                    )
+                )
+            ).values(**values).execution_options(synchronize_session=False)
+        ).rowcount == 1
+
+    db.session.commit()
+    return claimed
+
+
+def _replay(key, scope, request_hash):
+    """Response for a request whose key is owned by an earlier request"""
+    stored = db.session.get(IdempotencyKey, (key, scope))
+    if stored is None:
+        # Released between our claim attempt and this read; the client can simply retry
+        return jsonify({
+            'success': False,
+            'error': 'A request with this Idempotency-Key is in progress'
+        }), 409
+    if stored.request_hash != request_hash:
+        return jsonify({
+            'success': False,
+            'error': 'Idempotency-Key was already used for a different request'
+        }), 422
+    if stored.status_code is None:
+        return jsonify({
+            'success': False,
+            'error': 'A request with this Idempotency-Key is in progress'
+        }), 409
+
+    response = Response(stored.response_body, status=stored.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _release(key, scope, claimed_at):
+    db.session.rollback()
+    db.session.execute(delete(IdempotencyKey).where(_owned(key, scope, claimed_at)))
+    db.session.commit()
+
+
+def idempotent(scope):
+    """
+    Honor the Idempotency-Key header on a POST endpoint
+
+    The first request with a key runs the view and stores its status and
+    JSON body; retries with the same key and body get the stored response
+    back without running the view again. Server errors (5xx) are not
+    stored, so the request can be retried. Requests without the header
+    are not affected. Keys are namespaced per endpoint and per user_id.
+
+    Args:
+        scope: Name of the endpoint, so the same key can be used on different endpoints
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({
+                    'success': False,
+                    'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+                }), 400
+
+            request_hash = _request_hash()
+            key_scope = _request_scope(scope)
+            claimed_at = datetime.utcnow()
+            if not _claim(key, key_scope, request_hash, claimed_at):
+                return _replay(key, key_scope, request_hash)
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                _release(key, key_scope, claimed_at)
+                raise
+
+            if response.status_code >= 500:
+                _release(key, key_scope, claimed_at)
+                return response
+
+            # Never commit whatever a failed view left uncommitted along with the stored response
+            db.session.rollback()
+            # A no-op if a retry took the key over after IDEMPOTENCY_LOCK_SECONDS
+            db.session.execute(
+                update(IdempotencyKey).where(_owned(key, key_scope, claimed_at)).values(
+                    status_code=response.status_code,
+                    response_body=response.get_data(as_text=True)
+                ).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            return response
+        return wrapper
+    return decorator
+
+
+class IdempotencyService:
+    """Service class for maintaining stored idempotent responses"""
+
+    @staticmethod
+    def purge_expired(now=None):
+        """
+        Delete stored responses past their expiry
+
+        Returns:
+            int: Number of keys deleted
+        """
+        count = db.session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow()))
+        ).rowcount
+        db.session.commit()
+        return count
@@ -0,0 +1,88 @@
+import base64
+from sqlalchemy import and_
+from src.models.rental_models import db, RentalSpace, Reservation
+from src.services.reservation_holds import active_reservation_clause
+
+# Upper bound on slots per space, e.g. 62 days at 15-minute granularity is 5952
+MAX_SLOTS = 20000
+
+
+def _slot_index(moment, window_start, granularity):
+    return (moment - window_start) // granularity
+
+
+def encode_bitmap(intervals, window_start, window_end, granularity):
+    """
+    Encode intervals as an occupancy bitmap, one bit per slot
+
+    Bit 0 is the most significant bit of the first byte. A slot is marked
+    occupied if any interval overlaps any part of it. The bitmap is built
+    as one integer with shifted masks instead of per-slot loops.
+
+    Args:
+        intervals: (start, end) tuples
+        window_start: Start of slot 0
+        window_end: End of the last slot
+        granularity: Slot length as a timedelta
+
+    Returns:
+        tuple: (bitmap bytes, number of occupied slots)
+    """
+    slot_count = -(-(window_end - window_start) // granularity)
+    total_bits = -(-slot_count // 8) * 8
+
+    bits = 0
+    for start, end in intervals:
+        first = max(0, _slot_index(start, window_start, granularity))
+        last = min(slot_count, -(-(end - window_start) // granularity))
+        if last > first:
+            bits |= ((1 << (last - first)) - 1) << (total_bits - last)
+
+    return bits.to_bytes(total_bits // 8, 'big'), bin(bits).count('1')
+
+
+def build_occupancy_bitmaps(window_start, window_end, granularity, space_ids=None):
+    """
+    Build base64 occupancy bitmaps for many spaces from a single query
+
+    Args:
+        window_start: Start of the calendar window
+        window_end: End of the calendar window
+        granularity: Slot length as a timedelta
+        space_ids: Restrict to these spaces (None for all spaces)
+
+    Returns:
+        dict: {'slot_count': int, 'spaces': [{'space_id', 'bitmap', 'occupied_slots'}]}
+    """
+    slot_count = -(-(window_end - window_start) // granularity)
+    if slot_count > MAX_SLOTS:
+        raise ValueError(f'Window too large: {slot_count} slots requested, maximum is {MAX_SLOTS}')
+
+    # Every space with its overlapping active reservations, in one outer join
+    query = db.session.query(
+        RentalSpace.id, Reservation.start_time, Reservation.end_time
+    ).outerjoin(Reservation, and_(
+        Reservation.space_id == RentalSpace.id,
+        active_reservation_clause(),
+        Reservation.start_time < window_end,
+        Reservation.end_time > window_start
+    )).order_by(RentalSpace.id)
+    if space_ids:
+        query = query.filter(RentalSpace.id.in_(space_ids))
+
+    intervals = {}
+    for space_id, start, end in query:
+        space_intervals = intervals.setdefault(space_id, [])
+        if start is not None:
+            space_intervals.append((start, end))
+
+    spaces = []
+    for space_id, space_intervals in intervals.items():
+        bitmap, occupied = encode_bitmap(space_intervals, window_start, window_end, granularity)
+        spaces.append({
+            'space_id': space_id,
+            'bitmap': base64.b64encode(bitmap).decode('ascii'),
+            'occupied_slots': occupied
+        })
+
+    return {'slot_count': slot_count, 'spaces': spaces}
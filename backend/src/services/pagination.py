@@ -0,0 +1,104 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*values):
+    """
+    Encode keyset values into an opaque, URL-safe cursor
+
+    Args:
+        values: The sort key of the last row on the page (datetimes allowed)
+
+    Returns:
+        str: Cursor string
+    """
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from a previous page
+        size: Number of keyset values expected
+
+    Returns:
+        list: The keyset values
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = [
+            datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+            for value in payload
+        ]
+    except (ValueError, TypeError, KeyError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse a page size query parameter, clamped to [1, maximum]"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, maximum))
+
+
+def keyset_filter(columns, values, descending=True):
+    """
+    Build the "rows after the cursor" condition for a keyset-ordered query
+
+    Args:
+        columns: Sort columns, e.g. (Reservation.start_time, Reservation.id)
+        values: Cursor values for those columns
+        descending: Whether the query is ordered descending on all columns
+
+    Returns:
+        A SQL expression comparing the row value against the cursor
+    """
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
+
+
+def paginate(query, columns, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=True, key=None):
+    """
+    Fetch one keyset page of a query
+
+    Args:
+        query: Query without ORDER BY or LIMIT
+        columns: Sort columns forming a unique key (last one should be the ID)
+        cursor: Cursor from the previous page, if any
+        limit: Page size
+        descending: Sort direction
+        key: Function returning the sort key values of a result row
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, len(columns)), descending))
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+    return rows, next_cursor
@@ -0,0 +1,230 @@
+import os
+import time
+from datetime import datetime
+from sqlalchemy import or_, select
+from src.models.rental_models import (
+    db, Reservation, Payment, ReconciliationCheckpoint, ReservationStatus, PaymentStatus
+)
+from src.services.stripe_service import StripeService
+from src.services.transitions import TransitionService
+from src.services.availability_index import availability_index
+
+CHECKPOINT_NAME = 'stripe_payment_intents'
+
+# Payment intents per Stripe list page (Stripe's maximum)
+RECONCILIATION_PAGE_SIZE = 100
+
+# Each run re-reads intents created this long before the checkpoint: an
+# intent can still be paid or fail well after it was created
+RECONCILIATION_LOOKBACK_HOURS = int(os.getenv('RECONCILIATION_LOOKBACK_HOURS', '24'))
+
+
+def target_payment_status(payment_intent):
+    """
+    Local payment status a Stripe payment intent settles to, or None while it is still in flight
+
+    A requires_payment_method intent only counts as failed once an attempt
+    was declined; before that it is simply waiting for the customer.
+    """
+    status = payment_intent['status']
+    if status == 'succeeded':
+        return PaymentStatus.SUCCEEDED
+    if status == 'canceled':
+        return PaymentStatus.FAILED
+    if status == 'requires_payment_method' and payment_intent['has_payment_error']:
+        return PaymentStatus.FAILED
+    return None
+
+
+class PaymentReconciliationService:
+    """Service class for reconciling local payments with Stripe in bulk"""
+
+    @staticmethod
+    def reconcile_page(payment_intents, now=None, dry_run=False):
+        """
+        Diff one page of Stripe payment intents against local payments and apply the differences
+
+        Payments are looked up with one IN query. Succeeded payments confirm
+        their reservation if its hold is still live; a paid reservation that
+        was already cancelled, or whose hold ran out, is reported for manual
+        review instead (the slot may have been rebooked). A fully refunded
+        intent is never confirmed: its reservation is cancelled, as the
+        refund endpoint and the charge.refunded webhook do. Each kind of
+        change is one guarded transition, so a local success is never
+        downgraded and rows changed concurrently by the webhook worker are
+        skipped.
+
+        Args:
+            payment_intents: Payment intents as returned by StripeService.list_payment_intents
+            now: Reference time for hold expiry (default: current UTC time)
+            dry_run: Only report the differences
+
+        Returns:
+            dict: Counts of changed rows and the payments needing review
+        """
+        now = now or datetime.utcnow()
+        targets = {intent['id']: target_payment_status(intent) for intent in payment_intents}
+        # A fully refunded booking is cancelled on purpose
+        refunded = {intent['id'] for intent in payment_intents if intent['amount_refunded'] >= intent['amount'] > 0}
+        report = {
+            'payments_succeeded': 0,
+            'payments_failed': 0,
+            'reservations_confirmed': 0,
+            'reservations_cancelled': 0,
+            'needs_review': []
+        }
+
+        settled = [intent_id for intent_id, target in targets.items() if target is not None]
+        if not settled:
+            return report
+
+        rows = db.session.execute(
+            select(
+                Payment.id, Payment.stripe_payment_intent_id, Payment.status,
+                Reservation.id.label('reservation_id'), Reservation.space_id,
+                Reservation.status.label('reservation_status'), Reservation.hold_expires_at
+            ).join(Reservation, Payment.reservation_id == Reservation.id).where(
+                Payment.stripe_payment_intent_id.in_(settled)
+            )
+        ).all()
+
+        succeeded_ids = []
+        failed_ids = []
+        confirm_ids = []
+        cancel_ids = []
+        for row in rows:
+            target = targets[row.stripe_payment_intent_id]
+            if target == PaymentStatus.FAILED:
+                if row.status == PaymentStatus.PENDING:
+                    failed_ids.append(row.id)
+                continue
+
+            if row.status != PaymentStatus.SUCCEEDED:
+                succeeded_ids.append(row.id)
+            if row.stripe_payment_intent_id in refunded:
+                # The refund webhook was missed; cancel the booking rather than confirm it
+                if row.reservation_status != ReservationStatus.CANCELLED:
+                    cancel_ids.append(row.reservation_id)
+                continue
+
+            hold_live = row.hold_expires_at is None or row.hold_expires_at > now
+            if row.reservation_status == ReservationStatus.PENDING and hold_live:
+                confirm_ids.append(row.reservation_id)
+            elif row.reservation_status != ReservationStatus.CONFIRMED:
+                report['needs_review'].append({
+                    'payment_intent_id': row.stripe_payment_intent_id,
+                    'reservation_id': row.reservation_id,
+                    'reservation_status': row.reservation_status.value
+                })
+
+        if dry_run:
+            report.update(
+                payments_succeeded=len(succeeded_ids),
+                payments_failed=len(failed_ids),
+                reservations_confirmed=len(confirm_ids),
+                reservations_cancelled=len(cancel_ids)
+            )
+            return report
+
+        try:
+            if succeeded_ids:
+                report['payments_succeeded'] = len(TransitionService.transition_payments(
+                    PaymentStatus.SUCCEEDED, Payment.id.in_(succeeded_ids)
+                ))
+
+            if failed_ids:
+                report['payments_failed'] = len(TransitionService.transition_payments(
+                    PaymentStatus.FAILED, Payment.id.in_(failed_ids)
+                ))
+
+            confirmed = []
+            if confirm_ids:
+                confirmed = TransitionService.transition_reservations(
+                    ReservationStatus.CONFIRMED,
+                    Reservation.id.in_(confirm_ids),
+                    or_(Reservation.hold_expires_at.is_(None), Reservation.hold_expires_at > now)
+                )
+                report['reservations_confirmed'] = len(confirmed)
+
+            cancelled = []
+            if cancel_ids:
+                cancelled = TransitionService.transition_reservations(
+                    ReservationStatus.CANCELLED, Reservation.id.in_(cancel_ids)
+                )
+                report['reservations_cancelled'] = len(cancelled)
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for reservation in confirmed + cancelled:
+            availability_index.record(reservation)
+        return report
+
+    @staticmethod
+    def run(since=None, until=None, dry_run=False, page_size=RECONCILIATION_PAGE_SIZE):
+        """
+        Reconcile every payment intent created in a window, page by page
+
+        The window starts RECONCILIATION_LOOKBACK_HOURS before the stored
+        checkpoint (or before `until` on the first run) and ends now. The
+        checkpoint only moves forward once the whole window was reconciled,
+        so a run stopped by a Stripe error is simply repeated.
+
+        Args:
+            since: Window start, Unix seconds (default: from the checkpoint)
+            until: Window end, Unix seconds (default: now)
+            dry_run: Only report the differences; the checkpoint is not moved
+            page_size: Payment intents per Stripe page
+
+        Returns:
+            dict: Reconciliation report
+        """
+        until = until or int(time.time())
+        checkpoint = db.session.get(ReconciliationCheckpoint, CHECKPOINT_NAME)
+        if since is None:
+            since = (checkpoint.watermark if checkpoint else until) - RECONCILIATION_LOOKBACK_HOURS * 3600
+
+        report = {
+            'since': since,
+            'until': until,
+            'pages': 0,
+            'payment_intents': 0,
+            'payments_succeeded': 0,
+            'payments_failed': 0,
+            'reservations_confirmed': 0,
+            'reservations_cancelled': 0,
+            'needs_review': [],
+            'checkpoint': checkpoint.watermark if checkpoint else None,
+            'error': None
+        }
+
+        starting_after = None
+        while True:
+            page = StripeService.list_payment_intents(since, until, starting_after=starting_after, limit=page_size)
+            if not page['success']:
+                report['error'] = page['error']
+                return report
+
+            intents = page['payment_intents']
+            result = PaymentReconciliationService.reconcile_page(intents, dry_run=dry_run)
+            report['pages'] += 1
+            report['payment_intents'] += len(intents)
+            for key in ('payments_succeeded', 'payments_failed', 'reservations_confirmed', 'reservations_cancelled'):
+                report[key] += result[key]
+            report['needs_review'].extend(result['needs_review'])
+
+            if not page['has_more'] or not intents:
+                break
+            starting_after = intents[-1]['id']
+
+        if not dry_run:
+            if checkpoint is None:
+                checkpoint = ReconciliationCheckpoint(name=CHECKPOINT_NAME, watermark=until)
+                db.session.add(checkpoint)
+            # A backfill of an older window must not move the checkpoint back
+            checkpoint.watermark = max(checkpoint.watermark, until)
+            db.session.commit()
+            report['checkpoint'] = checkpoint.watermark
+        return report
@@ -0,0 +1,109 @@
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import timedelta
+from src.models.rental_models import RentalSpace
+
+CURRENCY = 'usd'
+
+_MICROSECONDS_PER_HOUR = 3600 * 10 ** 6
+
+
+def rate_to_cents(price_per_hour):
+    """Convert an hourly rate (Decimal, float or string dollars) to integer cents"""
+    return int((Decimal(str(price_per_hour)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def price_cents(rate_cents, start_time, end_time):
+    """
+    Price a time range in integer cents
+
+    The duration is taken in whole microseconds and the result rounded half
+    up once, so the arithmetic is exact for any rate and duration.
+
+    Args:
+        rate_cents: Hourly rate in cents
+        start_time: Start of the range
+        end_time: End of the range
+
+    Returns:
+        int: Price in cents
+    """
+    microseconds = (end_time - start_time) // timedelta(microseconds=1)
+    numerator = rate_cents * microseconds
+    return (2 * numerator + _MICROSECONDS_PER_HOUR) // (2 * _MICROSECONDS_PER_HOUR)
+
+
+def cents_to_decimal(cents):
+    """Convert integer cents to a two-place Decimal dollar amount"""
+    return (Decimal(cents) / 100).quantize(Decimal('0.01'))
+
+
+class PricingService:
+    """Service class for pricing reservations and quotes"""
+
+    @staticmethod
+    def load_rates(space_ids):
+        """
+        Load hourly rates for many spaces in one query
+
+        Args:
+            space_ids: IDs of the spaces to load
+
+        Returns:
+            dict: {space_id: rate in cents} for every space that exists
+        """
+        rows = RentalSpace.query.with_entities(
+            RentalSpace.id, RentalSpace.price_per_hour
+        ).filter(RentalSpace.id.in_(set(space_ids))).all()
+        return {space_id: rate_to_cents(price_per_hour) for space_id, price_per_hour in rows}
+
+    @staticmethod
+    def price(price_per_hour, start_time, end_time):
+        """
+        Price a reservation for storage in Reservation.total_price
+
+        Args:
+            price_per_hour: The space's hourly rate
+            start_time: Reservation start
+            end_time: Reservation end
+
+        Returns:
+            Decimal: Total price in dollars
+        """
+        return cents_to_decimal(price_cents(rate_to_cents(price_per_hour), start_time, end_time))
+
+    @staticmethod
+    def quote(windows):
+        """
+        Price many (space_id, start_time, end_time) windows in one pass
+
+        Args:
+            windows: (space_id, start_time, end_time) tuples; times are datetimes
+
+        Returns:
+            list: One quote dict per window, in input order. Windows that
+            cannot be priced carry a 'reason' instead of a price.
+        """
+        rates = PricingService.load_rates(space_id for space_id, _, _ in windows)
+
+        quotes = []
+        for index, (space_id, start_time, end_time) in enumerate(windows):
+            quote = {
+                'index': index,
+                'space_id': space_id,
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat()
+            }
+            if space_id not in rates:
+                quote['reason'] = 'space_not_found'
+            elif start_time >= end_time:
+                quote['reason'] = 'invalid_time_range'
+            else:
+                cents = price_cents(rates[space_id], start_time, end_time)
+                quote.update({
+                    'duration_minutes': int((end_time - start_time).total_seconds() // 60),
+                    'price_per_hour': float(cents_to_decimal(rates[space_id])),
+                    'total_price': float(cents_to_decimal(cents)),
+                    'total_price_cents': cents
+                })
+            quotes.append(quote)
+        return quotes
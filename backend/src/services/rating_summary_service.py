@@ -0,0 +1,184 @@
+from datetime import datetime
+from sqlalchemy import func, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from src.models.rental_models import db, Review, SpaceRatingSummary
+from src.services.catalog_cache import bump_space_version
+
+RATING_VALUES = range(1, 6)
+
+_INSERT_IGNORE_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def _rating_column(rating):
+    return getattr(SpaceRatingSummary, f'rating_{rating}_count')
+
+
+class RatingSummaryService:
+    """Service class for maintaining the materialized space_rating_summary table"""
+
+    @staticmethod
+    def record_change(space_id, old_rating=None, new_rating=None):
+        """
+        Apply a single review change to a space's rating summary
+
+        Runs inside the caller's transaction, so the summary is committed
+        (or rolled back) together with the review write itself.
+
+        Args:
+            space_id: The space the review belongs to
+            old_rating: Rating being removed (None for a new review)
+            new_rating: Rating being added (None for a deleted review)
+        """
+        if old_rating == new_rating:
+            return
+
+        count_delta = (1 if new_rating is not None else 0) - (1 if old_rating is not None else 0)
+        sum_delta = (new_rating or 0) - (old_rating or 0)
+
+        values = {
+            'review_count': SpaceRatingSummary.review_count + count_delta,
+            'rating_sum': SpaceRatingSummary.rating_sum + sum_delta,
+            'updated_at': datetime.utcnow()
+        }
+        if old_rating is not None:
+            values[f'rating_{old_rating}_count'] = _rating_column(old_rating) - 1
+        if new_rating is not None:
+            values[f'rating_{new_rating}_count'] = _rating_column(new_rating) + 1
+
+        apply_change = (
+            update(SpaceRatingSummary)
+            .where(SpaceRatingSummary.space_id == space_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.execute(apply_change).rowcount:
+            return
+
+        # No summary row yet (space never backfilled): seed it from the
+        # reviews table, which already includes the pending change. If a
+        # concurrent review seeded it first, apply the change to that row.
+        db.session.flush()
+        rating_counts = RatingSummaryService.compute_counts(space_id).get(space_id, {})
+        seed = dict(RatingSummaryService._count_values(rating_counts), space_id=space_id)
+        if not RatingSummaryService._insert_seed(seed):
+            db.session.execute(apply_change)
+
+    @staticmethod
+    def _insert_seed(values):
+        """Insert a summary row unless one exists; True if this call inserted it"""
+        dialect_insert = _INSERT_IGNORE_DIALECTS.get(db.engine.dialect.name)
+        if dialect_insert is not None:
+            return db.session.execute(
+                dialect_insert(SpaceRatingSummary).values(**values).on_conflict_do_nothing(index_elements=['space_id'])
+            ).rowcount == 1
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(SpaceRatingSummary).values(**values))
+            return True
+        except IntegrityError:
+            return False
+
+    @staticmethod
+    def compute_counts(space_id=None):
+        """
+        Aggregate review ratings straight from the reviews table
+
+        Args:
+            space_id: Restrict the aggregate to one space (None for all spaces)
+
+        Returns:
+            dict: {space_id: {rating: count}}
+        """
+        query = db.session.query(
+            Review.space_id,
+            Review.rating,
+            func.count(Review.id)
+        ).group_by(Review.space_id, Review.rating)
+
+        if space_id:
+            query = query.filter(Review.space_id == space_id)
+
+        counts = {}
+        for row_space_id, rating, count in query:
+            counts.setdefault(row_space_id, {})[rating] = count
+        return counts
+
+    @staticmethod
+    def _count_values(rating_counts):
+        values = {
+            'review_count': sum(rating_counts.values()),
+            'rating_sum': sum(rating * count for rating, count in rating_counts.items()),
+            'updated_at': datetime.utcnow()
+        }
+        for rating in RATING_VALUES:
+            values[f'rating_{rating}_count'] = rating_counts.get(rating, 0)
+        return values
+
+    @staticmethod
+    def _apply_counts(summary, rating_counts):
+        for column, value in RatingSummaryService._count_values(rating_counts).items():
+            setattr(summary, column, value)
+
+    @staticmethod
+    def _matches(summary, rating_counts):
+        if summary is None:
+            return not rating_counts
+        return (
+            summary.review_count == sum(rating_counts.values()) and
+            summary.rating_sum == sum(rating * count for rating, count in rating_counts.items()) and
+            all(getattr(summary, f'rating_{rating}_count') == rating_counts.get(rating, 0)
+                for rating in RATING_VALUES)
+        )
+
+    @staticmethod
+    def rebuild(space_id=None, dry_run=False):
+        """
+        Recompute summaries from the reviews table and repair any drift
+
+        Every repaired space's version is bumped, so cached catalogue
+        bodies and ETags do not keep serving the drifted ratings.
+
+        Args:
+            space_id: Rebuild a single space (None for all spaces)
+            dry_run: Only report drift, do not write corrections
+
+        Returns:
+            dict: Rebuild report with the list of drifted space IDs
+        """
+        expected = RatingSummaryService.compute_counts(space_id)
+
+        query = SpaceRatingSummary.query
+        if space_id:
+            query = query.filter(SpaceRatingSummary.space_id == space_id)
+        stored = {summary.space_id: summary for summary in query.all()}
+
+        drifted = []
+        for summary_space_id in sorted(set(expected) | set(stored)):
+            rating_counts = expected.get(summary_space_id, {})
+            summary = stored.get(summary_space_id)
+
+            if RatingSummaryService._matches(summary, rating_counts):
+                continue
+            # A missing row and an all-zero row both mean "no reviews"
+            if summary is not None and not rating_counts and summary.review_count == 0:
+                continue
+
+            drifted.append(summary_space_id)
+            if dry_run:
+                continue
+
+            if summary is None:
+                summary = SpaceRatingSummary(space_id=summary_space_id)
+                db.session.add(summary)
+            RatingSummaryService._apply_counts(summary, rating_counts)
+            bump_space_version(summary_space_id)
+
+        if not dry_run:
+            db.session.commit()
+
+        return {
+            'checked': len(set(expected) | set(stored)),
+            'drifted': drifted,
+            'repaired': not dry_run
+        }
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+# Upper bound on expanded occurrences, so a rule can never run away
+MAX_OCCURRENCES = 366
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+
+def parse_rrule(rule):
+    """
+    Parse the supported subset of an RFC 5545 RRULE string
+
+    Supports FREQ (DAILY, WEEKLY, MONTHLY), INTERVAL, COUNT, UNTIL and BYDAY
+    (plain weekday codes, weekly rules only), e.g. "FREQ=WEEKLY;BYDAY=TU,TH;COUNT=20".
+
+    Args:
+        rule: The RRULE string, with or without the "RRULE:" prefix
+
+    Returns:
+        dict: Keyword arguments for expand_recurrence
+    """
+    if rule.upper().startswith('RRULE:'):
+        rule = rule[len('RRULE:'):]
+
+    options = {}
+    for part in filter(None, rule.split(';')):
+        if '=' not in part:
+            raise ValueError(f'Invalid RRULE part: {part}')
+        key, value = part.split('=', 1)
+        key = key.strip().upper()
+        value = value.strip()
+
+        if key == 'FREQ':
+            options['freq'] = value.upper()
+        elif key == 'INTERVAL':
+            options['interval'] = int(value)
+        elif key == 'COUNT':
+            options['count'] = int(value)
+        elif key == 'UNTIL':
+            options['until'] = _parse_until(value)
+        elif key == 'BYDAY':
+            options['byday'] = [day.strip().upper() for day in value.split(',')]
+        else:
+            raise ValueError(f'Unsupported RRULE part: {key}')
+
+    return options
+
+
+def _parse_until(value):
+    for fmt in ('%Y%m%dT%H%M%S', '%Y%m%d'):
+        try:
+            return datetime.strptime(value.rstrip('Z'), fmt)
+        except ValueError:
+            continue
+    return datetime.fromisoformat(value)
+
+
+def _add_months(moment, months):
+    month_index = moment.month - 1 + months
+    year = moment.year + month_index // 12
+    month = month_index % 12 + 1
+    try:
+        return moment.replace(year=year, month=month)
+    except ValueError:
+        return None  # e.g. the 31st in a 30-day month: skipped, as in RFC 5545
+
+
+def _candidate_starts(start_time, freq, interval, byday):
+    if freq == 'DAILY':
+        step = 0
+        while True:
+            yield start_time + timedelta(days=step * interval)
+            step += 1
+
+    elif freq == 'WEEKLY':
+        weekdays = sorted(WEEKDAYS.index(day) for day in byday) if byday else [start_time.weekday()]
+        week_start = start_time - timedelta(days=start_time.weekday())
+        step = 0
+        while True:
+            for weekday in weekdays:
+                candidate = week_start + timedelta(weeks=step * interval, days=weekday)
+                if candidate >= start_time:
+                    yield candidate
+            step += 1
+
+    else:  # MONTHLY
+        step = 0
+        while True:
+            candidate = _add_months(start_time, step * interval)
+            if candidate is not None:
+                yield candidate
+            step += 1
+
+
+def expand_recurrence(start_time, end_time, freq, interval=1, count=None, until=None, byday=None):
+    """
+    Expand a recurrence rule into concrete occurrences
+
+    Args:
+        start_time: Start of the first occurrence
+        end_time: End of the first occurrence (sets every occurrence's duration)
+        freq: DAILY, WEEKLY or MONTHLY
+        interval: Repeat every N periods (default: 1)
+        count: Number of occurrences to generate
+        until: Last allowed occurrence start (inclusive)
+        byday: Weekday codes (MO..SU) for weekly rules
+
+    Returns:
+        list: (start_time, end_time) tuples in chronological order
+    """
+    freq = (freq or '').upper()
+    if freq not in FREQUENCIES:
+        raise ValueError(f'Unsupported frequency: {freq}. Use one of {", ".join(FREQUENCIES)}')
+    if interval < 1:
+        raise ValueError('Interval must be a positive integer')
+    if count is None and until is None:
+        raise ValueError('Recurrence needs a count or an until date')
+    if count is not None and not 1 <= count <= MAX_OCCURRENCES:
+        raise ValueError(f'Count must be between 1 and {MAX_OCCURRENCES}')
+    if byday:
+        if freq != 'WEEKLY':
+            raise ValueError('BYDAY is only supported for weekly recurrences')
+        invalid = [day for day in byday if day not in WEEKDAYS]
+        if invalid:
+            raise ValueError(f'Invalid weekday codes: {", ".join(invalid)}')
+    if end_time <= start_time:
+        raise ValueError('End time must be after start time')
+
+    duration = end_time - start_time
+    occurrences = []
+    for candidate in _candidate_starts(start_time, freq, interval, byday):
+        if until is not None and candidate > until:
+            break
+        occurrences.append((candidate, candidate + duration))
+        if count is not None and len(occurrences) >= count:
+            break
+        if len(occurrences) > MAX_OCCURRENCES:
+            raise ValueError(f'Recurrence expands to more than {MAX_OCCURRENCES} occurrences')
+
+    return occurrences
@@ -0,0 +1,205 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_, update
+from src.models.rental_models import db, Reservation, Payment, ReservationStatus, PaymentStatus
+from src.services.stripe_service import StripeService
+from src.services.daily_metrics import DailyMetricsService
+from src.services.idempotency import IdempotencyService
+
+# How long a PENDING reservation holds its slot while the customer pays
+HOLD_TTL_MINUTES = int(os.getenv('RESERVATION_HOLD_TTL_MINUTES', '30'))
+
+# Payment intents cancelled per batch, and Stripe calls in flight per batch
+STRIPE_CANCEL_BATCH_SIZE = 50
+STRIPE_CANCEL_CONCURRENCY = 8
+
+
+def hold_expiry(now=None):
+    """Expiry timestamp for a hold placed now"""
+    return (now or datetime.utcnow()) + timedelta(minutes=HOLD_TTL_MINUTES)
+
+
+def is_hold_expired(reservation, now=None):
+    """Check whether a reservation is a PENDING hold that has run out"""
+    return (
+        reservation.status == ReservationStatus.PENDING
+        and reservation.hold_expires_at is not None
+        and reservation.hold_expires_at <= (now or datetime.utcnow())
+    )
+
+
+def active_reservation_clause(now=None):
+    """
+    SQL filter for reservations that currently block their slot
+
+    Confirmed reservations always block; pending ones only while their hold
+    is live. Expired holds are ignored here even before the sweeper has
+    cancelled them.
+    """
+    return or_(
+        Reservation.status == ReservationStatus.CONFIRMED,
+        and_(
+            Reservation.status == ReservationStatus.PENDING,
+            or_(
+                Reservation.hold_expires_at.is_(None),
+                Reservation.hold_expires_at > (now or datetime.utcnow())
+            )
+        )
+    )
+
+
+def overlapping_reservation_clause(space_id, start_time, end_time, now=None):
+    """SQL filter for the active reservations of a space that overlap a time range"""
+    return and_(
+        Reservation.space_id == space_id,
+        active_reservation_clause(now),
+        Reservation.start_time < end_time,
+        Reservation.end_time > start_time
+    )
+
+
+class HoldExpiryService:
+    """Service class for expiring abandoned reservation holds"""
+
+    @staticmethod
+    def expire_holds(now=None, space_ids=None, exclude_ids=()):
+        """
+        Cancel expired holds with one set-based UPDATE (not committed)
+
+        Args:
+            now: Reference time (default: current UTC time)
+            space_ids: Only expire holds on these spaces (None for all spaces)
+            exclude_ids: Reservation IDs to leave untouched
+
+        Returns:
+            int: Number of reservations cancelled
+        """
+        now = now or datetime.utcnow()
+        conditions = [
+            Reservation.status == ReservationStatus.PENDING,
+            Reservation.hold_expires_at <= now
+        ]
+        if space_ids is not None:
+            conditions.append(Reservation.space_id.in_(space_ids))
+        if exclude_ids:
+            conditions.append(Reservation.id.notin_(exclude_ids))
+
+        statement = update(Reservation).where(*conditions).values(
+            status=ReservationStatus.CANCELLED, updated_at=now
+        ).returning(
+            Reservation.space_id, Reservation.start_time, Reservation.end_time
+        ).execution_options(synchronize_session=False)
+
+        # Autoflush off: callers may hold new rows that only become valid once these are cancelled
+        with db.session.no_autoflush:
+            rows = db.session.execute(statement).all()
+            DailyMetricsService.record_status_change(rows, ReservationStatus.PENDING, ReservationStatus.CANCELLED)
+        return len(rows)
+
+    @staticmethod
+    def cancel_payment_intents(now=None, batch_size=STRIPE_CANCEL_BATCH_SIZE, limit=None):
+        """
+        Cancel the Stripe intents still pending on expired holds, in batches
+
+        Covers holds cancelled by the sweeper as well as those released
+        inline by the booking endpoints. Each batch is cancelled concurrently
+        and its payments marked failed in one UPDATE; intents Stripe refuses
+        to cancel stay pending and are retried on the next sweep.
+
+        Args:
+            now: Reference time (default: current UTC time)
+            batch_size: Intents per batch
+            limit: Maximum number of intents to process (None for all)
+
+        Returns:
+            dict: Counts of cancelled and failed intents
+        """
+        now = now or datetime.utcnow()
+        query = db.session.query(Payment.id, Payment.stripe_payment_intent_id).join(
+            Reservation, Payment.reservation_id == Reservation.id
+        ).filter(
+            Payment.status == PaymentStatus.PENDING,
+            Reservation.status == ReservationStatus.CANCELLED,
+            Reservation.hold_expires_at <= now
+        ).order_by(Payment.created_at)
+        if limit:
+            query = query.limit(limit)
+        pending = query.all()
+
+        cancelled = 0
+        failed = []
+        for offset in range(0, len(pending), batch_size):
+            batch = pending[offset:offset + batch_size]
+            with ThreadPoolExecutor(max_workers=min(len(batch), STRIPE_CANCEL_CONCURRENCY)) as pool:
+                results = list(pool.map(
+                    StripeService.cancel_payment_intent,
+                    [intent_id for _, intent_id in batch]
+                ))
+
+            cancelled_ids = []
+            for (payment_id, intent_id), result in zip(batch, results):
+                if result['success']:
+                    cancelled_ids.append(payment_id)
+                else:
+                    failed.append({'payment_intent_id': intent_id, 'error': result['error']})
+
+            if cancelled_ids:
+                Payment.query.filter(Payment.id.in_(cancelled_ids)).update(
+                    {'status': PaymentStatus.FAILED}, synchronize_session=False
+                )
+                db.session.commit()
+                cancelled += len(cancelled_ids)
+
+        return {'cancelled': cancelled, 'failed': failed}
+
+    @staticmethod
+    def sweep(now=None, batch_size=STRIPE_CANCEL_BATCH_SIZE):
+        """
+        Expire all abandoned holds and cancel their payment intents
+
+        Expired idempotency keys are purged in the same pass.
+
+        Returns:
+            dict: Sweep summary
+        """
+        now = now or datetime.utcnow()
+        try:
+            expired = HoldExpiryService.expire_holds(now)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        intents = HoldExpiryService.cancel_payment_intents(now, batch_size=batch_size)
+        purged = IdempotencyService.purge_expired(now)
+        return {
+            'expired_reservations': expired,
+            'cancelled_payment_intents': intents['cancelled'],
+            'failed_payment_intents': intents['failed'],
+            'purged_idempotency_keys': purged
+        }
+
+
+def start_hold_sweeper(app, interval_seconds):
+    """
+    Run the hold sweeper in a daemon thread every `interval_seconds`
+
+    Returns:
+        threading.Event: Set it to stop the sweeper
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    HoldExpiryService.sweep()
+                except Exception as e:
+                    app.logger.error(f'Reservation hold sweep failed: {e}')
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=run, name='reservation-hold-sweeper', daemon=True).start()
+    return stop
@@ -0,0 +1,91 @@
+import time
+import threading
+from collections import OrderedDict
+
+
+class VersionedResponseCache:
+    """Thread-safe in-process cache of serialized response bodies keyed by version tag"""
+    
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key, version):
+        """
+        Get a cached body if it was stored for the given version
+        
+        Args:
+            key: Cache key (e.g. a resource path)
+            version: Version tag the caller expects (e.g. an ETag)
+            
+        Returns:
+            bytes: Cached body, or None on a miss or a stale version
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key, version, body):
+        """
+        Store a body for a key, replacing any older version
+        
+        Args:
+            key: Cache key
+            version: Version tag the body was built for
+            body: Serialized response body
+        """
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key=None):
+        """Drop one key, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+class TTLCache:
+    """Thread-safe in-process cache whose entries expire after a fixed number of seconds"""
+    
+    def __init__(self, ttl_seconds=30):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Get a cached value if it has not expired
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            The cached value, or None on a miss or an expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return entry[1]
+    
+    def put(self, key, value):
+        """Store a value for `ttl_seconds`"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+    
+    def invalidate(self, key=None):
+        """Drop one key, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -0,0 +1,93 @@
+import io
+import csv
+import json
+import zlib
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _buffered(pieces, chunk_size):
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_json_list(items, envelope=None, key='data', chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Incrementally encode a JSON object whose `key` holds a list of items
+
+    Only one chunk is held in memory at a time, so arbitrarily long result
+    sets can be sent with flat memory use.
+
+    Args:
+        items: Iterable of JSON-serializable dicts
+        envelope: Other top-level fields (e.g. {'success': True})
+        key: Name of the list field
+        chunk_size: Approximate size of each yielded chunk in characters
+
+    Yields:
+        str: Pieces of the JSON document
+    """
+    def pieces():
+        head = json.dumps(envelope or {})[:-1]
+        yield f'{head}{", " if envelope else ""}{json.dumps(key)}: ['
+        for position, item in enumerate(items):
+            yield (', ' if position else '') + json.dumps(item)
+        yield ']}'
+
+    return _buffered(pieces(), chunk_size)
+
+
+def stream_csv(header, rows, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Incrementally encode rows as CSV
+
+    Args:
+        header: Column names for the first line
+        rows: Iterable of row sequences
+        chunk_size: Approximate size of each yielded chunk in characters
+
+    Yields:
+        str: Pieces of the CSV document
+    """
+    def pieces():
+        line = io.StringIO()
+        writer = csv.writer(line)
+        if header:
+            writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            yield line.getvalue()
+            line.seek(0)
+            line.truncate()
+        yield line.getvalue()
+
+    return _buffered(pieces(), chunk_size)
+
+
+def gzip_stream(chunks, encoding='utf-8', level=6):
+    """
+    Gzip a stream of text chunks on the fly
+
+    Args:
+        chunks: Iterable of str chunks
+        encoding: Text encoding applied before compression
+        level: zlib compression level
+
+    Yields:
+        bytes: Gzip-framed compressed data
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode(encoding))
+        if data:
+            yield data
+    yield compressor.flush()
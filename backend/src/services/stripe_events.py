@@ -0,0 +1,291 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import insert, select, or_, tuple_
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from src.models.rental_models import (
+    db, Payment, StripeEvent, ReservationStatus, PaymentStatus, StripeEventStatus
+)
+from src.services.availability_index import availability_index
+from src.services.transitions import TransitionService, reservations_paid_by
+
+# Events applied per transaction
+STRIPE_EVENT_BATCH_SIZE = int(os.getenv('STRIPE_EVENT_BATCH_SIZE', '100'))
+
+# Failed applications before an event is parked as FAILED
+MAX_EVENT_ATTEMPTS = 5
+
+# Seconds before the first retry of a failed event; doubled for every further attempt
+STRIPE_EVENT_RETRY_DELAY = int(os.getenv('STRIPE_EVENT_RETRY_DELAY', '30'))
+
+_INSERT_IGNORE_DIALECTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Stripe event type -> handler(event, payment_intent_id); see `handles`
+_HANDLERS = {}
+
+# Set by the webhook so the worker picks new events up without waiting a full interval
+_wakeup = threading.Event()
+
+
+def handles(*event_types):
+    """
+    Register a function as the handler for one or more Stripe event types
+
+    Handlers are called as handler(event, payment_intent_id) inside the
+    batch transaction, once a payment for the intent is known to exist.
+    They apply guarded transitions without committing, and return the
+    reservation rows whose status they changed. Raising marks the event
+    for a retry.
+    """
+    def register(handler):
+        for event_type in event_types:
+            _HANDLERS[event_type] = handler
+        return handler
+    return register
+
+
+def payment_intent_id_of(event):
+    """The payment intent an event is about, or None"""
+    event_object = event['data']['object']
+    if event_object.get('object') == 'payment_intent':
+        return event_object.get('id')
+    return event_object.get('payment_intent')
+
+
+def retry_delay(attempts):
+    """Backoff before the next application of an event that has failed `attempts` times"""
+    return timedelta(seconds=STRIPE_EVENT_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def notify_stripe_event_worker():
+    """Wake the in-process worker, if one is running"""
+    _wakeup.set()
+
+
+@handles('payment_intent.succeeded')
+def _payment_succeeded(event, payment_intent_id):
+    # Holds that expired before the payment landed stay cancelled; reconciliation picks those up
+    _, reservations = TransitionService.settle_payment(payment_intent_id, PaymentStatus.SUCCEEDED)
+    return reservations
+
+
+@handles('payment_intent.payment_failed', 'payment_intent.canceled')
+def _payment_failed(event, payment_intent_id):
+    # The transition table keeps a stale failure notice from undoing a success
+    TransitionService.settle_payment(payment_intent_id, PaymentStatus.FAILED)
+    return []
+
+
+@handles('charge.refunded')
+def _charge_refunded(event, payment_intent_id):
+    charge = event['data']['object']
+    # Partial refunds leave the booking in place, as in the refund endpoint
+    if charge.get('amount_refunded', 0) < charge.get('amount', 0):
+        return []
+    return TransitionService.transition_reservations(
+        ReservationStatus.CANCELLED, reservations_paid_by(payment_intent_id), single=True
+    )
+
+
+class StripeEventProcessor:
+    """Service class for storing Stripe webhook events and applying them asynchronously"""
+
+    @staticmethod
+    def store(event, payload):
+        """
+        Persist a verified webhook event unless it was already received
+
+        Args:
+            event: The verified Stripe event
+            payload: The raw request body
+
+        Returns:
+            bool: True if the event is new, False for a redelivery
+        """
+        values = {
+            'id': event['id'],
+            'type': event['type'],
+            'payment_intent_id': payment_intent_id_of(event),
+            'stripe_created': event['created'],
+            'payload': payload.decode('utf-8') if isinstance(payload, bytes) else payload,
+            'status': StripeEventStatus.PENDING,
+            'attempts': 0,
+            'received_at': datetime.utcnow()
+        }
+
+        dialect_insert = _INSERT_IGNORE_DIALECTS.get(db.engine.dialect.name)
+        try:
+            if dialect_insert is not None:
+                result = db.session.execute(
+                    dialect_insert(StripeEvent).values(**values).on_conflict_do_nothing(index_elements=['id'])
+                )
+                db.session.commit()
+                return result.rowcount == 1
+
+            db.session.execute(insert(StripeEvent).values(**values))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            if db.session.get(StripeEvent, event['id']) is not None:
+                return False
+            raise
+
+    @staticmethod
+    def process_pending(batch_size=STRIPE_EVENT_BATCH_SIZE):
+        """
+        Apply one batch of due pending events, oldest first, in one transaction
+
+        An event is only claimed once no earlier event for its payment
+        intent is still pending or parked as FAILED, so events for an intent
+        are applied in Stripe's creation order and a batch holds at most one
+        event per intent. A failed event is retried after an exponential
+        backoff. Claimed rows are locked with SKIP LOCKED, so concurrent
+        workers never apply the same event. Each event is applied in a
+        savepoint, so a failing handler only rolls back its own changes.
+
+        Args:
+            batch_size: Maximum number of events to apply
+
+        Returns:
+            dict: Counts per outcome, and whether more events may be due
+        """
+        now = datetime.utcnow()
+        earlier = aliased(StripeEvent)
+        # Events without a handler are never applied, so they hold nothing up
+        blocking = select(earlier.id).where(
+            earlier.payment_intent_id == StripeEvent.payment_intent_id,
+            tuple_(earlier.stripe_created, earlier.id) < tuple_(StripeEvent.stripe_created, StripeEvent.id),
+            earlier.status.in_([StripeEventStatus.PENDING, StripeEventStatus.FAILED]),
+            earlier.type.in_(list(_HANDLERS))
+        )
+        events = StripeEvent.query.filter(
+            StripeEvent.status == StripeEventStatus.PENDING,
+            or_(StripeEvent.next_attempt_at.is_(None), StripeEvent.next_attempt_at <= now),
+            ~blocking.exists()
+        ).order_by(StripeEvent.stripe_created, StripeEvent.id).limit(batch_size).with_for_update(
+            skip_locked=True
+        ).all()
+
+        report = {'processed': 0, 'ignored': 0, 'retrying': 0, 'failed': 0, 'more': len(events) == batch_size}
+        if not events:
+            return report
+
+        # Which of the batch's payment intents have a payment yet, in one query
+        intent_ids = {stored.payment_intent_id for stored in events if stored.payment_intent_id}
+        known_intents = set()
+        if intent_ids:
+            known_intents = set(db.session.execute(
+                select(Payment.stripe_payment_intent_id).where(Payment.stripe_payment_intent_id.in_(intent_ids))
+            ).scalars())
+
+        changed = []
+        for stored in events:
+            handler = _HANDLERS.get(stored.type)
+            if handler is None:
+                stored.status = StripeEventStatus.IGNORED
+                stored.processed_at = now
+                report['ignored'] += 1
+                continue
+
+            stored.attempts += 1
+            try:
+                if stored.payment_intent_id not in known_intents:
+                    # The webhook can outrun the commit of the payment row
+                    raise LookupError(f'No payment for payment intent {stored.payment_intent_id}')
+                with db.session.begin_nested():
+                    reservations = handler(json.loads(stored.payload), stored.payment_intent_id)
+                    db.session.flush()
+            except Exception as e:
+                stored.last_error = str(e)
+                if stored.attempts >= MAX_EVENT_ATTEMPTS:
+                    # Stays FAILED, holding up later events for the intent, until requeued
+                    stored.status = StripeEventStatus.FAILED
+                    stored.processed_at = now
+                    report['failed'] += 1
+                else:
+                    stored.next_attempt_at = now + retry_delay(stored.attempts)
+                    report['retrying'] += 1
+                continue
+
+            changed.extend(reservations)
+            stored.status = StripeEventStatus.PROCESSED
+            stored.processed_at = now
+            stored.next_attempt_at = None
+            stored.last_error = None
+            report['processed'] += 1
+
+        db.session.commit()
+        for reservation in changed:
+            availability_index.record(reservation)
+        # Applying an event can make the next event for its intent due
+        report['more'] = report['more'] or bool(report['processed'])
+        return report
+
+    @staticmethod
+    def drain(batch_size=STRIPE_EVENT_BATCH_SIZE):
+        """
+        Apply batches until no pending event is due
+
+        Failed events back off before they are due again, so they are not
+        retried within one drain.
+
+        Returns:
+            dict: Totals over all batches
+        """
+        totals = {'processed': 0, 'ignored': 0, 'retrying': 0, 'failed': 0}
+        while True:
+            report = StripeEventProcessor.process_pending(batch_size)
+            for outcome in totals:
+                totals[outcome] += report[outcome]
+            if not report['more']:
+                return totals
+
+    @staticmethod
+    def retry_failed():
+        """
+        Move events parked as FAILED back to the pending backlog
+
+        Returns:
+            int: Number of events requeued
+        """
+        count = StripeEvent.query.filter(StripeEvent.status == StripeEventStatus.FAILED).update(
+            {'status': StripeEventStatus.PENDING, 'attempts': 0, 'next_attempt_at': None, 'processed_at': None},
+            synchronize_session=False
+        )
+        db.session.commit()
+        return count
+
+
+def start_stripe_event_worker(app, interval_seconds):
+    """
+    Apply stored webhook events in a daemon thread
+
+    The worker runs every `interval_seconds`, or as soon as the webhook
+    stores a new event.
+
+    Returns:
+        threading.Event: Set it to stop the worker
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.is_set():
+            _wakeup.wait(interval_seconds)
+            _wakeup.clear()
+            if stop.is_set():
+                break
+            with app.app_context():
+                try:
+                    StripeEventProcessor.drain()
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f'Stripe event processing failed: {e}')
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=run, name='stripe-event-worker', daemon=True).start()
+    return stop
@@ -2,6 +2,7 @@ import os
 import stripe
 from dotenv import load_dotenv
 from decimal import Decimal
+from src.services.stripe_transport import configure_stripe_transport
 
 # Load environment variables
 load_dotenv()
@@ -9,11 +10,14 @@ load_dotenv()
 # Configure Stripe
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
 
+# Shared pooled HTTP client with timeouts, bounded retries and a circuit breaker
+stripe_http_client = configure_stripe_transport()
+
 class StripeService:
     """Service class for handling Stripe payment operations"""
     
     @staticmethod
-    def create_payment_intent(amount, currency='usd', metadata=None):
+    def create_payment_intent(amount, currency='usd', metadata=None, idempotency_key=None):
         """
         Create a Stripe Payment Intent
         
@@ -21,6 +25,7 @@ class StripeService:
             amount: Amount in cents (e.g., 2000 for $20.00)
             currency: Currency code (default: 'usd')
             metadata: Additional metadata for the payment
+            idempotency_key: Stripe idempotency key (optional)
             
         Returns:
             dict: Payment intent data or error
@@ -39,6 +44,7 @@ class StripeService:
                 automatic_payment_methods={
                     'enabled': True,
                 },
+                idempotency_key=idempotency_key,
             )
             
             return {
@@ -137,6 +143,57 @@ class StripeService:
                 'error_type': type(e).__name__
             }
     
+    @staticmethod
+    def list_payment_intents(created_gte, created_lt, starting_after=None, limit=100):
+        """
+        List one page of Payment Intents created in a time window, newest first
+
+        Args:
+            created_gte: Window start, Unix seconds (inclusive)
+            created_lt: Window end, Unix seconds (exclusive)
+            starting_after: Last Payment Intent ID of the previous page (optional)
+            limit: Page size (Stripe allows at most 100)
+
+        Returns:
+            dict: The page's Payment Intents and whether more follow, or error
+        """
+        try:
+            list_params = {
+                'created': {'gte': created_gte, 'lt': created_lt},
+                'limit': limit,
+                # The charge carries the refunded amount
+                'expand': ['data.latest_charge']
+            }
+            if starting_after:
+                list_params['starting_after'] = starting_after
+
+            page = stripe.PaymentIntent.list(**list_params)
+
+            return {
+                'success': True,
+                'payment_intents': [
+                    {
+                        'id': payment_intent.id,
+                        'status': payment_intent.status,
+                        'amount': payment_intent.amount,
+                        'created': payment_intent.created,
+                        'has_payment_error': bool(payment_intent.get('last_payment_error')),
+                        'amount_refunded': (
+                            payment_intent.latest_charge.amount_refunded if payment_intent.get('latest_charge') else 0
+                        )
+                    }
+                    for payment_intent in page.data
+                ],
+                'has_more': page.has_more
+            }
+
+        except stripe.error.StripeError as e:
+            return {
+                'success': False,
+                'error': str(e),
+                'error_type': type(e).__name__
+            }
+
     @staticmethod
     def cancel_payment_intent(payment_intent_id):
         """
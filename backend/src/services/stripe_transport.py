@@ -0,0 +1,265 @@
+import bisect
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import stripe
+from stripe import APIConnectionError, RequestsClient
+
+# Connect and read timeouts for one attempt, in seconds
+STRIPE_CONNECT_TIMEOUT = float(os.getenv('STRIPE_CONNECT_TIMEOUT', '3'))
+STRIPE_READ_TIMEOUT = float(os.getenv('STRIPE_READ_TIMEOUT', '10'))
+
+# Retries after the first attempt, for connection errors, 409s and 5xx
+STRIPE_MAX_RETRIES = int(os.getenv('STRIPE_MAX_RETRIES', '2'))
+
+# Retry backoff: full jitter over an exponential ceiling, in seconds
+STRIPE_RETRY_BASE_DELAY = 0.25
+STRIPE_RETRY_MAX_DELAY = 2.0
+
+# Keep-alive connections kept per host (the hold sweeper alone runs 8 calls at once)
+STRIPE_POOL_SIZE = int(os.getenv('STRIPE_POOL_SIZE', '10'))
+
+# Consecutive failed attempts that open the breaker, and how long it stays open
+STRIPE_BREAKER_THRESHOLD = int(os.getenv('STRIPE_BREAKER_THRESHOLD', '5'))
+STRIPE_BREAKER_COOLDOWN = float(os.getenv('STRIPE_BREAKER_COOLDOWN', '30'))
+
+# Histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Object IDs in API paths (pi_3Nx..., ch_..., re_...) are folded so every call
+# of one API method shares a histogram; resource names never contain digits or capitals
+_OBJECT_ID = re.compile(r'^[a-z]+_[A-Za-z0-9_]*[A-Z0-9][A-Za-z0-9_]*$')
+
+
+def api_method(method, url):
+    """Histogram key for a request, e.g. 'POST /v1/payment_intents/{id}/cancel'"""
+    segments = ['{id}' if _OBJECT_ID.match(segment) else segment for segment in urlsplit(url).path.split('/')]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (not thread-safe; StripeMetrics holds the lock)"""
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        # One count per bucket plus the overflow bucket
+        self.counts = [0] * (len(buckets_ms) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.errors = 0
+        # Calls failed fast by the breaker; not part of the latency distribution
+        self.rejected = 0
+
+    def observe(self, elapsed_ms, error=False):
+        self.counts[bisect.bisect_left(self.buckets_ms, elapsed_ms)] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None if it is the overflow bucket)"""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets_ms[position] if position < len(self.buckets_ms) else None
+        return None
+
+    def to_dict(self):
+        bounds = list(self.buckets_ms) + [None]
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'mean_ms': round(self.total_ms / self.count, 2) if self.count else 0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': [{'le_ms': bound, 'count': count} for bound, count in zip(bounds, self.counts)]
+        }
+
+
+class StripeMetrics:
+    """Per-API-method latency histograms of every Stripe HTTP attempt"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def _histogram(self, method):
+        histogram = self._histograms.get(method)
+        if histogram is None:
+            histogram = self._histograms[method] = LatencyHistogram()
+        return histogram
+
+    def observe(self, method, elapsed_ms, error=False):
+        with self._lock:
+            self._histogram(method).observe(elapsed_ms, error)
+
+    def reject(self, method):
+        with self._lock:
+            self._histogram(method).rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {method: histogram.to_dict() for method, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Closed: calls go through. After `threshold` consecutive failures it
+    opens and calls fail immediately for `cooldown` seconds. Then it is
+    half-open: one trial call goes through, and its outcome closes the
+    breaker again or reopens it for another cooldown.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, threshold=STRIPE_BREAKER_THRESHOLD, cooldown=STRIPE_BREAKER_COOLDOWN, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at < self.cooldown:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        """Whether a call may go through now"""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            # A failed trial reopens; late failures of calls sent before opening don't extend the cooldown
+            if self._trial_in_flight or (self._opened_at is None and self._failures >= self.threshold):
+                self._opened_at = self._clock()
+                self.times_opened += 1
+            self._trial_in_flight = False
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'state': self._state(),
+                'consecutive_failures': self._failures,
+                'threshold': self.threshold,
+                'cooldown_seconds': self.cooldown,
+                'times_opened': self.times_opened
+            }
+
+
+class StripeHTTPClient(RequestsClient):
+    """
+    stripe HTTP client on one shared, pooled requests.Session
+
+    Every attempt (including SDK retries) is timed into `metrics` and
+    passes through `breaker`: while the breaker is open, calls raise
+    APIConnectionError immediately instead of waiting on Stripe.
+    """
+
+    def __init__(self, timeout=(STRIPE_CONNECT_TIMEOUT, STRIPE_READ_TIMEOUT), pool_size=STRIPE_POOL_SIZE,
+                 breaker=None, metrics=None):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        super().__init__(timeout=timeout, session=session)
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or StripeMetrics()
+
+    def request(self, method, url, headers, post_data=None):
+        key = api_method(method, url)
+        if not self.breaker.allow():
+            self.metrics.reject(key)
+            raise APIConnectionError(
+                'Stripe is unavailable (circuit breaker open); request not sent',
+                should_retry=False
+            )
+
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, headers, post_data)
+        except APIConnectionError:
+            self.breaker.record_failure()
+            self.metrics.observe(key, (time.monotonic() - started) * 1000, error=True)
+            raise
+
+        # 4xx (including 429) means Stripe is up and answering; only 5xx counts against it
+        failed = response[1] >= 500
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self.metrics.observe(key, (time.monotonic() - started) * 1000, error=failed)
+        return response
+
+    def _sleep_time_seconds(self, num_retries, response=None):
+        # Full jitter, capped low so a slow Stripe can't hold a worker for long
+        ceiling = min(STRIPE_RETRY_BASE_DELAY * (2 ** (num_retries - 1)), STRIPE_RETRY_MAX_DELAY)
+        sleep_seconds = random.uniform(0, ceiling)
+        retry_after = self._retry_after_header(response) or 0
+        if retry_after <= STRIPE_RETRY_MAX_DELAY:
+            sleep_seconds = max(sleep_seconds, retry_after)
+        return sleep_seconds
+
+
+def configure_stripe_transport():
+    """
+    Install the shared HTTP client and retry budget into the stripe module
+
+    STRIPE_API_BASE points the SDK at another server (e.g. the local fake
+    Stripe server) instead of api.stripe.com.
+
+    Returns:
+        StripeHTTPClient: The installed client
+    """
+    client = StripeHTTPClient()
+    stripe.default_http_client = client
+    stripe.max_network_retries = STRIPE_MAX_RETRIES
+    api_base = os.getenv('STRIPE_API_BASE')
+    if api_base:
+        stripe.api_base = api_base.rstrip('/')
+    return client
@@ -0,0 +1,133 @@
+from datetime import datetime
+from sqlalchemy import select, update
+from src.models.rental_models import db, Reservation, Payment, ReservationStatus, PaymentStatus
+from src.services.daily_metrics import DailyMetricsService
+
+# Legal status changes. A guarded UPDATE only touches rows whose current
+# status may move to the target, so a late or concurrent writer can never
+# undo a later state (e.g. a stale failure notice overwriting a success).
+PAYMENT_TRANSITIONS = {
+    PaymentStatus.PENDING: frozenset({PaymentStatus.SUCCEEDED, PaymentStatus.FAILED}),
+    # A declined card can be retried on the same payment intent
+    PaymentStatus.FAILED: frozenset({PaymentStatus.PENDING, PaymentStatus.SUCCEEDED}),
+    # Final; a refund cancels the reservation instead
+    PaymentStatus.SUCCEEDED: frozenset()
+}
+
+RESERVATION_TRANSITIONS = {
+    ReservationStatus.PENDING: frozenset({ReservationStatus.CONFIRMED, ReservationStatus.CANCELLED}),
+    ReservationStatus.CONFIRMED: frozenset({ReservationStatus.CANCELLED}),
+    # Final; the slot may have been rebooked
+    ReservationStatus.CANCELLED: frozenset()
+}
+
+
+def legal_sources(transitions, new_status):
+    """Statuses that may move to `new_status`, in declaration order"""
+    return [status for status, targets in transitions.items() if new_status in targets]
+
+
+def reservations_paid_by(payment_intent_id):
+    """SQL filter for the reservations a Stripe payment intent pays for"""
+    return Reservation.id.in_(
+        select(Payment.reservation_id).where(Payment.stripe_payment_intent_id == payment_intent_id)
+    )
+
+
+class TransitionService:
+    """Service class for guarded, set-based payment and reservation status changes"""
+
+    @staticmethod
+    def transition_payments(new_status, *criteria):
+        """
+        Move matching payments to `new_status` with one UPDATE ... RETURNING (not committed)
+
+        Only rows in a legal source status are changed. The revenue rollup is
+        updated from the returned rows (only SUCCEEDED earns revenue, and it
+        is final, so every source contributes nothing).
+
+        Args:
+            new_status: Target PaymentStatus
+            criteria: SQL filters selecting the payments
+
+        Returns:
+            list: (id, reservation_id, space_id, created_at, amount) of every changed payment
+        """
+        sources = legal_sources(PAYMENT_TRANSITIONS, new_status)
+        space_id = select(Reservation.space_id).where(
+            Reservation.id == Payment.reservation_id
+        ).scalar_subquery().label('space_id')
+
+        rows = db.session.execute(
+            update(Payment).where(*criteria, Payment.status.in_(sources)).values(status=new_status).returning(
+                Payment.id, Payment.reservation_id, space_id, Payment.created_at, Payment.amount
+            ).execution_options(synchronize_session=False)
+        ).all()
+
+        DailyMetricsService.record_payment_status_change(
+            [(row.space_id, row.created_at, row.amount) for row in rows], PaymentStatus.PENDING, new_status
+        )
+        return rows
+
+    @staticmethod
+    def transition_reservations(new_status, *criteria, single=False):
+        """
+        Move matching reservations to `new_status` with guarded UPDATE ... RETURNING statements (not committed)
+
+        The rollup needs each row's previous status, which RETURNING cannot
+        report, so there is one UPDATE per legal source status. With
+        `single`, the criteria select at most one reservation and the
+        remaining sources are skipped once it has changed.
+
+        Args:
+            new_status: Target ReservationStatus
+            criteria: SQL filters selecting the reservations
+            single: Stop after the first UPDATE that changes a row
+
+        Returns:
+            list: (id, space_id, start_time, end_time, status, hold_expires_at, updated_at) of
+            every changed reservation, usable with availability_index.record after the commit
+        """
+        changed = []
+        now = datetime.utcnow()
+        for old_status in legal_sources(RESERVATION_TRANSITIONS, new_status):
+            rows = db.session.execute(
+                update(Reservation).where(*criteria, Reservation.status == old_status).values(
+                    status=new_status, updated_at=now
+                ).returning(
+                    Reservation.id, Reservation.space_id, Reservation.start_time, Reservation.end_time,
+                    Reservation.status, Reservation.hold_expires_at, Reservation.updated_at
+                ).execution_options(synchronize_session=False)
+            ).all()
+            DailyMetricsService.record_status_change(
+                [(row.space_id, row.start_time, row.end_time) for row in rows], old_status, new_status
+            )
+            changed.extend(rows)
+            if single and rows:
+                break
+        return changed
+
+    @staticmethod
+    def settle_payment(payment_intent_id, new_status):
+        """
+        Apply a Stripe payment outcome to its payments and reservation (not committed)
+
+        A success also confirms the reservation if it is still pending; a
+        reservation cancelled in the meantime stays cancelled.
+
+        Args:
+            payment_intent_id: The Stripe payment intent
+            new_status: Target PaymentStatus
+
+        Returns:
+            tuple: (changed payment rows, changed reservation rows)
+        """
+        payments = TransitionService.transition_payments(
+            new_status, Payment.stripe_payment_intent_id == payment_intent_id
+        )
+        reservations = []
+        if new_status == PaymentStatus.SUCCEEDED:
+            reservations = TransitionService.transition_reservations(
+                ReservationStatus.CONFIRMED, reservations_paid_by(payment_intent_id), single=True
+            )
+        return payments, reservations
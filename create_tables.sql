@@ -1,7 +1,11 @@
+-- Required for the reservation exclusion constraint (GiST equality on space_id)
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 -- Create ENUM types
 CREATE TYPE user_role AS ENUM ('admin', 'customer');
 CREATE TYPE reservation_status AS ENUM ('pending', 'confirmed', 'cancelled');
 CREATE TYPE payment_status AS ENUM ('succeeded', 'pending', 'failed');
+CREATE TYPE stripe_event_status AS ENUM ('pending', 'processed', 'ignored', 'failed');
 
 -- Create users table
 CREATE TABLE users (
@@ -22,6 +26,7 @@ CREATE TABLE rental_spaces (
     price_per_hour DECIMAL NOT NULL,
     capacity INTEGER,
     photos JSONB,
+    version INTEGER NOT NULL DEFAULT 1,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -35,8 +40,15 @@ CREATE TABLE reservations (
     end_time TIMESTAMPTZ NOT NULL,
     total_price DECIMAL NOT NULL,
     status reservation_status NOT NULL,
+    hold_expires_at TIMESTAMPTZ,
     created_at TIMESTAMPTZ DEFAULT NOW(),
-    updated_at TIMESTAMPTZ DEFAULT NOW()
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    CONSTRAINT reservations_valid_range CHECK (end_time > start_time),
+    -- Active bookings of the same space may never overlap, even under concurrent writers
+    CONSTRAINT reservations_no_overlap EXCLUDE USING gist (
+        space_id WITH =,
+        tstzrange(start_time, end_time, '[)') WITH &&
+    ) WHERE (status IN ('pending', 'confirmed'))
 );
 
 -- Create payments table
@@ -49,6 +61,14 @@ CREATE TABLE payments (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Indexes for the hot query shapes (apply to a live database with backend/apply_indexes.py)
+CREATE INDEX idx_reservations_space_status_time ON reservations(space_id, status, start_time, end_time);
+CREATE INDEX idx_reservations_start_time_id ON reservations(start_time, id);
+CREATE INDEX idx_reservations_created_at_id ON reservations(created_at, id);
+CREATE INDEX idx_reservations_pending_hold ON reservations(hold_expires_at) WHERE status = 'pending';
+CREATE INDEX idx_payments_stripe_payment_intent_id ON payments(stripe_payment_intent_id);
+CREATE INDEX idx_payments_reservation_id ON payments(reservation_id);
+
 -- Create availability table
 CREATE TABLE availability (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
@@ -58,3 +78,64 @@ CREATE TABLE availability (
     is_available BOOLEAN NOT NULL
 );
 
+-- Materialized per-space rating summary (maintained incrementally on review writes)
+CREATE TABLE space_rating_summary (
+    space_id UUID PRIMARY KEY REFERENCES rental_spaces(id) ON DELETE CASCADE,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_1_count INTEGER NOT NULL DEFAULT 0,
+    rating_2_count INTEGER NOT NULL DEFAULT 0,
+    rating_3_count INTEGER NOT NULL DEFAULT 0,
+    rating_4_count INTEGER NOT NULL DEFAULT 0,
+    rating_5_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- Daily per-space analytics rollup (maintained incrementally on reservation and payment writes)
+CREATE TABLE daily_space_metrics (
+    space_id UUID REFERENCES rental_spaces(id),
+    day DATE NOT NULL,
+    bookings INTEGER NOT NULL DEFAULT 0,
+    cancellations INTEGER NOT NULL DEFAULT 0,
+    booked_seconds BIGINT NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (space_id, day)
+);
+CREATE INDEX idx_daily_space_metrics_day ON daily_space_metrics(day);
+
+-- Verified Stripe webhook events, applied asynchronously in order per payment intent
+CREATE TABLE stripe_events (
+    id VARCHAR PRIMARY KEY,
+    type VARCHAR NOT NULL,
+    payment_intent_id VARCHAR,
+    stripe_created BIGINT NOT NULL,
+    payload TEXT NOT NULL,
+    status stripe_event_status NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ,
+    last_error TEXT,
+    received_at TIMESTAMPTZ DEFAULT NOW(),
+    processed_at TIMESTAMPTZ
+);
+CREATE INDEX idx_stripe_events_pending ON stripe_events(stripe_created, id) WHERE status = 'pending';
+CREATE INDEX idx_stripe_events_payment_intent_id ON stripe_events(payment_intent_id);
+
+-- First responses to Idempotency-Key requests, replayed for retries until they expire
+CREATE TABLE idempotency_keys (
+    key VARCHAR NOT NULL,
+    scope VARCHAR NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,
+    status_code INTEGER,
+    response_body TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (key, scope)
+);
+CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
+
+-- How far each reconciliation job has got (backend/reconcile_payments.py)
+CREATE TABLE reconciliation_checkpoints (
+    name VARCHAR PRIMARY KEY,
+    watermark BIGINT NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);